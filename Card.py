@@ -1,3 +1,12 @@
+# Suits by index, used whenever a card is represented by an integer (suit * 10 + order)
+SUITS = ["hearts", "diamonds", "clubs", "spades"]
+# Value of a card given its order
+VALUES = [0, 0, 0, 0, 0, 2, 3, 4, 10, 11]
+
+# Rank of each card order, and order of each rank
+RANKS = ["2", "3", "4", "5", "6", "Q", "J", "K", "7", "A"]
+ORDERS = {rank: order for order, rank in enumerate(RANKS)}
+
 class Card:
     '''
         Card ->
@@ -6,22 +15,55 @@ class Card:
             - rank: card rank (2, 3, 4, 5, 6, 7, J, Q, K, A)
             - order: card order (0 - 10)
             - value: card value (0, 2, 3, 4, 10, 11)
+            - index: card index (suit index * 10 + order)
+        There is a single immutable instance of each card (DECK), shared by every game:
+        creating a card returns that instance, so cards compare by identity and hash by index
     '''
-    
-    def __init__ (self, name:str, suit:str, rank:str) -> None:
-        self.name = name
-        self.suit = suit
-        self.rank = rank
-        self.order = 0
-        self.value = 0
+
+    __slots__ = ('name', 'suit', 'rank', 'order', 'value', 'index')
+
+    def __new__(cls, name:str, suit:str, rank:str) -> 'Card':
+        index = SUITS.index(suit) * 10 + ORDERS[rank]
+        if _INTERNED[index] is None:
+            card = super().__new__(cls)
+            for attribute, value in (('name', name), ('suit', suit), ('rank', rank), ('order', ORDERS[rank]),
+                                     ('value', VALUES[ORDERS[rank]]), ('index', index)):
+                object.__setattr__(card, attribute, value)
+            _INTERNED[index] = card
+
+        return _INTERNED[index]
+
+    def __setattr__(self, name:str, value) -> None:
+        raise AttributeError(f'Cards are immutable: cannot set {name} of {self.name}')
 
     def __eq__(self, value: 'Card') -> bool:
-        return self.name == value.name and self.suit == value.suit and\
-            self.rank == value.rank and self.order == value.order and\
-            self.value == value.value
-    
+        return self is value
+
     def __hash__(self) -> int:
-        return hash((self.suit, self.order))
+        return self.index
+
+    def __copy__(self) -> 'Card':
+        return self
+
+    def __deepcopy__(self, memo:dict) -> 'Card':
+        return self
+
+    def __reduce__(self) -> tuple:
+        # Unpickling returns the instance of the receiving process
+        return Card, (self.name, self.suit, self.rank)
 
     def __str__(self) -> str:
         return self.name
+
+
+_INTERNED = [None] * 40
+# Every card by index
+DECK = tuple(Card(rank + "_of_" + suit, suit, rank) for suit in SUITS for rank in RANKS)
+
+
+def card_index(card:Card) -> int:
+    '''
+        Index of a card (0 - 39): suit index * 10 + card order
+    '''
+
+    return card.index
@@ -1,29 +1,48 @@
 from random import randint, shuffle, choice
-from Card import Card
+from Card import Card, DECK, ORDERS, SUITS, card_index
 from Team import Team
-from Player import CooperativePlayer, GreedyPlayer, RandomPlayer, MaximizePointsPlayer, MaximizeRoundsWonPlayer, PredictorPlayer, Player
+from State import GameState, PARTNER
+from deals import SWAP_TEAM_1, SWAP_TEAM_2, TEAM_2_FIRST
+from Player import CooperativePlayer, GreedyPlayer, RandomPlayer, MaximizePointsPlayer, MaximizeRoundsWonPlayer, PredictorPlayer, HonestPredictorPlayer, LearnedPlayer, Player, BeliefPlayer
 from termcolor import colored
-from time import sleep
+from time import sleep, perf_counter
+from threading import Event
+from concurrent.futures import ThreadPoolExecutor
 
 class Game:
     '''
         Game ->
             - teams: list of Team objects
             - strategy: game strategy
+            - seats: list of Player objects by seat (0 - 3), seats 0 and 2 are partners
+            - state: seat indexed state of the game (leader, cards of the round, winning card)
             - playersOrder: list of Player objects sorted by order to play
             - deck: list of Card objects
             - trump: trump card for that game
             - game_info: dictionary with game information
             - verbose: boolean to print game details
             - mode: string with the mode of the game (auto or human)
+            - recorder: optional object whose record method is called with every card played
+            - timer: optional function called with the strategy of every bot decision and the seconds it took
+            - think_time: seconds each bot decision may take (None for no limit)
+            - background: thread that computes decisions while the human thinks or the table waits (human mode)
+            - deal: optional deal of a corpus (deals.DEAL) fixing the seating, the hands and the trump
+        The parameters of the strategy of each team (team_1_params, team_2_params) override the
+        defaults of its players (Player.PARAMS)
     '''
 
-    def __init__(self, team_1_strategy: str, team_2_strategy: str, v:bool, mode:str) -> None:
+    def __init__(self, team_1_strategy: str, team_2_strategy: str, v:bool, mode:str,
+                 team_1_params:dict=None, team_2_params:dict=None, think_time:float=None, deal=None) -> None:
         self.verbose = v
         self.mode = mode
+        self.think_time = think_time
+        self.background = ThreadPoolExecutor(max_workers=1) if mode == 'human' else None
 
         #self.strategy = strategy
         self.trump = None
+        self.recorder = None
+        self.timer = None
+        self.deal = deal
 
         # Initialize game information
         self.game_info = {}
@@ -52,9 +71,15 @@ class Game:
             case 'predictor':
                 player1 = PredictorPlayer(1, "Leitao", team1, self.verbose)
                 player2 = PredictorPlayer(2, "Fred", team1, self.verbose)
+            case 'honest':
+                player1 = HonestPredictorPlayer(1, "Leitao", team1, self.verbose)
+                player2 = HonestPredictorPlayer(2, "Fred", team1, self.verbose)
             case 'greedy':
                 player1 = GreedyPlayer(1, "Leitao", team1, self.verbose)
                 player2 = GreedyPlayer(2, "Fred", team1, self.verbose)
+            case 'learned':
+                player1 = LearnedPlayer(1, "Leitao", team1, self.verbose)
+                player2 = LearnedPlayer(2, "Fred", team1, self.verbose)
 
             case _:  # default
                 raise ValueError("Invalid strategy")
@@ -75,27 +100,57 @@ class Game:
             case 'predictor':
                 player3 = PredictorPlayer(3, "Pedro", team2, self.verbose)
                 player4 = PredictorPlayer(4, "Sebas", team2, self.verbose)
+            case 'honest':
+                player3 = HonestPredictorPlayer(3, "Pedro", team2, self.verbose)
+                player4 = HonestPredictorPlayer(4, "Sebas", team2, self.verbose)
             case 'greedy':
                 player3 = GreedyPlayer(3, "Pedro", team2, self.verbose)
                 player4 = GreedyPlayer(4, "Sebas", team2, self.verbose)
+            case 'learned':
+                player3 = LearnedPlayer(3, "Pedro", team2, self.verbose)
+                player4 = LearnedPlayer(4, "Sebas", team2, self.verbose)
 
             case _:  # default
                 raise ValueError("Invalid strategy")
 
+        # Set the parameters of the strategies
+        for player in (player1, player2):
+            player.set_params(team_1_params or {})
+        for player in (player3, player4):
+            player.set_params(team_2_params or {})
+
         # Add players to teams
         team1.add_player(player1)
         team1.add_player(player2)
         team2.add_player(player3)
         team2.add_player(player4)
 
-        # Randomize players and team to start
-        shuffle(team1.players)
-        shuffle(team2.players)
-        first_team = choice([team1, team2])
+        # Randomize players and team to start, unless the deal fixes them
+        if deal is None:
+            shuffle(team1.players)
+            shuffle(team2.players)
+            first_team = choice([team1, team2])
+        else:
+            seating = int(deal['seating'])
+            if seating & SWAP_TEAM_1:
+                team1.players.reverse()
+            if seating & SWAP_TEAM_2:
+                team2.players.reverse()
+            first_team = team2 if seating & TEAM_2_FIRST else team1
         second_team = team2 if first_team is team1 else team1
 
-        # Order players
-        self.playersOrder = [player for pair in zip(first_team.players, second_team.players) for player in pair]
+        # Seat players, alternating teams
+        self.seats = [player for pair in zip(first_team.players, second_team.players) for player in pair]
+        self.seat_of = {player.name: seat for seat, player in enumerate(self.seats)}
+
+        # Order to play for each seat leading the round
+        self.orders = [self.seats[leader:] + self.seats[:leader] for leader in range(4)]
+        self.state = GameState()
+        for seat, player in enumerate(self.seats):
+            player.seat = seat
+            player.state = self.state
+        self.playersOrder = self.orders[self.state.leader]
+        self.game_info["Order"] = [player.name for player in self.playersOrder]
 
         # Create deck
         self.deck = self.create_deck()
@@ -105,12 +160,10 @@ class Game:
             Get the partner of the player
         '''
 
-        for team in self.teams:
-            for p in team.players:
-                if p.name != player:
-                    return p
+        return self.seats[PARTNER[self.seat_of[player]]]
 
-    def create_deck(self) -> list[Card]:
+    @staticmethod
+    def create_deck() -> list[Card]:
         '''
             Create a deck of 40 cards with the following suits:
                 - hearts
@@ -123,60 +176,11 @@ class Game:
                 - 0, 0, 0, 0, 0, 2, 3, 4, 10, 11
         '''
 
-        # Create deck suits
-        suits = ["hearts", "diamonds", "clubs", "spades"]
-        # Create deck ranks
+        # Ranks in the order the deck is stacked before the cards are dealt
         ranks = ["2", "3", "4", "5", "6", "7", "Q", "J", "K", "A"]
 
-        deck = []
-        for rank in ranks:
-            for suit in suits:
-                card = Card(rank + "_of_" + suit, suit, rank)
-                deck.append(card)
-
-        # Set card "importance"
-        # NOTE: Different from the card value
-        order = {
-            '2': 0,
-            '3': 1,
-            '4': 2,
-            '5': 3,
-            '6': 4,
-            'Q': 5,
-            'J': 6,
-            'K': 7,
-            '7': 8,
-            'A': 9
-        }
-
-        # Set card value
-        for card in deck:
-            if card.rank == 'A':
-                card.value = 11
-            elif card.rank == '7':
-                card.value = 10
-            elif card.rank == 'K':
-                card.value = 4
-            elif card.rank == 'J':
-                card.value = 3
-            elif card.rank == 'Q':
-                card.value = 2
-            else:
-                card.value = 0
-            card.order = order[card.rank]
-
-        return deck
-
-    def rotate_order_to_winner(self, playersOrderList:list[Player], winner:int) -> list[Player]:
-        '''
-            Rotate the list of players to the winner of the round
-        '''
-
-        winner_index = playersOrderList.index(winner)
-        rotated_list = playersOrderList[winner_index:] + \
-            playersOrderList[:winner_index]
-
-        return rotated_list
+        # The cards are shared by every game, their order and value are fixed (Card.DECK)
+        return [DECK[SUITS.index(suit) * 10 + ORDERS[rank]] for rank in ranks for suit in SUITS]
 
     def calculate_round_points(self, cardsPlayedInRound:list[Card]) -> tuple[int, int]:
         '''
@@ -205,27 +209,36 @@ class Game:
 
         return roundPoints, winningCard
 
-    def hand_cards(self) -> None:
+    def hand_cards(self, beliefs:bool=True) -> None:
         '''
-            Distribute the cards between the players
+            Distribute the cards between the players, updating their beliefs with their cards
+            unless the beliefs are kept elsewhere (batch_engine.py)
         '''
 
+        # A deal of a corpus gives the cards in the order they are dealt
+        if self.deal is not None:
+            by_index = {card_index(card): card for card in self.deck}
+            self.deck = [by_index[int(index)] for index in self.deal['cards'][::-1]]
+
         # For each player
         for i, player in enumerate(self.playersOrder):
             # For each card
             for j in range(10):
-                # Pop a card at random
-                card = self.deck.pop(randint(0, len(self.deck) - 1))
+                # Pop a card at random (the next card of the deal)
+                card = self.deck.pop(randint(0, len(self.deck) - 1)) if self.deal is None else self.deck.pop()
                 player.add_card(card)
+                self.state.deal(player.seat, card_index(card), card)
                 
 
                 # Update beliefs of the player
-                if player.get_strategy() == 'Deck Predictor' or player.get_strategy() == 'Cooperative Player':
+                if beliefs and isinstance(player, BeliefPlayer):
                     player.update_beliefs_initial(card)
 
                 if i == len(self.playersOrder) - 1: # Last player
                     if j == 9:                      # Last card
                         self.trump = card           # Is the trump
+                        self.state.trump = card_index(card) // 10
+                        self.game_info["Trump"] = card.name
 
         # Print game details
         # For each player
@@ -245,81 +258,150 @@ class Game:
             Update the beliefs of the players except the one that played the card (no need!)
         '''
 
-        for p in self.playersOrder:
-            if p.name != player.name and (p.get_strategy() == 'Deck Predictor' or p.get_strategy() == 'Cooperative Player'):
+        for p in self.seats:
+            if p is not player and isinstance(p, BeliefPlayer):
                 p.update_beliefs(cardPlayed, round_suit, player, self.mode)
 
+    def decide(self, player:Player, i:int, cardsPlayedInround:list[Card], roundSuit:str, num_round:int) -> tuple[Card, str]:
+        '''
+            Card chosen by a player (removed from its hand) and the suit of the round,
+            with the think time of the game as the deadline of the decision
+        '''
+
+        start = perf_counter()
+        player.deadline = start + self.think_time if self.think_time is not None else None
+
+        match player.get_strategy():
+            case 'Maximize Points Won' | 'Maximize Rounds Won':
+                decision = player.play_round(i, cardsPlayedInround, roundSuit, self.playersOrder, self, self.mode)
+            case 'Deck Predictor' | 'Honest Predictor':
+                decision = player.play_round(i, cardsPlayedInround, roundSuit, self.playersOrder, self, self.mode, num_round)
+            case 'Cooperative Player':
+                decision = player.play_round(i, roundSuit, self, cardsPlayedInround)
+            case 'Learned Player':
+                decision = player.play_round(i, roundSuit, self, num_round)
+            case _:
+                decision = player.play_round(i, roundSuit, self.mode)
+
+        if self.timer is not None:
+            self.timer(player.get_strategy(), perf_counter() - start)
+
+        return decision
+
+    def suggest(self, player:Player, i:int, cardsPlayedInround:list[Card], roundSuit:str, num_round:int, answered:Event) -> None:
+        '''
+            Computes the card the engine suggests to the human (runs in the background while the human thinks)
+        '''
+
+        card_played, _ = self.decide(player, i, cardsPlayedInround, roundSuit, num_round)
+        # Put the card played back in the hand, the human chooses
+        player.add_card(card_played)
+
+        if not answered.is_set():
+            print('\nThe engine suggests you play', colored(card_played.name, 'blue', attrs=['bold']))
+            print(colored('> ', attrs=['bold']), end='', flush=True)
+
+    def ask_human(self, player:Player, i:int, cardsPlayedInround:list[Card], roundSuit:str, num_round:int) -> tuple[Card, str]:
+        '''
+            Card chosen by the human, with the suggestion of the engine shown as soon as it is ready
+        '''
+
+        print(colored(f'Your current hand:', 'yellow'))
+        for card in player.hand:
+            print(colored(card.name, attrs=['bold']))
+
+        answered = Event()
+        suggestion = self.background.submit(self.suggest, player, i, cardsPlayedInround, roundSuit, num_round, answered)
+        # Wait for user input
+        while True:
+            card_name = input(colored('> ', attrs=['bold']))
+
+            # The search stops at its best card so far and puts it back in the hand
+            answered.set()
+            player.deadline = perf_counter()
+            suggestion.result()
+
+            card_played = player.get_card(card_name)
+            if card_played:
+                break
+            print(colored('Invalid card! Try again', 'red'))
+
+        if i == 0:
+            roundSuit = card_played.suit
+
+        # Remove the card played from the hand
+        player.hand.remove(card_played)
+        print(colored(f'You played {card_played.name}', 'green', attrs=['bold']))
+
+        return card_played, roundSuit
+
     def play_round(self, num_round:int) -> dict[str, str]:
         '''
             Play a round of the game
         '''
 
         roundSuit = ''
-        round_info = {}
         cardsPlayedInround = []
+        pondering = None
 
         # For each player
         for i, player in enumerate(self.playersOrder):
-            match player.get_strategy():
-                case 'Maximize Points Won' | 'Maximize Rounds Won':
-                    card_played, roundSuit = player.play_round(i, cardsPlayedInround, roundSuit, self.playersOrder, self, self.mode)
-                case 'Deck Predictor':
-                    card_played, roundSuit = player.play_round(i, cardsPlayedInround, roundSuit, self.playersOrder, self, self.mode, num_round)
-                case 'Cooperative Player':
-                    card_played, roundSuit = player.play_round(i, roundSuit, self, cardsPlayedInround)
-                case _:
-                    card_played, roundSuit = player.play_round(i, roundSuit, self.mode)
-
-            # In human mode, print the cards played by the player and let him chose
+            # In human mode, print the cards of the player and let him chose
             if player.name == 'Leitao' and self.mode == 'human':
-                # Put the card played back in the hand
-                player.add_card(card_played)
+                card_played, roundSuit = self.ask_human(player, i, cardsPlayedInround, roundSuit, num_round)
+            else:
+                if pondering is not None:   # decided during the delay after the previous card
+                    card_played, roundSuit = pondering.result()
+                else:
+                    card_played, roundSuit = self.decide(player, i, cardsPlayedInround, roundSuit, num_round)
 
-                print(colored(f'Your current hand:', 'yellow'))
-                for card in player.hand:
-                    print(colored(card.name, attrs=['bold']))
-                print('\nThe engine suggests you play', end=' ')
-                print(colored(card_played.name, 'blue', attrs=['bold']))
-                # Wait for user input
-                while True:
-                    card_name = input(colored('> ', attrs=['bold']))
-                    
-                    card_played = player.get_card(card_name)
-                    if card_played:
-                        break
-                    print(colored('Invalid card! Try again', 'red'))
-
-                if i == 0:
-                    roundSuit = card_played.suit
-
-                # Remove the card played from the hand
-                player.hand.remove(card_played)
-                print(colored(f'You played {card_played.name}', 'green', attrs=['bold']))
+                if self.verbose or self.mode == 'human':
+                    print(colored(f"{player.name} played {card_played.name}", 'green', attrs=['bold']))
+            pondering = None
+
+            # Record the decision before the card leaves the hand in the state
+            card = card_index(card_played)
+            if self.recorder is not None:
+                self.recorder.record(self, player, card, num_round, i)
 
             # Add the card played to the list of cards played in the round
             cardsPlayedInround.append(card_played)
+            self.state.play(card)
 
             # Update the beliefs of the players
             self.update_beliefs(card_played, roundSuit, player)
 
-            # If the round is in human mode, wait for 5 seconds
+            # If the round is in human mode, wait for 2 seconds while the next bot decides
             if self.mode == 'human':
+                if i < len(self.playersOrder) - 1 and self.playersOrder[i + 1].name != 'Leitao':
+                    pondering = self.background.submit(self.decide, self.playersOrder[i + 1], i + 1,
+                                                       cardsPlayedInround, roundSuit, num_round)
                 sleep(2)
 
-        # Get the total points played in the round and the respective winner
-        roundPoints, winnerId = self.calculate_round_points(cardsPlayedInround)
+        return self.end_round(cardsPlayedInround)
+
+    def end_round(self, cardsPlayedInround:list[Card]) -> dict[str, str]:
+        '''
+            Scores the round and hands the lead to its winner, returns the information of the round
+        '''
+
+        round_info = {}
+
+        # Get the total points played in the round and the respective winner (who leads the next round)
+        winnerSeat, roundPoints = self.state.end_round()
+        playerWinnerOfRound = self.seats[winnerSeat]
 
-        round_info["Winner"] = self.playersOrder[winnerId[1]].name
+        round_info["Cards"] = [card.name for card in cardsPlayedInround]
+        round_info["Winner"] = playerWinnerOfRound.name
         round_info["Points"] = roundPoints
 
-        playerWinnerOfRound = self.playersOrder[winnerId[1]]
         playerWinnerOfRound.team.score += roundPoints
 
         if self.verbose or self.mode == 'human':
             print(colored('You win the round' if playerWinnerOfRound.name == 'Leitao' else playerWinnerOfRound.name + " wins the round", 'blue', attrs=['bold']))
 
-        # Rotate the players order to the winner of the round
-        self.playersOrder = self.rotate_order_to_winner(self.playersOrder, playerWinnerOfRound)
+        # The winner of the round leads the next one
+        self.playersOrder = self.orders[winnerSeat]
 
         return round_info
 
@@ -336,6 +418,17 @@ class Game:
             round_info = self.play_round(num_rounds)
             (self.game_info["Rounds"])[num_rounds + 1] = round_info
 
+        return self.end_game()
+
+    def end_game(self) -> str:
+        '''
+            Closes the game after the last round, returns the name of the winning team (or ties)
+        '''
+
+        # No more decisions to compute in the background
+        if self.background is not None:
+            self.background.shutdown()
+
         # Print the final game details
         if self.verbose or self.mode == 'human':
             print(colored("\nSporting score: " + str(self.teams[0].score), 'green'))
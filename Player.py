@@ -1,12 +1,24 @@
 import numpy as np
-from random import randint
-from Card import Card
-from copy import deepcopy
+import random
+from time import perf_counter
+from Card import Card, SUITS, VALUES, card_index
 from itertools import product
-from termcolor import colored
+from math import prod
+from State import PARTNER, beats, legal_moves, suit_moves, trick_winner
+from tricks import complete_tricks, expected_utilities
+from learned import features, load_model
+from opening_book import load_book
+from rule_tables import TABLES, table_move
 import Team
 import Game
 
+# Value of each card by its order, and the bit of each order in a suit mask
+CARD_POINTS = np.array(VALUES)
+ORDER_BITS = 1 << np.arange(10)
+# Orders of the cards worth points (Q, J, K, 7, A)
+POINT_CARDS = sum(1 << order for order, value in enumerate(VALUES) if value > 0)
+ALL_CARDS = (1 << 40) - 1
+
 ############################################# Player General Classes #############################################
 
 class Player:
@@ -16,15 +28,50 @@ class Player:
             - id: id of the player
             - hand: list of Card objects the player has (initially 10)
             - team: team object to which the player belongs
+            - seat: seat of the player in the game (0 - 3), seats 0 and 2 are partners
+            - state: state of the game the player is seated at
             - verbose: print the player actions
+            - params: parameters of the strategy (defaults in PARAMS)
+            - deadline: time (perf_counter) by which the current decision must be made, None for no limit.
+              Strategies that search return their best move so far once it is reached (anytime decisions)
+            - rng: source of the random choices of the strategy (the random module, or a random.Random
+              of the game when games are played in lockstep, batch_engine.py)
     '''
 
+    __slots__ = ('verbose', 'id', 'name', 'hand', 'team', 'seat', 'state', 'params', 'deadline', 'rng')
+
+    # Tunable parameters of the strategy and their default values
+    PARAMS = {}
+
     def __init__(self, id:int, name:str, team:'Team', v:bool) -> None:
         self.verbose = v
         self.id = id
         self.name = name
         self.hand = []
         self.team = team
+        self.seat = -1
+        self.state = None
+        self.params = dict(self.PARAMS)
+        self.deadline = None
+        self.rng = random
+
+    def time_left(self) -> bool:
+        '''
+            Whether the current decision can keep searching
+        '''
+
+        return self.deadline is None or perf_counter() < self.deadline
+
+    def set_params(self, params:dict) -> None:
+        '''
+            Set the parameters of the strategy, the ones not given keep their default values
+        '''
+
+        unknown = set(params) - set(self.PARAMS)
+        if unknown:
+            raise ValueError(f"Invalid parameters for {self.get_strategy()}: {', '.join(sorted(unknown))}")
+
+        self.params = {**self.PARAMS, **params}
 
     def add_card(self, card:Card) -> None:
         '''
@@ -48,6 +95,16 @@ class Player:
 
         return filtered_hand
 
+    def play_card(self, card:int) -> Card:
+        '''
+            Remove a card (index) from the player hand and return its object
+        '''
+
+        card_played = self.state.cards[card]
+        self.hand.remove(card_played)
+
+        return card_played
+
     def get_partner(self) -> 'Player':
         '''
             Get the partner of the player
@@ -75,6 +132,8 @@ class BeliefPlayer (Player):
             - beliefs: beliefs of the player
     '''
 
+    __slots__ = ('beliefs',)
+
     def __init__(self, id:int, name:str, team:'Team', v:bool) -> None:
         super().__init__(id, name, team, v)
 
@@ -126,16 +185,24 @@ class BeliefPlayer (Player):
             round_suit = self.obtain_suit_index(round_suit)
             self.beliefs[player.id - 1, round_suit, :] = 0
 
-        # For each card
-        for i in range(10):
-            # For each suit
-            for j in range(4):
-                # Number of players that may still have the card
-                num_players = np.count_nonzero(self.beliefs[:, j, i])
-                # For each player
-                for p in range(4):
-                    if self.beliefs[p, j, i] != 0:
-                        self.beliefs[p, j, i] = 1 / num_players
+        # Every player that may still have a card is equally likely to have it
+        num_players = np.count_nonzero(self.beliefs, axis=0)
+        np.copyto(self.beliefs, 1 / np.maximum(num_players, 1), where=self.beliefs != 0)
+
+    def book_lead(self, i:int) -> Card:
+        '''
+            Plays the lead of the first round stored in the opening book of the strategy (book parameter),
+            None if the player does not lead the first round or its hand is not in the book
+        '''
+
+        if i != 0 or len(self.hand) != 10 or not self.params.get('book'):
+            return None
+
+        book = load_book(self.params['book'])
+        book.check(self.get_strategy(), self.params)
+        card = book.lead(self.state.hand_mask(self.seat), self.state.trump, self.params['book_best'])
+
+        return self.play_card(card) if card is not None else None
 
 
 ############################################# Player Sub Classes #############################################
@@ -149,6 +216,8 @@ class RandomPlayer (Player):
             - v: verbose
     '''
 
+    __slots__ = ()
+
     def __init__(self, id:int, name:str, team:'Team', v:bool) -> None:
         super().__init__(id, name, team, v)
 
@@ -157,21 +226,14 @@ class RandomPlayer (Player):
             Play a round of the game of Sueca, selecting a card at random in each -round
         '''
 
-        if i == 0:  # if the player is the first to play, play a random card
-            cardPlayed = self.hand.pop(randint(0, len(self.hand) - 1))
-            round_suit = cardPlayed.suit
-        else:       # if the player is not the first to play, play a card of the same suit if possible
-            cardsOfTheSameSuit = self.get_cards_by_suit(round_suit)
-            if len(cardsOfTheSameSuit) != 0:    # if the player has cards of the same suit
-                cardPlayed = cardsOfTheSameSuit[randint(
-                    0, len(cardsOfTheSameSuit) - 1)]
-                self.hand.remove(cardPlayed)
-            else:                               # if the player does not have cards of the same suit
-                cardPlayed = self.hand.pop(randint(0, len(self.hand) - 1))
-
-        if self.verbose or (mode == 'human' and self.name != 'Leitao'):
-            print(
-                colored(f"{self.name} played {cardPlayed.name}", 'green', attrs=['bold']))
+        legal = legal_moves(self.state, self.seat)
+        if legal.suit >= 0:     # if the player has cards of the same suit, play one of them
+            cards_of_the_same_suit = legal.cards()
+            cardPlayed = self.play_card(cards_of_the_same_suit[self.rng.randint(0, len(cards_of_the_same_suit) - 1)])
+        else:                   # if the player is the first to play or has no cards of the same suit
+            cardPlayed = self.hand.pop(self.rng.randint(0, len(self.hand) - 1))
+            if i == 0:
+                round_suit = cardPlayed.suit
 
         return cardPlayed, round_suit
 
@@ -193,6 +255,8 @@ class GreedyPlayer (Player):
             - v: verbose
     '''
 
+    __slots__ = ()
+
     def __init__(self, id:int, name:str, team:'Team', v:bool) -> None:
         super().__init__(id, name, team, v)
 
@@ -201,23 +265,10 @@ class GreedyPlayer (Player):
             Play a round of the game of Sueca, selecting the highest ranked card
         '''
 
+        # The strongest card of the same suit if the player has any, otherwise the strongest card
+        card_played = self.play_card(table_move(TABLES['Greedy Player'], self.state, self.seat))
         if i == 0:
-            card_played = self.hand[-1]
             round_suit = card_played.suit
-            self.hand.remove(card_played)
-            return card_played, round_suit
-
-        cards_of_the_same_suit = self.get_cards_by_suit(round_suit)
-        if len(cards_of_the_same_suit) != 0:    # if the player has cards of the same suit
-            card_played = cards_of_the_same_suit[-1]
-            self.hand.remove(card_played)
-        else:                               # if the player does not have cards of the same suit
-            card_played = self.hand[-1]
-            self.hand.remove(card_played)
-
-        if self.verbose or (mode == 'human' and self.name != 'Leitao'):
-            print(
-                colored(f"{self.name} played {card_played.name}", 'green', attrs=['bold']))
 
         return card_played, round_suit
 
@@ -237,8 +288,14 @@ class MaximizePointsPlayer (Player):
             - name: player name
             - team: team object to which the player belongs
             - v: verbose
+        Parameters:
+            - trump_points: points already in the round needed to cut with a trump
     '''
 
+    __slots__ = ()
+
+    PARAMS = {'trump_points': 0}
+
     def __init__(self, id:int, name:str, team:'Team', v:bool) -> None:
         super().__init__(id, name, team, v)
 
@@ -247,42 +304,10 @@ class MaximizePointsPlayer (Player):
             Play a round of the game of Sueca, selecting the card that maximizes the points won
         '''
 
+        # The rules of the strategy compiled into a table (rule_tables.py)
+        cardPlayed = self.play_card(table_move(TABLES['Maximize Points Won'], self.state, self.seat, self.params['trump_points']))
         if i == 0:
-            cardPlayed = self.hand[-1]
             round_suit = cardPlayed.suit
-            self.hand.remove(cardPlayed)
-        else:
-            cardsOfTheSameSuit = self.get_cards_by_suit(round_suit)
-            _, winner = game.calculate_round_points(cards_played)
-            player_winner = players_order[winner[1]]
-            if player_winner.team == self.team:  # if the same team
-                if cardsOfTheSameSuit:  # play strongest card from same suit
-                    cardPlayed = cardsOfTheSameSuit[-1]
-                    self.hand.remove(cardPlayed)
-                else:
-                    # else play strongest from another suit
-                    cardPlayed = self.hand[-1]
-                    self.hand.remove(cardPlayed)
-            else:  # if different team
-                if cardsOfTheSameSuit:  # if have cards from suit
-                    cardPlayed = cardsOfTheSameSuit[-1]
-                    if cardPlayed.order > winner[0].order:  # if can win
-                        self.hand.remove(cardPlayed)  # play strongest card
-                    else:
-                        # else play weakest card
-                        cardPlayed = cardsOfTheSameSuit[0]
-                        self.hand.remove(cardPlayed)
-                else:
-                    trumpCards = self.get_cards_by_suit(game.trump.suit)
-                    if trumpCards:  # if has trump, play the strongest trump card
-                        cardPlayed = trumpCards[-1]
-                        self.hand.remove(cardPlayed)
-                    else:
-                        cardPlayed = self.hand[0]  # play weakest card
-                        self.hand.remove(cardPlayed)
-
-        if self.verbose or (mode == 'human' and self.name != 'Leitao'):
-            print(colored(f"{self.name} played {cardPlayed.name}", 'green', attrs=['bold']))
 
         return cardPlayed, round_suit
 
@@ -301,8 +326,14 @@ class MaximizeRoundsWonPlayer (Player):
             - name: player name
             - team: team object to which the player belongs
             - v: verbose
+        Parameters:
+            - trump_points: points already in the round needed to cut with a trump
     '''
 
+    __slots__ = ()
+
+    PARAMS = {'trump_points': 0}
+
     def __init__(self, id:int, name:str, team:'Team', v:bool) -> None:
         super().__init__(id, name, team, v)
 
@@ -311,46 +342,10 @@ class MaximizeRoundsWonPlayer (Player):
             Play a round of the game of Sueca, selecting the card that maximizes the rounds won
         '''
 
+        # The rules of the strategy compiled into a table (rule_tables.py)
+        cardPlayed = self.play_card(table_move(TABLES['Maximize Rounds Won'], self.state, self.seat, self.params['trump_points']))
         if i == 0:
-            cardPlayed = self.hand[-1]
             round_suit = cardPlayed.suit
-            self.hand.remove(cardPlayed)
-        else:
-            cardsOfTheSameSuit = self.get_cards_by_suit(round_suit)
-            _, winner = game.calculate_round_points(cards_played)
-            player_winner = players_order[winner[1]]
-            if player_winner.team == self.team:  # if the same team
-                if cardsOfTheSameSuit:  # play weakest card from the same suit
-                    # preserves all strong cards
-                    cardPlayed = cardsOfTheSameSuit[0]
-                    self.hand.remove(cardPlayed)
-                else:
-                    # else play weakest from other suit
-                    cardPlayed = self.hand[0]
-                    self.hand.remove(cardPlayed)
-            else:
-                cardPlayed = None  # if different team
-                if cardsOfTheSameSuit:  # if have cards from suit
-                    for card in cardsOfTheSameSuit:
-                        # Search for the lowest card that can win
-                        if card.order > winner[0].order:
-                            cardPlayed = card
-                            self.hand.remove(card)
-                            break
-                    if not cardPlayed:  # if cant win
-                        cardPlayed = cardsOfTheSameSuit[0]  # play weakest card
-                        self.hand.remove(cardPlayed)
-                else:
-                    trumpCards = self.get_cards_by_suit(game.trump.suit)
-                    if trumpCards:  # if has trump, play the weakest trump card
-                        cardPlayed = trumpCards[0]
-                        self.hand.remove(cardPlayed)
-                    else:
-                        cardPlayed = self.hand[0]  # play weakest card
-                        self.hand.remove(cardPlayed)
-
-        if self.verbose or (mode == 'human' and self.name != 'Leitao'):
-            print(colored(f"{self.name} played {cardPlayed.name}", 'green', attrs=['bold']))
 
         return cardPlayed, round_suit
 
@@ -369,17 +364,51 @@ class CooperativePlayer (BeliefPlayer):
             - name: player name
             - team: team object to which the player belongs
             - v: verbose
+            - may_hold: cards each player may still have, by suit, as 10 bit masks [player][suit]
+            - team_points: expected points of each suit held by the player and its partner
+        may_hold and team_points are computed for every suit once the hand is dealt, then
+        kept up to date with the beliefs, only for the suits an observation changes
+        Parameters:
+            - partner_cut: lead a suit the partner no longer has when it still has trumps
+            - lead_points: expected team points of a suit needed to lead it with the strongest card
+            - book: opening book with the lead of the first round (opening_book.py), None to compute it
+            - book_best: lead the card with the most points in the rollouts of the book instead
     '''
 
+    __slots__ = ('may_hold', 'team_points')
+
+    PARAMS = {'partner_cut': True, 'lead_points': 0, 'book': None, 'book_best': False}
+
     def __init__(self, id:int, name:str, team:'Team', v:bool) -> None:
         super().__init__(id, name, team, v)
 
+        self.may_hold = [[0, 0, 0, 0] for _ in range(4)]
+        self.team_points = np.zeros(4)
+
+    def refresh_suit(self, suit:int) -> None:
+        '''
+            Recompute the aggregates of a suit from the beliefs
+        '''
+
+        holds = (self.beliefs[:, suit, :] != 0) @ ORDER_BITS
+        for p in range(4):
+            self.may_hold[p][suit] = int(holds[p])
+
+        partner = self.get_partner().id - 1
+        self.team_points[suit] = np.sum(self.beliefs[partner, suit] * CARD_POINTS +
+                                        self.beliefs[self.id - 1, suit] * CARD_POINTS)
+
     def update_beliefs_initial(self, card:Card) -> None:
         '''
             Update the beliefs of the player after the initial handing of cards
         '''
 
-        return super().update_beliefs_initial(card)
+        super().update_beliefs_initial(card)
+
+        # Once the hand is complete every suit is computed, even the ones the player was not dealt
+        if len(self.hand) == 10:
+            for suit in range(len(SUITS)):
+                self.refresh_suit(suit)
 
     def update_beliefs(self, card:Card, round_suit:str, player:Player, mode:str) -> None:
         '''
@@ -388,137 +417,92 @@ class CooperativePlayer (BeliefPlayer):
 
         super().update_beliefs(card, round_suit, player, mode)
 
+        # Only the suit of the card and, if the player did not follow it, the round suit change
+        self.refresh_suit(self.obtain_suit_index(card.suit))
+        if card.suit != round_suit:
+            self.refresh_suit(self.obtain_suit_index(round_suit))
+
     def play_round(self, i:int, round_suit:str, game: Game, cards_played_in_round: list[Card]) -> tuple[Card, str]:
         '''
             Play a round of the game of Sueca, selecting the card, considering
             the cards that its partner has, acting as a "team player"
         '''
 
-        players_order = game.playersOrder
-        mode = game.mode
-        partner_id = self.get_partner().id
-        partner_belief = self.beliefs[partner_id - 1]
-        player_belief = self.beliefs[self.id - 1]
-        suits = np.array(["hearts", "diamonds", "clubs", "spades"])
-        player_points = np.ones((4, 10))
-        partner_points = np.ones((4, 10))
-        card_points = np.array([0, 0, 0, 0, 0, 2, 3, 4, 10, 11])
-
-        for suit in suits:
-            suit_index = self.obtain_suit_index(suit)
-            for p in range(10):
-                # Check the suit for which the partner has the best cards
-                partner_points[suit_index][p] *= partner_belief[suit_index,
-                                                                p] * card_points[p]
-                player_points[suit_index][p] *= player_belief[suit_index,
-                                                              p] * card_points[p]
-
-        possible_points = partner_points + player_points
+        card_played = self.book_lead(i)
+        if card_played is not None:
+            return card_played, card_played.suit
+
+        partner_holds = self.may_hold[self.get_partner().id - 1]
+        team_holds = [held | partner_holds[suit] for suit, held in enumerate(self.may_hold[self.id - 1])]
+        legal = legal_moves(self.state, self.seat)
+        trump_index = self.state.trump
         if i == 0:
             # if the player is the first to play, try to play a suit for the
             # partner to use a trump card
 
-            for suit in suits:
-                suit_index = self.obtain_suit_index(suit)
-                cards_of_the_same_suit = self.get_cards_by_suit(suit)
-                if np.count_nonzero(partner_belief[suit_index]) == 0 and\
-                        np.count_nonzero(partner_belief[self.obtain_suit_index(game.trump.suit)]) != 0\
-                        and len(cards_of_the_same_suit) > 0:
-                    card_played = cards_of_the_same_suit[-1]
-                    self.hand.remove(cards_of_the_same_suit[-1])
+            for suit_index, suit in enumerate(SUITS):
+                cards_of_the_same_suit = suit_moves(self.state, self.seat, suit_index)
+                if self.params['partner_cut'] and not partner_holds[suit_index] and partner_holds[trump_index]\
+                        and cards_of_the_same_suit:
+                    card_played = self.play_card(cards_of_the_same_suit.strongest())
                     return card_played, suit
 
             # Check the cards we have for which the partner has the best cards
-            for suit in suits:
-                suit_index = self.obtain_suit_index(suit)
-                cards_to_play = self.get_cards_by_suit(suit)
-                if len(cards_to_play) == 0:
-                    possible_points[suit_index] = 0
-
-            if np.count_nonzero(possible_points) > 0:
-                suit_to_play = np.argmax(np.sum(possible_points, axis=1))
-                cards_of_the_same_suit = self.get_cards_by_suit(
-                    suits[suit_to_play])
-                card_played = cards_of_the_same_suit[-1]
-                self.hand.remove(cards_of_the_same_suit[-1])
-                return card_played, suits[suit_to_play]
+            held = [legal.masks[suit_index] != 0 for suit_index in range(len(SUITS))]
+            if any(held[suit_index] and team_holds[suit_index] & POINT_CARDS for suit_index in range(len(SUITS))):
+                suit_to_play = np.argmax(np.where(held, self.team_points, 0))
+                if self.team_points[suit_to_play] >= self.params['lead_points']:
+                    card_played = self.play_card(suit_moves(self.state, self.seat, suit_to_play).strongest())
+                    return card_played, SUITS[suit_to_play]
 
             # TODO: Make the player save the trumps in case he has no more points
-            card_played = self.hand[-1]
-            self.hand.remove(card_played)
+            card_played = self.play_card(legal.strongest())
             return card_played, card_played.suit
 
         if i == 1:
-            cards_of_the_same_suit = self.get_cards_by_suit(round_suit)
-            suit_index = self.obtain_suit_index(round_suit)
-            if np.count_nonzero(partner_belief[self.obtain_suit_index(game.trump.suit)]) != 0\
-                    and len(cards_of_the_same_suit) > 0 and\
-                    np.count_nonzero(partner_belief[suit_index]) == 0:
+            suit_index = self.state.round_suit()
+            if partner_holds[trump_index] and legal.suit >= 0 and not partner_holds[suit_index]:
                 # In this case independently of our play our partner can cut
-                card_played = cards_of_the_same_suit[-1]
+                card = legal.strongest()
 
             # Check if either we or our partner can cut
-            elif len(cards_of_the_same_suit) == 0:
-                trump_cards = self.get_cards_by_suit(game.trump.suit)
+            elif legal.suit < 0:
+                trump_cards = suit_moves(self.state, self.seat, trump_index)
                 if trump_cards:  # if has trump, play the weakest trump card
-                    card_played = trump_cards[0]
+                    card = trump_cards.weakest()
                 else:
-                    if np.count_nonzero(partner_belief[self.obtain_suit_index(game.trump.suit)]) != 0 and\
-                            np.count_nonzero(partner_belief[suit_index]) == 0:
-                        card_played = self.hand[-1]  # play weakest card
+                    if partner_holds[trump_index] and not partner_holds[suit_index]:
+                        card = legal.strongest()  # play strongest card
                     else:
-                        card_played = self.hand[0]
+                        card = legal.weakest()
             else:
-                _, winner = game.calculate_round_points(cards_played_in_round)
-                # Search for the lowest card that can win
-                winning_card_found = False
-                if np.count_nonzero(possible_points[suit_index]) > 0:
-                    for k in range(10):
-                        if (player_points[suit_index][k] > 0 or partner_points[suit_index][k] > 0)\
-                                and k > winner[0].order:
-                            if cards_of_the_same_suit:
-                                card_played = cards_of_the_same_suit[-1]
-                            else:
-                                card_played = self.hand[-1]
-                            winning_card_found = True
-                            break
-                if not winning_card_found:
-                    card_played = cards_of_the_same_suit[0]
-            self.hand.remove(card_played)
+                winning_order = self.state.winning_card() % 10
+                # Play the strongest card if we or our partner may have a point card that wins
+                if team_holds[suit_index] & POINT_CARDS >> (winning_order + 1) << (winning_order + 1):
+                    card = legal.strongest()
+                else:
+                    card = legal.weakest()
+            card_played = self.play_card(card)
 
         else:       # if the player is not the first to play, play a card of the same suit if possible
-            cards_of_the_same_suit = self.get_cards_by_suit(round_suit)
-            _, winner = game.calculate_round_points(cards_played_in_round)
-            player_winner = players_order[winner[1]]
-            if player_winner == self.get_partner():  # if the same team
-                if cards_of_the_same_suit:  # play strongest card from same suit
-                    card_played = cards_of_the_same_suit[-1]
-                    self.hand.remove(card_played)
-                else:
-                    # else play strongest from another suit
-                    card_played = self.hand[-1]
-                    self.hand.remove(card_played)
+            winning_order = self.state.winning_card() % 10
+            if self.state.winning_seat() == PARTNER[self.seat]:  # if the same team
+                # play strongest card from same suit, else play strongest from another suit
+                card_played = self.play_card(legal.strongest())
             else:  # if different team
-                if cards_of_the_same_suit:  # if have cards from suit
-                    card_played = cards_of_the_same_suit[-1]
-                    if card_played.order > winner[0].order:  # if can win
-                        self.hand.remove(card_played)  # play strongest card
+                if legal.suit >= 0:  # if have cards from suit
+                    strongest = legal.strongest()
+                    if strongest % 10 > winning_order:  # if can win
+                        card_played = self.play_card(strongest)  # play strongest card
                     else:
                         # else play weakest card
-                        card_played = cards_of_the_same_suit[0]
-                        self.hand.remove(card_played)
+                        card_played = self.play_card(legal.weakest())
                 else:
-                    trumpCards = self.get_cards_by_suit(game.trump.suit)
+                    trumpCards = suit_moves(self.state, self.seat, trump_index)
                     if trumpCards:  # if has trump, play the strongest trump card
-                        card_played = trumpCards[-1]
-                        self.hand.remove(card_played)
+                        card_played = self.play_card(trumpCards.strongest())
                     else:
-                        card_played = self.hand[0]  # play weakest card
-                        self.hand.remove(card_played)
-
-        if self.verbose or (mode == 'human' and self.name != 'Leitao'):
-            print(
-                colored(f"{self.name} played {card_played.name}", 'green', attrs=['bold']))
+                        card_played = self.play_card(legal.weakest())  # play weakest card
 
         return card_played, round_suit
 
@@ -537,11 +521,21 @@ class PredictorPlayer (BeliefPlayer):
             - name: player name
             - team: team object to which the player belongs
             - v: verbose
+            - vectorized: evaluate all the combinations of cards at once (False: one at a time)
+        Parameters:
+            - trump_penalty: utility taken from the trump cards in the first rounds
+            - penalty_rounds: number of first rounds in which the trump cards are penalized
     '''
 
+    __slots__ = ('vectorized',)
+
+    PARAMS = {'trump_penalty': 1000, 'penalty_rounds': 2}
+
     def __init__(self, id:int, name:str, team:'Team', v:bool) -> None:
         super().__init__(id, name, team, v)
 
+        self.vectorized = True
+
     def update_beliefs_initial(self, card:Card) -> None:
         '''
             Update the beliefs of the player after the initial handing of cards
@@ -561,12 +555,12 @@ class PredictorPlayer (BeliefPlayer):
             Returns the cards of a given player
         '''
 
+        player_cards = []
         if suit != 'all':
-            player_cards = player.get_cards_by_suit(suit)
-            if player_cards == []:
-                player_cards = deepcopy(player.hand)
-        else:
-            player_cards = deepcopy(player.hand)
+            legal = suit_moves(self.state, player.seat, SUITS.index(suit))
+            player_cards = [self.state.cards[card] for card in legal.cards()]
+        if not player_cards:
+            player_cards = list(player.hand)
 
         # Get the probability of each card in beliefs
         cards_prob = []
@@ -576,28 +570,16 @@ class PredictorPlayer (BeliefPlayer):
 
         return player_cards, cards_prob
 
-    def play_round(self, i:int, cards_played_in_round:list[Card], round_suit:str, players_order:list[Player], game:Game, mode:str, num_round:int) -> tuple[Card, str]:
+    def enumerate_utilities(self, cards_played_in_round:list[Card], cards_to_play:dict, cards_probability:dict,
+                            other_players_ids:list[int], players_order:list[Player], game:Game) -> dict:
         '''
-            Play a round of Sueca, selecting the card considering the cards that its partner has,
-            acting as a "team player", and using utility based on projected round points and
-            probabilities of card holdings.
+            Expected utility of each card, going through every combination of the other players' cards
+            one at a time (reference for the vectorized enumeration of tricks.expected_utilities)
         '''
-        cards_to_play = {}
-        cards_probability = {}
-        for player in players_order:
-            if i == 0 or not player.get_cards_by_suit(round_suit):
-                cards_to_play[player.id], cards_probability[player.id] = self.get_player_possible_cards(
-                    player)
-            else:
-                cards_to_play[player.id], cards_probability[player.id] = self.get_player_possible_cards(
-                    player, round_suit)
 
         utility_per_card = {}
-
         for card in cards_to_play[self.id]:
             expected_utility = 0
-            other_players_ids = [
-                player.id for player in players_order if players_order.index(player) > i]
             possible_plays_combinations = [
                 cards_to_play[pid] for pid in other_players_ids]
             probabilities_combinations = [
@@ -616,24 +598,68 @@ class PredictorPlayer (BeliefPlayer):
                     [card] + list(other_cards_tuple)
                 round_points, winning_card = game.calculate_round_points(
                     simulated_cards_played)
-                if players_order[winning_card[1]].team.name == self.team.name:
+                if players_order[winning_card[1]].team is self.team:
                     expected_utility += round_points * combination_probability
                 else:
                     expected_utility -= round_points * combination_probability
 
             utility_per_card[card] = expected_utility
 
+        return utility_per_card
+
+    def card_utilities(self, i:int, cards_played_in_round:list[Card], round_suit:str, players_order:list[Player],
+                       game:Game) -> dict[Card, float]:
+        '''
+            Expected utility of each card the player may play
+        '''
+
+        cards_to_play = {}
+        cards_probability = {}
+        # Only the player and the ones still to play matter
+        for player in players_order[i:]:
+            cards_to_play[player.id], cards_probability[player.id] = self.get_player_possible_cards(
+                player, 'all' if i == 0 else round_suit)
+
+        other_players_ids = [player.id for player in players_order[i + 1:]]
+        if self.vectorized:
+            played = [card_index(card) for card in cards_played_in_round]
+            own_cards = np.array([card_index(card) for card in cards_to_play[self.id]])
+            other_cards = [np.array([card_index(card) for card in cards_to_play[pid]]) for pid in other_players_ids]
+            other_probabilities = [cards_probability[pid] for pid in other_players_ids]
+            if self.deadline is None:
+                utilities = expected_utilities(played, own_cards, other_cards, other_probabilities, self.state.trump)
+            else:
+                # Anytime: one card at a time until the deadline, only the cards valued so far are considered
+                utilities = []
+                for k in range(len(own_cards)):
+                    if utilities and not self.time_left():
+                        break
+                    utilities.append(expected_utilities(played, own_cards[k:k + 1], other_cards,
+                                                        other_probabilities, self.state.trump)[0])
+            return dict(zip(cards_to_play[self.id], utilities))
+        else:
+            return self.enumerate_utilities(cards_played_in_round, cards_to_play, cards_probability,
+                                            other_players_ids, players_order, game)
+
+    def play_round(self, i:int, cards_played_in_round:list[Card], round_suit:str, players_order:list[Player], game:Game, mode:str, num_round:int) -> tuple[Card, str]:
+        '''
+            Play a round of Sueca, selecting the card considering the cards that its partner has,
+            acting as a "team player", and using utility based on projected round points and
+            probabilities of card holdings.
+        '''
+        utility_per_card = self.card_utilities(i, cards_played_in_round, round_suit, players_order, game)
+
         utilities = [(card.name, utility_per_card[card])
                      for card in utility_per_card.keys()]
 
         ##############################################################
         # NOTE: In here, put individual strategies that you remember #
         ##############################################################
-        if num_round < 2:    # In the first 2 rounds, if you are the first to play
+        if num_round < self.params['penalty_rounds']:    # In the first rounds
             # Avoid using the trump card by decreasing its utility
             for card in utilities:
                 if self.get_card(card[0]).suit == game.trump.suit:
-                    utilities[utilities.index(card)] = (card[0], card[1] - 1000)    # NOT REALLY DOING ANYTHING BUT IT SHOULD RIGHT?
+                    utilities[utilities.index(card)] = (card[0], card[1] - self.params['trump_penalty'])
         ##############################################################
         # NOTE: In here, put individual strategies that you remember #
         ##############################################################
@@ -653,9 +679,6 @@ class PredictorPlayer (BeliefPlayer):
             round_suit = best_card.suit
         self.hand.remove(best_card)
 
-        if self.verbose and mode == 'auto' or (mode == 'human' and self.name != 'Leitao'):
-            print(colored(f"{self.name} played {best_card.name}", 'green', attrs=['bold']))
-
         return best_card, round_suit
 
     def get_strategy(self) -> str:
@@ -665,3 +688,188 @@ class PredictorPlayer (BeliefPlayer):
         '''
 
         return 'Deck Predictor'
+
+
+class HonestPredictorPlayer (PredictorPlayer):
+    '''
+        HonestPredictorPlayer ->
+            - id: id of the player
+            - name: player name
+            - team: team object to which the player belongs
+            - v: verbose
+        Predicts the cards of the players after it from its beliefs only, never from their hands.
+        The cards each player may hold are merged into classes with the same trick outcome, the least
+        likely classes are pruned and the combinations are sampled when there are still too many
+        Parameters:
+            - trump_penalty, penalty_rounds: as the predictor
+            - mass: probability mass of the cards of each player kept in the enumeration
+            - samples: most combinations enumerated exactly, more are valued on this many samples
+            - book, book_best: as the cooperative player
+    '''
+
+    __slots__ = ()
+
+    PARAMS = {**PredictorPlayer.PARAMS, 'mass': 0.95, 'samples': 1000, 'book': None, 'book_best': False}
+
+    def candidate_cards(self, player:Player, round_suit:int) -> list[int]:
+        '''
+            Cards (indices) a player may play according to the beliefs: the cards of the round suit
+            it may hold, or any card it may hold if it may not have the round suit
+        '''
+
+        beliefs = self.beliefs[player.id - 1]
+        suits = [round_suit] if beliefs[round_suit].any() else range(4)
+
+        return [suit * 10 + int(order) for suit in suits for order in np.flatnonzero(beliefs[suit])]
+
+    def candidate_classes(self, player:Player, cards:list[int], winning:int,
+                          others:list[int]) -> tuple[np.ndarray, np.ndarray]:
+        '''
+            Merges the candidate cards of a player that lead to the same trick outcome: cards that cannot
+            beat the card winning the round before the player (winning) with the same value, and cards of
+            the same suit and value with no card of the other players (others) in between. Returns a card
+            of each class and the probability of the class, without the least likely classes beyond the
+            probability mass
+        '''
+
+        classes = {}
+        for card in cards:
+            suit, order = divmod(card, 10)
+            if not beats(card, winning, self.state.trump):
+                key = (-1, VALUES[order], 0)
+            else:
+                key = (suit, VALUES[order], sum(1 for other in others if other // 10 == suit and other % 10 < order))
+            representative, probability = classes.get(key, (card, 0.0))
+            classes[key] = (representative, probability + self.beliefs[player.id - 1, suit, order])
+
+        representatives = np.array([card for card, _ in classes.values()])
+        probabilities = np.array([probability for _, probability in classes.values()])
+        probabilities /= probabilities.sum()
+
+        # The most likely classes up to the probability mass
+        likely = np.argsort(-probabilities, kind='stable')
+        kept = likely[:np.searchsorted(np.cumsum(probabilities[likely]), self.params['mass'] - 1e-9) + 1]
+
+        return representatives[kept], probabilities[kept] / probabilities[kept].sum()
+
+    def sampled_utility(self, played:list[int], card:int, other_cards:list[np.ndarray],
+                        other_probabilities:list[np.ndarray], rng:np.random.Generator) -> float:
+        '''
+            Mean utility of a card over samples of the other players' cards
+        '''
+
+        size = self.params['samples']
+        columns = [np.full(size, known) for known in played + [card]]
+        for cards, probabilities in zip(other_cards, other_probabilities):
+            columns.append(cards[rng.choice(len(cards), size=size, p=probabilities)])
+        winner, points = complete_tricks(np.column_stack(columns), self.state.trump)
+
+        return float(np.mean(np.where((winner - len(played)) % 2 == 0, points, -points)))
+
+    def card_utilities(self, i:int, cards_played_in_round:list[Card], round_suit:str, players_order:list[Player],
+                       game:Game) -> dict[Card, float]:
+        '''
+            Expected utility of each card the player may play, predicting the cards of the players
+            after it from the beliefs. Under a deadline, only the cards valued so far are considered
+        '''
+
+        played = [card_index(card) for card in cards_played_in_round]
+        others = players_order[i + 1:]
+        rng = None
+
+        utility_per_card = {}
+        for card in legal_moves(self.state, self.seat).cards():
+            if utility_per_card and not self.time_left():
+                break
+
+            suit = card // 10 if i == 0 else SUITS.index(round_suit)
+            trick = played + [card]
+            winning = trick[trick_winner(trick, self.state.trump)]
+            candidates = [self.candidate_cards(player, suit) for player in others]
+            other_cards, other_probabilities = [], []
+            for k, player in enumerate(others):
+                rest = trick + [other for j in range(len(others)) if j != k for other in candidates[j]]
+                cards, probabilities = self.candidate_classes(player, candidates[k], winning, rest)
+                other_cards.append(cards)
+                other_probabilities.append(probabilities)
+
+            if prod(len(cards) for cards in other_cards) <= self.params['samples']:
+                utility = expected_utilities(played, np.array([card]), other_cards, other_probabilities, self.state.trump)[0]
+            else:
+                rng = rng or np.random.default_rng(self.rng.randint(0, 2 ** 32 - 1))
+                utility = self.sampled_utility(played, card, other_cards, other_probabilities, rng)
+            utility_per_card[self.state.cards[card]] = utility
+
+        return utility_per_card
+
+    def play_round(self, i:int, cards_played_in_round:list[Card], round_suit:str, players_order:list[Player], game:Game, mode:str, num_round:int) -> tuple[Card, str]:
+        '''
+            As the predictor, but the lead of the first round may come from the opening book
+        '''
+
+        card_played = self.book_lead(i)
+        if card_played is not None:
+            return card_played, card_played.suit
+
+        return super().play_round(i, cards_played_in_round, round_suit, players_order, game, mode, num_round)
+
+    def get_strategy(self) -> str:
+        '''
+            Return the strategy of the player
+        '''
+
+        return 'Honest Predictor'
+
+
+class LearnedPlayer (BeliefPlayer):
+    '''
+        LearnedPlayer ->
+            - id: id of the player
+            - name: player name
+            - team: team object to which the player belongs
+            - v: verbose
+            - evaluator: function that values a feature matrix (None: the model of the weights parameter),
+              set to share batches of evaluations between games (learned.Batcher)
+        Parameters:
+            - weights: file with the weights of the value model (learned.py fit)
+    '''
+
+    __slots__ = ('evaluator',)
+
+    PARAMS = {'weights': './results/learned.npz'}
+
+    def __init__(self, id:int, name:str, team:'Team', v:bool) -> None:
+        super().__init__(id, name, team, v)
+
+        self.evaluator = None
+
+    def play_round(self, i:int, round_suit:str, game:Game, num_round:int) -> tuple[Card, str]:
+        '''
+            Play a round of Sueca, selecting the card with the highest predicted final score of the team,
+            with every legal card valued in a single batch
+        '''
+
+        state = self.state
+        legal = legal_moves(state, self.seat).cards()
+        n = len(legal)
+        seen = ALL_CARDS ^ (state.hand_mask(0) | state.hand_mask(1) | state.hand_mask(2) | state.hand_mask(3))
+        beliefs = self.beliefs[[player.id - 1 for player in game.seats]]
+
+        X = features(np.full(n, state.hand_mask(self.seat), dtype=np.uint64), np.tile(state.trick, (n, 1)),
+                     np.full(n, seen, dtype=np.uint64), np.broadcast_to(beliefs, (n, 4, 4, 10)),
+                     np.full(n, state.trump), np.full(n, self.seat), np.full(n, i), np.full(n, num_round), np.array(legal))
+        evaluate = self.evaluator or load_model(self.params['weights']).evaluate
+        values = evaluate(X)
+
+        card_played = self.play_card(legal[int(np.argmax(values))])
+        if i == 0:
+            round_suit = card_played.suit
+
+        return card_played, round_suit
+
+    def get_strategy(self) -> str:
+        '''
+            Return the strategy of the player
+        '''
+
+        return 'Learned Player'
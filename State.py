@@ -0,0 +1,248 @@
+from Card import VALUES
+
+# Seats are fixed for the whole game: seats 0 and 2 play together against seats 1 and 3
+PARTNER = (2, 3, 0, 1)
+OPPONENTS = ((1, 3), (0, 2), (1, 3), (0, 2))
+TEAM = (0, 1, 0, 1)
+# Seat that plays in each position of a round, given the seat of the leader
+TURN = tuple(tuple((leader + position) % 4 for position in range(4)) for leader in range(4))
+
+
+def beats(card:int, winning:int, trump:int) -> bool:
+    '''
+        Whether a card (index) beats the card winning the round so far
+        (same suit and higher order, or trump over a non trump card)
+    '''
+
+    return card // 10 == winning // 10 and card % 10 > winning % 10 or\
+        card // 10 == trump and winning // 10 != trump
+
+def trick_winner(cards:list[int], trump:int) -> int:
+    '''
+        Position in the round of the winning card (same rules as Game.calculate_round_points)
+    '''
+
+    winner = 0
+    for i in range(1, len(cards)):
+        if beats(cards[i], cards[winner], trump):
+            winner = i
+
+    return winner
+
+
+class GameState:
+    '''
+        GameState ->
+            - trump: suit index of the trump
+            - leader: seat of the player that leads the current round
+            - trick: card indices played in the current round, by position (-1 if not played yet)
+            - played: number of cards played in the current round
+            - winning: position in the round of the card winning so far
+            - points: points played in the current round
+            - scores: points won by each team (seats 0 and 2, seats 1 and 3)
+            - hands: cards of each seat by suit, as 10 bit masks [seat][suit]
+            - cards: card object of each card index, once dealt
+            - dealt: order in which each card was dealt (breaks ties between cards of the same order)
+            - ties: the same tie breaks as tables (rule_tables.tie_breaks), computed on first use
+    '''
+
+    def __init__(self, leader:int=0) -> None:
+        self.trump = -1
+        self.leader = leader
+        self.trick = [-1, -1, -1, -1]
+        self.played = 0
+        self.winning = 0
+        self.points = 0
+        self.scores = [0, 0]
+        self.hands = [[0, 0, 0, 0] for _ in range(4)]
+        self.cards = [None] * 40
+        self.dealt = [0] * 40
+        self.num_dealt = 0
+        self.ties = None
+
+    def deal(self, seat:int, card:int, card_object=None) -> None:
+        '''
+            Adds a card (index) to the hand of a seat
+        '''
+
+        self.hands[seat][card // 10] |= 1 << card % 10
+        self.cards[card] = card_object
+        self.dealt[card] = self.num_dealt
+        self.num_dealt += 1
+
+    def hand_mask(self, seat:int) -> int:
+        '''
+            Cards of a seat as a 40 bit mask (bit = card index)
+        '''
+
+        hand = self.hands[seat]
+
+        return hand[0] | hand[1] << 10 | hand[2] << 20 | hand[3] << 30
+
+    def seat(self, position:int) -> int:
+        '''
+            Seat that plays in a position of the current round
+        '''
+
+        return TURN[self.leader][position]
+
+    def to_play(self) -> int:
+        '''
+            Seat of the player to play next
+        '''
+
+        return TURN[self.leader][self.played]
+
+    def winning_seat(self) -> int:
+        '''
+            Seat of the player winning the current round so far
+        '''
+
+        return TURN[self.leader][self.winning]
+
+    def winning_card(self) -> int:
+        '''
+            Index of the card winning the current round so far
+        '''
+
+        return self.trick[self.winning]
+
+    def round_suit(self) -> int:
+        '''
+            Suit index of the current round (-1 before the first card)
+        '''
+
+        return self.trick[0] // 10 if self.played else -1
+
+    def play(self, card:int) -> None:
+        '''
+            Plays a card (index) in the current round, keeping track of the winning card
+        '''
+
+        self.hands[TURN[self.leader][self.played]][card // 10] ^= 1 << card % 10
+        self.trick[self.played] = card
+        if self.played and beats(card, self.trick[self.winning], self.trump):
+            self.winning = self.played
+        self.played += 1
+        self.points += VALUES[card % 10]
+
+    def end_round(self) -> tuple[int, int]:
+        '''
+            Closes the current round: the winner scores its points and leads the next round
+            Returns the seat of the winner and the points of the round
+        '''
+
+        winner, points = self.winning_seat(), self.points
+        self.scores[TEAM[winner]] += points
+
+        self.leader = winner
+        self.trick = [-1, -1, -1, -1]
+        self.played = 0
+        self.winning = 0
+        self.points = 0
+
+        return winner, points
+
+
+class LegalMoves:
+    '''
+        LegalMoves ->
+            - suit: suit the player must follow (-1 if any card can be played)
+            - masks: 10 bit mask of the candidate cards of each suit
+            - dealt: order in which the cards were dealt, to break ties between suits
+              the same way as the sorted hand of the player (Player.hand)
+    '''
+
+    def __init__(self, suit:int, masks:list[int], dealt:list[int]) -> None:
+        self.suit = suit
+        self.masks = masks
+        self.dealt = dealt
+
+    def __len__(self) -> int:
+        return sum(mask.bit_count() for mask in self.masks)
+
+    def __bool__(self) -> bool:
+        return any(self.masks)
+
+    def cards(self) -> list[int]:
+        '''
+            Candidate cards (indices), from the weakest to the strongest of each suit
+        '''
+
+        cards = []
+        for suit, mask in enumerate(self.masks):
+            while mask:
+                low = mask & -mask
+                cards.append(suit * 10 + low.bit_length() - 1)
+                mask ^= low
+
+        return cards
+
+    def weakest(self) -> int:
+        '''
+            Candidate with the lowest order (the first dealt one if several suits tie), -1 if none
+        '''
+
+        best = -1
+        for suit, mask in enumerate(self.masks):
+            if mask:
+                card = suit * 10 + (mask & -mask).bit_length() - 1
+                if best < 0 or card % 10 < best % 10 or\
+                        card % 10 == best % 10 and self.dealt[card] < self.dealt[best]:
+                    best = card
+
+        return best
+
+    def strongest(self) -> int:
+        '''
+            Candidate with the highest order (the last dealt one if several suits tie), -1 if none
+        '''
+
+        best = -1
+        for suit, mask in enumerate(self.masks):
+            if mask:
+                card = suit * 10 + mask.bit_length() - 1
+                if best < 0 or card % 10 > best % 10 or\
+                        card % 10 == best % 10 and self.dealt[card] > self.dealt[best]:
+                    best = card
+
+        return best
+
+    def lowest_winning(self, order:int) -> int:
+        '''
+            Weakest candidate of the followed suit with an order higher than the given one, -1 if none
+        '''
+
+        if self.suit < 0:
+            return -1
+
+        above = self.masks[self.suit] >> (order + 1) << (order + 1)
+        if not above:
+            return -1
+
+        return self.suit * 10 + (above & -above).bit_length() - 1
+
+
+def suit_moves(state:GameState, seat:int, suit:int) -> LegalMoves:
+    '''
+        Cards of one suit in the hand of a seat
+    '''
+
+    masks = [0, 0, 0, 0]
+    masks[suit] = state.hands[seat][suit]
+
+    return LegalMoves(suit, masks, state.dealt)
+
+def legal_moves(state:GameState, seat:int) -> LegalMoves:
+    '''
+        Cards a seat can play in the current round: the cards of the round suit if it has any,
+        otherwise any card of its hand
+    '''
+
+    hand = state.hands[seat]
+    if state.played:
+        suit = state.trick[0] // 10
+        if hand[suit]:
+            return suit_moves(state, seat, suit)
+
+    return LegalMoves(-1, list(hand), state.dealt)
@@ -9,6 +9,8 @@ class Team:
             - initial_points: initial points of the team (0 - 120)
     '''
 
+    __slots__ = ('name', 'players', 'score', 'initial_points')
+
     def __init__(self, name) -> None:
         self.name = name
         self.players = []
@@ -27,9 +29,7 @@ class Team:
             Get the partner of a player
         '''
 
-        for p in self.players:
-            if p.name != player.name:
-                return p
+        return self.players[1] if self.players[0] is player else self.players[0]
 
     def dump_to_json(self) -> dict[str, any]:
         '''
@@ -0,0 +1,233 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from random import Random, seed
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from Card import SUITS, card_index
+from Game import Game
+from Player import BeliefPlayer, CooperativePlayer, CARD_POINTS, ORDER_BITS
+from State import PARTNER
+from deals import open_corpus, random_deals
+
+
+############################################# Constants #############################################
+
+SEATS = np.arange(4)
+CARD_BITS = np.arange(40, dtype=np.uint64)
+
+
+########################################## Batch ##########################################
+
+class BatchGames:
+    '''
+        BatchGames ->
+            - games: games played in lockstep, one per deal
+            - beliefs: beliefs of every seat of every game [game, observer seat, player id - 1, suit, order],
+              the beliefs of each belief player are a view of its slice
+            - believers: whether the player of each seat keeps beliefs [game, seat]
+            - ids: id - 1 of the player of each seat [game, seat]
+            - holds: cards each player may still have, by suit, as 10 bit masks, for every observer
+              [game, observer seat, player id - 1, suit] (CooperativePlayer.may_hold)
+            - team_points: expected points of each suit held by every observer and its partner [game, seat, suit]
+              (the team_points of the cooperative players are views of it)
+            - cards_played, round_suits: cards and suit of the current round of each game
+        Every card played is observed by the whole batch at once: the card is removed from the beliefs,
+        a player that does not follow loses the round suit and the beliefs are renormalised. Decisions
+        are made by the players of each game as in Game, each game with a random.Random of its own
+    '''
+
+    def __init__(self, sporting:str, benfica:str, deals:np.ndarray, seeds:list[int], sporting_params:dict=None,
+                 benfica_params:dict=None) -> None:
+        self.games = []
+        for deal, game_seed in zip(deals, seeds):
+            game = Game(sporting, benfica, False, 'auto', sporting_params, benfica_params, deal=deal)
+            rng = Random(int(game_seed))
+            for player in game.seats:
+                player.rng = rng
+            self.games.append(game)
+
+        size = len(self.games)
+        self.beliefs = np.zeros((size, 4, 4, 4, 10))
+        self.believers = np.array([[isinstance(player, BeliefPlayer) for player in game.seats] for game in self.games], dtype=bool).reshape(size, 4)
+        self.ids = np.array([[player.id - 1 for player in game.seats] for game in self.games], dtype=np.int64).reshape(size, 4)
+        self.holds = np.zeros((size, 4, 4, 4), dtype=np.int64)
+        self.team_points = np.zeros((size, 4, 4))
+        self.cooperative = False
+        for g, game in enumerate(self.games):
+            for seat, player in enumerate(game.seats):
+                if isinstance(player, BeliefPlayer):
+                    player.beliefs = self.beliefs[g, seat]
+                if isinstance(player, CooperativePlayer):
+                    player.team_points = self.team_points[g, seat]
+                    self.cooperative = True
+
+        self.cards_played = [[] for _ in range(size)]
+        self.round_suits = [''] * size
+
+    def deal(self) -> None:
+        '''
+            Deals every game and sets the initial beliefs of every seat from its hand
+        '''
+
+        for game in self.games:
+            game.hand_cards(beliefs=False)
+
+        size = len(self.games)
+        hands = np.array([[game.state.hand_mask(seat) for seat in range(4)] for game in self.games], dtype=np.uint64).reshape(size, 4)
+        own = (hands[:, :, None] >> CARD_BITS & 1).astype(bool)                 # [game, seat, card]
+
+        # Every card not in the hand may be in any of the other hands
+        beliefs = self.beliefs.reshape(size, 4, 4, 40)
+        beliefs[:] = np.where(own[:, :, None, :], 0, 1 / 3)
+        beliefs[np.arange(size)[:, None], SEATS, self.ids] = own
+        self.refresh()
+
+    def refresh(self) -> None:
+        '''
+            Aggregates of the cooperative players (CooperativePlayer.refresh_suit) of every suit
+        '''
+
+        if not self.cooperative:
+            return
+
+        games = np.arange(len(self.games))[:, None]
+        own = self.beliefs[games, SEATS, self.ids]
+        partner = self.beliefs[games, SEATS, self.ids[:, PARTNER]]
+
+        self.holds[:] = (self.beliefs != 0) @ ORDER_BITS
+        self.team_points[:] = np.sum(partner * CARD_POINTS + own * CARD_POINTS, axis=-1)
+
+    def observe(self, cards:np.ndarray, seats:np.ndarray, round_suits:np.ndarray) -> None:
+        '''
+            Every other seat of each game sees the card (index) a seat played in the round suit
+            (BeliefPlayer.update_beliefs for the whole batch)
+        '''
+
+        games = np.arange(len(self.games))
+        observers = self.believers & (SEATS != seats[:, None])
+        suits, orders = cards // 10, cards % 10
+
+        # After a card is spotted no one has it
+        seen = self.beliefs[games, :, :, suits, orders]
+        self.beliefs[games, :, :, suits, orders] = np.where(observers[:, :, None], 0, seen)
+
+        # A player that does not follow the round suit has no card of it
+        void = np.flatnonzero(suits != round_suits)
+        players, round_suits = self.ids[void, seats[void]], round_suits[void]
+        cut = self.beliefs[void, :, players, round_suits, :]
+        self.beliefs[void, :, players, round_suits, :] = np.where(observers[void][:, :, None], 0, cut)
+
+        # Every player that may still have a card is equally likely to have it
+        num_players = np.count_nonzero(self.beliefs, axis=2)
+        np.copyto(self.beliefs, (1 / np.maximum(num_players, 1))[:, :, None],
+                  where=(self.beliefs != 0) & observers[:, :, None, None, None])
+
+        self.refresh()
+
+    def play_turn(self, num_round:int, position:int) -> None:
+        '''
+            The player in a position of the current round of every game plays, then the cards are observed
+        '''
+
+        cards, seats, round_suits = [], [], []
+        for g, game in enumerate(self.games):
+            player = game.playersOrder[position]
+            if isinstance(player, CooperativePlayer):
+                player.may_hold = self.holds[g, player.seat].tolist()
+
+            card_played, self.round_suits[g] = game.decide(player, position, self.cards_played[g], self.round_suits[g], num_round)
+            card = card_index(card_played)
+            if game.recorder is not None:
+                game.recorder.record(game, player, card, num_round, position)
+            self.cards_played[g].append(card_played)
+            game.state.play(card)
+
+            cards.append(card)
+            seats.append(player.seat)
+            round_suits.append(SUITS.index(self.round_suits[g]))
+
+        self.observe(np.array(cards), np.array(seats), np.array(round_suits))
+
+    def play(self) -> list[str]:
+        '''
+            Plays every game of the batch, returns the winner of each game
+        '''
+
+        for num_round in range(10):
+            for position in range(4):
+                self.play_turn(num_round, position)
+
+            for g, game in enumerate(self.games):
+                game.game_info["Rounds"][num_round + 1] = game.end_round(self.cards_played[g])
+                self.cards_played[g] = []
+                self.round_suits[g] = ''
+
+        return [game.end_game() for game in self.games]
+
+def play_batches(sporting:str, benfica:str, deals:np.ndarray, base_seed:int, batch_size:int,
+                 sporting_params:dict=None, benfica_params:dict=None) -> list[Game]:
+    '''
+        Plays the deals in batches of batch_size games (game k seeded with base_seed + k)
+    '''
+
+    games = []
+    for start in range(0, len(deals), batch_size):
+        batch = BatchGames(sporting, benfica, deals[start:start + batch_size],
+                           range(base_seed + start, base_seed + min(start + batch_size, len(deals))),
+                           sporting_params, benfica_params)
+        batch.deal()
+        batch.play()
+        games += batch.games
+
+    return games
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Plays batches of games in lockstep with the beliefs of the batch in a single array')
+    parser.add_argument('-s', '--sporting', type=str, default='cooperative', help='Strategy of team Sporting')
+    parser.add_argument('-b', '--benfica', type=str, default='predictor', help='Strategy of team Benfica')
+    parser.add_argument('-n', '--num_games', type=int, default=1000, help='Number of games')
+    parser.add_argument('-g', '--batch_size', type=int, default=250, help='Games played in lockstep')
+    parser.add_argument('-d', '--deals', type=str, default=None, help='Deal corpus (deals.py), random deals otherwise')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the deals and of the games')
+    parser.add_argument('--check', action='store_true', help='Also play the deals one at a time with Game and compare')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    if args.deals:
+        deals = open_corpus(args.deals)[:args.num_games]
+    else:
+        deals = random_deals(np.random.default_rng(args.seed), args.num_games)
+
+    start = perf_counter()
+    games = play_batches(args.sporting, args.benfica, deals, args.seed, args.batch_size)
+    elapsed = perf_counter() - start
+    scores = np.array([[game.teams[0].score, game.teams[1].score] for game in games])
+    print(colored(f'{args.sporting} vs {args.benfica}: {len(games)} games in batches of {args.batch_size}, '
+                  f'{len(games) / elapsed:.1f} games/s', 'magenta', attrs=['bold']))
+    print(f'Sporting {np.mean(scores[:, 0] > scores[:, 1]):.1%}, Benfica {np.mean(scores[:, 0] < scores[:, 1]):.1%}, '
+          f'mean points {scores[:, 0].mean():.2f} - {scores[:, 1].mean():.2f}')
+
+    if args.check:
+        start = perf_counter()
+        different = 0
+        for k, (deal, game) in enumerate(zip(deals, games)):
+            seed(args.seed + k)
+            reference = Game(args.sporting, args.benfica, False, 'auto', deal=deal)
+            reference.hand_cards()
+            reference.play_game()
+            different += reference.game_info['Rounds'] != game.game_info['Rounds']
+        elapsed = perf_counter() - start
+        print(colored(f'Game: {len(games) / elapsed:.1f} games/s, {different} games played differently',
+                      'green' if not different else 'red', attrs=['bold']))
@@ -0,0 +1,185 @@
+############################################# Libraries #############################################
+
+import gzip
+from os import listdir, makedirs, replace
+from os.path import dirname, abspath, exists, isdir, join
+from shutil import rmtree
+from hashlib import sha256
+from json import dump, dumps, load
+from argparse import ArgumentParser
+from termcolor import colored
+
+
+############################################# Constants #############################################
+
+# Modules whose code decides the outcome of a game
+ENGINE_FILES = ['Card.py', 'Game.py', 'Player.py', 'State.py', 'Team.py', 'tricks.py', 'learned.py', 'deals.py', 'opening_book.py',
+                'canonical.py', 'rule_tables.py']
+ROOT = dirname(abspath(__file__))
+
+# Games are cached in blocks aligned on multiples of BLOCK seeds
+BLOCK = 100
+
+
+########################################## Keys ##########################################
+
+def file_hash(path:str) -> str:
+    '''
+        SHA-256 of the contents of a file
+    '''
+
+    with open(path, 'rb') as f:
+        return sha256(f.read()).hexdigest()
+
+def engine_hash() -> str:
+    '''
+        Hash of the code of the game engine and the strategies
+    '''
+
+    digest = sha256()
+    for name in ENGINE_FILES:
+        digest.update(name.encode())
+        digest.update(file_hash(join(ROOT, name)).encode())
+
+    return digest.hexdigest()
+
+def strategy_fingerprint(strategy:str, params:dict) -> dict:
+    '''
+        Everything that decides how a strategy plays: its name, its parameters, the contents
+        of its weights for the learned strategy and of its opening book, if it has one
+    '''
+
+    fingerprint = {'strategy': strategy, 'params': params}
+    if strategy == 'learned':
+        from Player import LearnedPlayer
+        fingerprint['weights'] = file_hash(params.get('weights', LearnedPlayer.PARAMS['weights']))
+    if params.get('book'):
+        fingerprint['book'] = file_hash(params['book'])
+
+    return fingerprint
+
+def pairing_key(sporting:str, benfica:str, sporting_params:dict, benfica_params:dict, deals:str=None) -> tuple[str, dict]:
+    '''
+        Content address of a pairing under the current engine (and deal corpus), and the description it is computed from
+    '''
+
+    description = {'sporting': strategy_fingerprint(sporting, sporting_params),
+                   'benfica': strategy_fingerprint(benfica, benfica_params),
+                   'engine': engine_hash()}
+    if deals:
+        description['deals'] = file_hash(deals)
+
+    return sha256(dumps(description, sort_keys=True).encode()).hexdigest(), description
+
+
+########################################## Cache ##########################################
+
+class ResultCache:
+    '''
+        ResultCache ->
+            - key: content address of the pairing (strategies, parameters, engine code and deal corpus)
+            - directory: directory of the cached blocks of the pairing
+        Each block holds the aggregates of a range of seeds (game i of a run is seeded with seed + i)
+        and the logs of its games, so a run can be assembled from cached blocks and new games
+    '''
+
+    def __init__(self, root:str, sporting:str, benfica:str, sporting_params:dict, benfica_params:dict, deals:str=None) -> None:
+        self.key, description = pairing_key(sporting, benfica, sporting_params, benfica_params, deals)
+        self.directory = join(root, self.key)
+
+        if not exists(join(self.directory, 'meta.json')):
+            makedirs(self.directory, exist_ok=True)
+            with open(join(self.directory, 'meta.json'), 'w') as f:
+                dump(description, f, indent=4)
+
+    def blocks(self, first_seed:int, start:int, stop:int) -> list[tuple[int, int]]:
+        '''
+            Splits the games [start, stop) of a run in ranges aligned on blocks of seeds
+        '''
+
+        bounds = [start]
+        for seed in range((first_seed + start) // BLOCK * BLOCK + BLOCK, first_seed + stop, BLOCK):
+            bounds.append(seed - first_seed)
+        bounds.append(stop)
+
+        return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+    def path(self, first:int, last:int) -> str:
+        '''
+            File of the block of the seeds [first, last)
+        '''
+
+        return join(self.directory, f'{first}_{last}.json.gz')
+
+    def load(self, first:int, last:int) -> dict:
+        '''
+            Aggregates and game logs of the seeds [first, last), None if they were never played
+        '''
+
+        if not exists(self.path(first, last)):
+            return None
+
+        with gzip.open(self.path(first, last), 'rt') as f:
+            return load(f)
+
+    def store(self, first:int, last:int, aggregates:dict, games:list[dict]) -> None:
+        '''
+            Stores the aggregates and game logs of the seeds [first, last)
+        '''
+
+        with gzip.open(self.path(first, last) + '.tmp', 'wt') as f:
+            dump({'aggregates': aggregates, 'games': games}, f)
+        replace(self.path(first, last) + '.tmp', self.path(first, last))
+
+
+########################################## Main Program #############################################
+
+def entries(root:str) -> list[tuple[str, dict, int]]:
+    '''
+        Key, description and number of cached games of every pairing in the cache
+    '''
+
+    found = []
+    for key in sorted(listdir(root)) if isdir(root) else []:
+        if not exists(join(root, key, 'meta.json')):
+            continue
+        with open(join(root, key, 'meta.json'), 'r') as f:
+            description = load(f)
+        games = 0
+        for name in listdir(join(root, key)):
+            if name.endswith('.json.gz'):
+                first, last = name[:-len('.json.gz')].split('_')
+                games += int(last) - int(first)
+        found.append((key, description, games))
+
+    return found
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Cache of simulation results')
+    parser.add_argument('-c', '--cache', type=str, default='./results/cache', help='Directory of the cache')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('info', help='List the cached pairings')
+    commands.add_parser('prune', help='Remove the pairings cached with an older version of the engine')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    current = engine_hash()
+    for key, description, games in entries(args.cache):
+        stale = description['engine'] != current
+        pairing = ' vs '.join(side['strategy'] + (dumps(side['params']) if side['params'] else '')
+                              for side in (description['sporting'], description['benfica']))
+        if 'deals' in description:
+            pairing += f' (deals {description["deals"][:8]})'
+        if args.command == 'prune' and stale:
+            rmtree(join(args.cache, key))
+            print(colored(f'Removed {pairing} ({games} games)', 'red'))
+        elif args.command == 'info':
+            line = f'{key[:12]}  {pairing:<40} {games:>8} games'
+            print(line + colored('  (stale engine)', 'red') if stale else line)
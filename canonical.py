@@ -0,0 +1,130 @@
+############################################# Libraries #############################################
+
+from Card import SUITS
+
+
+############################################# Constants #############################################
+
+SUIT_BITS = (1 << 10) - 1
+TRUMP = 0   # canonical suit of the trump
+
+
+########################################## Permutations ##########################################
+
+def suit_permutation(hands:tuple[int, ...], trick:tuple[int, ...], trump:int, seen:int=0) -> tuple[int, ...]:
+    '''
+        Canonical suit of each suit: the trump becomes suit 0 and the other suits,
+        which are interchangeable, are sorted by what each player holds, what was played
+        in the current round and what was already seen of them
+    '''
+
+    def signature(suit:int) -> tuple:
+        shift = 10 * suit
+        return (tuple(hand >> shift & SUIT_BITS for hand in hands),
+                tuple(card % 10 if card // 10 == suit else -1 for card in trick),
+                seen >> shift & SUIT_BITS)
+
+    others = sorted((s for s in range(len(SUITS)) if s != trump), key=signature, reverse=True)
+    permutation = [0] * len(SUITS)
+    permutation[trump] = TRUMP
+    for canonical_suit, suit in enumerate(others, start=1):
+        permutation[suit] = canonical_suit
+
+    return tuple(permutation)
+
+def inverse(permutation:tuple[int, ...]) -> tuple[int, ...]:
+    '''
+        Inverse of a suit permutation
+    '''
+
+    inverted = [0] * len(permutation)
+    for suit, canonical_suit in enumerate(permutation):
+        inverted[canonical_suit] = suit
+
+    return tuple(inverted)
+
+def permute_card(card:int, permutation:tuple[int, ...]) -> int:
+    '''
+        Card index after changing its suit by the permutation
+    '''
+
+    return permutation[card // 10] * 10 + card % 10
+
+def permute_mask(mask:int, permutation:tuple[int, ...]) -> int:
+    '''
+        Bitmask of cards after changing their suits by the permutation
+    '''
+
+    permuted = 0
+    for suit, canonical_suit in enumerate(permutation):
+        permuted |= (mask >> (10 * suit) & SUIT_BITS) << (10 * canonical_suit)
+
+    return permuted
+
+
+########################################## Canonical States ##########################################
+
+def canonicalize(hands:tuple[int, ...], trick:tuple[int, ...]=(), trump:int=0, seen:int=0) -> tuple[tuple, tuple[int, ...]]:
+    '''
+        Canonical key of a state (hands as bitmasks, cards of the current round, trump suit and seen cards)
+        and the suit permutation that maps the state to it.
+        States that only differ by renaming the non trump suits share the same key.
+    '''
+
+    permutation = suit_permutation(hands, trick, trump, seen)
+    key = (tuple(permute_mask(hand, permutation) for hand in hands),
+           tuple(permute_card(card, permutation) for card in trick),
+           permute_mask(seen, permutation))
+
+    return key, permutation
+
+def to_canonical(card:int, permutation:tuple[int, ...]) -> int:
+    '''
+        Maps a move of the original state to the canonical state
+    '''
+
+    return permute_card(card, permutation)
+
+def from_canonical(card:int, permutation:tuple[int, ...]) -> int:
+    '''
+        Maps a move of the canonical state back to the original state
+    '''
+
+    return permute_card(card, inverse(permutation))
+
+
+class CanonicalMemo:
+    '''
+        CanonicalMemo ->
+            - table: dictionary indexed by canonical keys
+            - hits: number of lookups found in the table
+            - misses: number of lookups not found in the table
+        Memo table of moves shared by all the states that are equal up to suit renaming
+    '''
+
+    def __init__(self) -> None:
+        self.table = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, hands:tuple[int, ...], trick:tuple[int, ...], trump:int, seen:int=0) -> int:
+        '''
+            Stored move of a state, mapped back to its suits (None if the state was never stored)
+        '''
+
+        key, permutation = canonicalize(hands, trick, trump, seen)
+        if key not in self.table:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return from_canonical(self.table[key], permutation)
+
+    def put(self, hands:tuple[int, ...], trick:tuple[int, ...], trump:int, seen:int, move:int) -> None:
+        '''
+            Stores the move of a state under its canonical key
+        '''
+
+        key, permutation = canonicalize(hands, trick, trump, seen)
+        self.table[key] = to_canonical(move, permutation)
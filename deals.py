@@ -0,0 +1,104 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from functools import lru_cache
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+
+
+############################################# Constants #############################################
+
+# One deal per row: the cards in the order they are dealt (seat 0 gets the first 10, seat 1 the
+# next 10, ...; the last card is the trump) and the seating of the players
+DEAL = np.dtype([
+    ('cards', 'u1', (40,)),         # card indices (suit * 10 + order)
+    ('seating', 'u1'),              # bits below
+])
+
+# Seating bits: the players of a team swap seats, team Benfica sits in the first seat
+SWAP_TEAM_1 = 1
+SWAP_TEAM_2 = 2
+TEAM_2_FIRST = 4
+
+
+########################################## Corpus ##########################################
+
+def random_deals(rng:np.random.Generator, size:int) -> np.ndarray:
+    '''
+        Shuffles size decks at once
+    '''
+
+    deals = np.zeros(size, dtype=DEAL)
+    deals['cards'] = rng.permuted(np.broadcast_to(np.arange(40, dtype=np.uint8), (size, 40)), axis=1)
+    deals['seating'] = rng.integers(0, 8, size, dtype=np.uint8)
+
+    return deals
+
+def generate(path:str, num_deals:int, base_seed:int, chunk:int=1_000_000) -> None:
+    '''
+        Writes num_deals random deals to a .npy file, a chunk of deals at a time
+    '''
+
+    rng = np.random.default_rng(base_seed)
+    corpus = np.lib.format.open_memmap(path, mode='w+', dtype=DEAL, shape=(num_deals,))
+    for start in range(0, num_deals, chunk):
+        size = min(chunk, num_deals - start)
+        corpus[start:start + size] = random_deals(rng, size)
+
+    corpus.flush()
+    del corpus
+
+@lru_cache(maxsize=None)
+def open_corpus(path:str) -> np.memmap:
+    '''
+        Memory maps a corpus read only (once per process, the pages are shared between processes)
+    '''
+
+    corpus = np.load(path, mmap_mode='r')
+    if corpus.dtype != DEAL:
+        raise ValueError(f'{path} is not a deal corpus')
+
+    return corpus
+
+def trumps(corpus:np.ndarray) -> np.ndarray:
+    '''
+        Trump suit of every deal
+    '''
+
+    return corpus['cards'][:, 39] // 10
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Corpus of pre-generated deals shared by the simulations')
+    parser.add_argument('-o', '--output', type=str, default='./results/deals.npy', help='File of the corpus')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    create = commands.add_parser('generate', help='Generate a corpus of random deals')
+    create.add_argument('-n', '--num_deals', type=int, default=1_000_000, help='Number of deals')
+    create.add_argument('--seed', type=int, default=0, help='Seed of the corpus')
+    create.add_argument('--chunk', type=int, default=1_000_000, help='Deals shuffled at once')
+
+    commands.add_parser('info', help='Print the size of the corpus and how the trumps and seatings are spread')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    match args.command:
+        case 'generate':
+            start = perf_counter()
+            generate(args.output, args.num_deals, args.seed, args.chunk)
+            print(colored(f'Wrote {args.num_deals} deals to {args.output} in {perf_counter() - start:.1f} s', 'magenta', attrs=['bold']))
+        case 'info':
+            corpus = open_corpus(args.output)
+            print(colored(f'{args.output}: {len(corpus)} deals ({corpus.nbytes / 1e6:.1f} MB)', 'magenta', attrs=['bold']))
+            print('Trumps:   ' + ' '.join(f'{n / len(corpus):.3f}' for n in np.bincount(trumps(corpus), minlength=4)))
+            print('Seatings: ' + ' '.join(f'{n / len(corpus):.3f}' for n in np.bincount(corpus['seating'], minlength=8)))
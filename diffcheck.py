@@ -0,0 +1,306 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from itertools import product
+from json import dump, load
+from random import seed
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from Game import Game
+from batch_engine import BatchGames
+from Player import BeliefPlayer, PredictorPlayer
+from deals import DEAL, open_corpus, random_deals
+
+
+############################################# Constants #############################################
+
+# Deal every shrunk deal is moved towards: seat 0 gets cards 0 - 9, seat 1 cards 10 - 19, ...
+CANONICAL = np.arange(40, dtype=np.uint8)
+
+
+########################################## Engines ##########################################
+
+class Trace:
+    '''
+        Trace ->
+            - cards: card (index) played at every turn of the game
+            - seats: seat of the player of every turn
+            - beliefs: beliefs of every seat before every turn and at the end of the game
+              (zeros for players without beliefs)
+            - scores: final score of Sporting and Benfica
+        Everything an engine observably decides while playing a deal
+    '''
+
+    def __init__(self) -> None:
+        self.cards = []
+        self.seats = []
+        self.beliefs = []
+        self.scores = None
+
+    def snapshot(self, game:Game) -> None:
+        '''
+            Keeps a copy of the beliefs of every seat
+        '''
+
+        self.beliefs.append(np.array([player.beliefs if isinstance(player, BeliefPlayer) else np.zeros((4, 4, 10))
+                                      for player in game.seats]))
+
+    def record(self, game:Game, player, card:int, num_round:int, position:int) -> None:
+        '''
+            Called by Game.play_round with every card played
+        '''
+
+        self.cards.append(card)
+        self.seats.append(player.seat)
+        self.snapshot(game)
+
+def play_object(sporting:str, benfica:str, deals:list, seeds:list[int], vectorized:bool) -> list[Trace]:
+    '''
+        Plays the deals one at a time with the object engine (Game), the predictor enumerating
+        the tricks vectorized or one at a time
+    '''
+
+    traces = []
+    for deal, game_seed in zip(deals, seeds):
+        seed(game_seed)
+        game = Game(sporting, benfica, False, 'auto', deal=deal)
+        for player in game.seats:
+            if isinstance(player, PredictorPlayer):
+                player.vectorized = vectorized
+        trace = Trace()
+        game.recorder = trace
+        game.hand_cards()
+        game.play_game()
+        trace.snapshot(game)
+        trace.scores = (game.teams[0].score, game.teams[1].score)
+        traces.append(trace)
+
+    return traces
+
+def play_batch(sporting:str, benfica:str, deals:list, seeds:list[int]) -> list[Trace]:
+    '''
+        Plays every deal in a single batch of the lockstep engine (batch_engine.BatchGames),
+        so the indexing across the games of the batch is checked too
+    '''
+
+    batch = BatchGames(sporting, benfica, deals, seeds)
+    traces = [Trace() for _ in batch.games]
+    for game, trace in zip(batch.games, traces):
+        game.recorder = trace
+    batch.deal()
+    batch.play()
+    for game, trace in zip(batch.games, traces):
+        trace.snapshot(game)
+        trace.scores = (game.teams[0].score, game.teams[1].score)
+
+    return traces
+
+# Every engine plays (sporting, benfica, deals, seeds) and returns the Trace of each deal
+ENGINES = {
+    'reference': lambda sporting, benfica, deals, seeds: play_object(sporting, benfica, deals, seeds, False),
+    'vectorized': lambda sporting, benfica, deals, seeds: play_object(sporting, benfica, deals, seeds, True),
+    'batch': play_batch,
+}
+
+
+########################################## Diff ##########################################
+
+def diff(reference:Trace, candidate:Trace, atol:float) -> str:
+    '''
+        First difference between two traces of the same deal, None if they agree
+    '''
+
+    for turn, (card, other) in enumerate(zip(reference.cards, candidate.cards)):
+        where = f'round {turn // 4 + 1}, turn {turn % 4 + 1}'
+        if not np.allclose(reference.beliefs[turn], candidate.beliefs[turn], rtol=0, atol=atol):
+            seat = int(np.abs(reference.beliefs[turn] - candidate.beliefs[turn]).reshape(4, -1).max(axis=1).argmax())
+            return f'{where}: beliefs of seat {seat} differ before the card is played'
+        if card != other or reference.seats[turn] != candidate.seats[turn]:
+            return f'{where}: seat {reference.seats[turn]} played {card}, seat {candidate.seats[turn]} played {other}'
+
+    if len(reference.cards) != len(candidate.cards):
+        return f'{len(reference.cards)} cards played against {len(candidate.cards)}'
+    if not np.allclose(reference.beliefs[-1], candidate.beliefs[-1], rtol=0, atol=atol):
+        return 'final beliefs differ'
+    if reference.scores != candidate.scores:
+        return f'scores {reference.scores} against {candidate.scores}'
+
+    return None
+
+def check(reference:str, candidate:str, sporting:str, benfica:str, deals:list, seeds:list[int], game:int,
+          atol:float) -> str:
+    '''
+        First difference between two engines playing a game of a list of deals
+    '''
+
+    return diff(ENGINES[reference](sporting, benfica, deals, seeds)[game],
+                ENGINES[candidate](sporting, benfica, deals, seeds)[game], atol)
+
+def shrink(reference:str, candidate:str, sporting:str, benfica:str, deals:list, seeds:list[int], game:int,
+           atol:float) -> np.ndarray:
+    '''
+        Moves the failing deal of a game towards the canonical deal (default seating, card i in position i)
+        one swap of two cards at a time, keeping the swaps after which the engines still disagree.
+        The other deals are played along with it, unchanged
+    '''
+
+    deals = [np.array(deal, dtype=DEAL) for deal in deals]
+
+    def fails(attempt:np.ndarray) -> bool:
+        return check(reference, candidate, sporting, benfica, deals[:game] + [attempt] + deals[game + 1:], seeds, game, atol) is not None
+
+    deal = deals[game]
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        if deal['seating']:
+            attempt = deal.copy()
+            attempt['seating'] = 0
+            if fails(attempt):
+                deal, shrunk = attempt, True
+
+        for position in range(40):
+            cards = deal['cards']
+            if cards[position] == CANONICAL[position]:
+                continue
+            attempt = deal.copy()
+            other = int(np.flatnonzero(cards == CANONICAL[position])[0])
+            attempt['cards'][[position, other]] = cards[[other, position]]
+            if fails(attempt):
+                deal, shrunk = attempt, True
+
+    return deal
+
+
+########################################## Harness ##########################################
+
+def run(reference:str, candidate:str, pairings:list[tuple[str, str]], deals:np.ndarray, base_seed:int,
+        atol:float) -> tuple[list[dict], dict[str, float], int]:
+    '''
+        Plays every deal of every pairing with both engines (all the deals of a pairing in one call).
+        Returns a shrunk reproducer of each failing pairing, the time taken by each engine and the
+        number of deals played
+    '''
+
+    failures = []
+    elapsed = {reference: 0.0, candidate: 0.0}
+    games = 0
+    deals = list(deals)
+    seeds = [base_seed + k for k in range(len(deals))]
+    for sporting, benfica in pairings:
+        games += len(deals)
+        traces = {}
+        for engine in (reference, candidate):
+            start = perf_counter()
+            traces[engine] = ENGINES[engine](sporting, benfica, deals, seeds)
+            elapsed[engine] += perf_counter() - start
+
+        for k in range(len(deals)):
+            difference = diff(traces[reference][k], traces[candidate][k], atol)
+            if not difference:
+                continue
+
+            print(colored(f'{sporting} vs {benfica}, deal {k}: {difference}', 'red'))
+            # A difference that only shows with the other games of the batch keeps them in the reproducer
+            context = ([deals[k]], [seeds[k]], 0)
+            if not check(reference, candidate, sporting, benfica, *context, atol):
+                context = (deals, seeds, k)
+            shrunk = shrink(reference, candidate, sporting, benfica, *context, atol)
+            failure = {'reference': reference, 'candidate': candidate, 'sporting': sporting, 'benfica': benfica,
+                       'seed': seeds[k], 'cards': shrunk['cards'].tolist(), 'seating': int(shrunk['seating'])}
+            if len(context[0]) > 1:
+                failure['batch'] = {'game': k, 'seeds': seeds, 'cards': [deal['cards'].tolist() for deal in deals],
+                                    'seating': [int(deal['seating']) for deal in deals]}
+            failure['difference'] = check_reproducer(failure, atol)
+            failures.append(failure)
+            break   # one reproducer per pairing
+
+        print(colored(f'{sporting} vs {benfica}: {len(deals)} deals checked', 'blue'))
+
+    return failures, elapsed, games
+
+def reproducer_deal(cards:list[int], seating:int) -> np.ndarray:
+    '''
+        Deal of a saved reproducer
+    '''
+
+    deal = np.zeros((), dtype=DEAL)
+    deal['cards'] = cards
+    deal['seating'] = seating
+
+    return deal
+
+def check_reproducer(failure:dict, atol:float) -> str:
+    '''
+        First difference of a saved reproducer, played with the other deals of its batch if it has them
+    '''
+
+    deal = reproducer_deal(failure['cards'], failure['seating'])
+    deals, seeds, game = [deal], [failure['seed']], 0
+    if 'batch' in failure:
+        batch = failure['batch']
+        deals = [reproducer_deal(cards, seating) for cards, seating in zip(batch['cards'], batch['seating'])]
+        deals[batch['game']] = deal
+        seeds, game = batch['seeds'], batch['game']
+
+    return check(failure['reference'], failure['candidate'], failure['sporting'], failure['benfica'], deals, seeds, game, atol)
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Plays the same deals with a reference engine and an optimized engine and diffs the results')
+    parser.add_argument('-r', '--reference', type=str, default='reference', choices=list(ENGINES), help='Reference engine')
+    parser.add_argument('-e', '--engine', type=str, default='vectorized', choices=list(ENGINES), help='Engine to check')
+    parser.add_argument('-s', '--sporting', type=str, default='predictor', help='Comma separated strategies of team Sporting')
+    parser.add_argument('-b', '--benfica', type=str, default='random,greedy,maxpointswon,maxroundswon,cooperative,predictor', help='Comma separated strategies of team Benfica')
+    parser.add_argument('-n', '--num_deals', type=int, default=50, help='Deals per pairing')
+    parser.add_argument('-d', '--deals', type=str, default=None, help='Deal corpus (deals.py), random deals otherwise')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the deals and of the games')
+    parser.add_argument('--atol', type=float, default=0.0, help='Largest difference allowed between beliefs')
+    parser.add_argument('-o', '--output', type=str, default=None, help='JSON file to save the reproducers to')
+    parser.add_argument('--repro', type=str, default=None, help='Check the reproducers of a JSON file again')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    if args.repro:
+        with open(args.repro, 'r') as f:
+            failing = 0
+            for failure in load(f):
+                difference = check_reproducer(failure, args.atol)
+                failing += difference is not None
+                print(colored(f'{failure["sporting"]} vs {failure["benfica"]}: {difference or "no difference"}',
+                              'red' if difference else 'green'))
+        # A non zero status when a reproducer still fails, so the check can gate changes
+        exit(1 if failing else 0)
+
+    if args.deals:
+        deals = open_corpus(args.deals)[:args.num_deals]
+    else:
+        deals = random_deals(np.random.default_rng(args.seed), args.num_deals)
+    pairings = list(product(args.sporting.split(','), args.benfica.split(',')))
+
+    failures, elapsed, games = run(args.reference, args.engine, pairings, deals, args.seed, args.atol)
+
+    for failure in failures:
+        changed = int(np.count_nonzero(np.array(failure['cards']) != CANONICAL))
+        print(colored(f'\n{failure["sporting"]} vs {failure["benfica"]} (seed {failure["seed"]}, '
+                      f'{changed} cards away from the canonical deal): {failure["difference"]}', 'red', attrs=['bold']))
+        print(f'cards: {failure["cards"]}, seating: {failure["seating"]}')
+    if args.output:
+        with open(args.output, 'w') as f:
+            dump(failures, f, indent=4)
+
+    print(colored(f'\n{args.reference}: {games / elapsed[args.reference]:.1f} games/s, '
+                  f'{args.engine}: {games / elapsed[args.engine]:.1f} games/s '
+                  f'({elapsed[args.reference] / elapsed[args.engine]:.2f}x)', 'magenta', attrs=['bold']))
+    print(colored('No differences' if not failures else f'{len(failures)} failing pairings', 'green' if not failures else 'red', attrs=['bold']))
+    exit(1 if failures else 0)
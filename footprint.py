@@ -0,0 +1,106 @@
+############################################# Libraries #############################################
+
+import tracemalloc
+from random import seed
+from sys import getsizeof
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from Game import Game
+
+
+########################################## Measures ##########################################
+
+def object_size(obj:object) -> int:
+    '''
+        Bytes of an object and of its attribute dictionary, if it has one
+    '''
+
+    return getsizeof(obj) + (getsizeof(vars(obj)) if hasattr(obj, '__dict__') else 0)
+
+def game_objects(game:Game, other:Game) -> dict[str, int]:
+    '''
+        Bytes of the cards, players and teams of a dealt game, leaving out the cards it shares with another game
+    '''
+
+    shared = {id(card) for card in other.deck}
+    cards = {id(card): card for player in game.seats for card in player.hand if id(card) not in shared}
+
+    return {'cards': sum(object_size(card) for card in cards.values()),
+            'players': sum(object_size(player) for player in game.seats),
+            'teams': sum(object_size(team) for team in game.teams)}
+
+def allocations(sporting:str, benfica:str, num_games:int) -> tuple[float, float]:
+    '''
+        Mean number of memory blocks and bytes allocated to set up and deal a game
+    '''
+
+    blocks = size = 0
+    tracemalloc.start()
+    for g in range(num_games):
+        seed(g)
+        before = tracemalloc.take_snapshot()
+        game = Game(sporting, benfica, False, 'auto')
+        game.hand_cards()
+        after = tracemalloc.take_snapshot()
+        for stat in after.compare_to(before, 'traceback'):
+            if stat.size_diff > 0:
+                blocks += stat.count_diff
+                size += stat.size_diff
+        del game
+    tracemalloc.stop()
+
+    return blocks / num_games, size / num_games
+
+def throughput(sporting:str, benfica:str, num_games:int) -> tuple[float, float]:
+    '''
+        Games set up and dealt per second, and whole games played per second
+    '''
+
+    start = perf_counter()
+    for g in range(num_games):
+        seed(g)
+        Game(sporting, benfica, False, 'auto').hand_cards()
+    dealt = num_games / (perf_counter() - start)
+
+    start = perf_counter()
+    for g in range(num_games):
+        seed(g)
+        game = Game(sporting, benfica, False, 'auto')
+        game.hand_cards()
+        game.play_game()
+    played = num_games / (perf_counter() - start)
+
+    return dealt, played
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Memory allocated per game and game throughput')
+    parser.add_argument('-s', '--sporting', type=str, default='greedy', help='Strategy of team Sporting')
+    parser.add_argument('-b', '--benfica', type=str, default='maxpointswon', help='Strategy of team Benfica')
+    parser.add_argument('-n', '--num_games', type=int, default=2000, help='Number of games to time')
+    parser.add_argument('-a', '--allocations', type=int, default=50, help='Number of games to trace the allocations of')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    seed(0)
+    game = Game(args.sporting, args.benfica, False, 'auto')
+    game.hand_cards()
+    sizes = game_objects(game, Game(args.sporting, args.benfica, False, 'auto'))
+    print(colored(f'{args.sporting} vs {args.benfica}', 'magenta', attrs=['bold']))
+    print('objects of a game: ' + ', '.join(f'{name} {size} B' for name, size in sizes.items()))
+
+    blocks, size = allocations(args.sporting, args.benfica, args.allocations)
+    print(f'allocated to set up and deal a game: {blocks:.0f} blocks, {size / 1024:.1f} KiB')
+
+    dealt, played = throughput(args.sporting, args.benfica, args.num_games)
+    print(f'set up and dealt: {dealt:.0f} games/s, played: {played:.0f} games/s')
@@ -0,0 +1,354 @@
+############################################# Libraries #############################################
+
+from os import replace
+from os.path import exists
+from json import dump, dumps, load, loads
+from math import sqrt, exp
+from statistics import NormalDist
+from itertools import combinations
+from multiprocessing import Pool, cpu_count
+from random import seed
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from Game import Game
+from report import STRATEGIES, load_stats
+
+
+############################################# Constants #############################################
+
+# Rating model (TrueSkill with a single player per team): prior, performance noise of a game,
+# drift of the ratings between games and probability of a tie
+MU = 25.0
+SIGMA = MU / 3
+BETA = SIGMA / 2
+TAU = SIGMA / 100
+DRAW_PROBABILITY = 0.03
+
+NORMAL = NormalDist()
+
+
+########################################## Rating Updates ##########################################
+
+def v_win(t:float, margin:float) -> float:
+    '''
+        Mean correction of the winner (t: difference of the ratings, margin: draw margin, both over c)
+    '''
+
+    return NORMAL.pdf(t - margin) / max(NORMAL.cdf(t - margin), 1e-300)
+
+def w_win(t:float, margin:float) -> float:
+    '''
+        Variance correction of a win
+    '''
+
+    v = v_win(t, margin)
+
+    return v * (v + t - margin)
+
+def v_draw(t:float, margin:float) -> float:
+    '''
+        Mean correction of the first player of a tie
+    '''
+
+    denominator = max(NORMAL.cdf(margin - t) - NORMAL.cdf(-margin - t), 1e-300)
+
+    return (NORMAL.pdf(-margin - t) - NORMAL.pdf(margin - t)) / denominator
+
+def w_draw(t:float, margin:float) -> float:
+    '''
+        Variance correction of a tie
+    '''
+
+    denominator = max(NORMAL.cdf(margin - t) - NORMAL.cdf(-margin - t), 1e-300)
+    v = v_draw(t, margin)
+
+    return v * v + ((margin - t) * NORMAL.pdf(margin - t) + (margin + t) * NORMAL.pdf(margin + t)) / denominator
+
+def entry_key(strategy:str, params:dict) -> str:
+    '''
+        Name of a strategy with its parameters in the ladder
+    '''
+
+    return strategy + dumps(params, sort_keys=True, separators=(',', ':')) if params else strategy
+
+def interleave(counts:dict[int, int]) -> list[int]:
+    '''
+        Sequence of outcomes with every kind spread evenly (the k-th of n outcomes sits at (k + 0.5) / n)
+    '''
+
+    slots = [((k + 0.5) / n, outcome) for outcome, n in counts.items() for k in range(n)]
+
+    return [outcome for _, outcome in sorted(slots)]
+
+
+########################################## Ladder ##########################################
+
+class Ladder:
+    '''
+        Ladder ->
+            - path: JSON file the ladder is stored in
+            - entries: rating of every strategy (and parameter variant): mu, sigma, games
+            - pairs: results of every pairing played (wins of each side and ties)
+            - sources: wins of each side and ties of the aggregate stats of every pairing already rated
+            - next_seed: seed of the next game played by the ladder
+        Ratings are updated after every game, so adding an entry only needs the games it plays
+    '''
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self.entries = {}
+        self.pairs = {}
+        self.sources = {}
+        self.next_seed = 0
+
+        if exists(path):
+            with open(path, 'r') as f:
+                stored = load(f)
+            self.entries, self.pairs = stored['entries'], stored['pairs']
+            self.sources, self.next_seed = stored['sources'], stored['next_seed']
+            if isinstance(self.sources, list):
+                # Ladders that only listed the imported pairings (sporting_benfica, default parameters)
+                self.sources = {'|'.join(source.partition('_')[::2]): None for source in self.sources}
+        else:
+            # The learned strategy needs trained weights, so it is only added explicitly
+            for strategy in STRATEGIES:
+                if strategy != 'learned':
+                    self.add(strategy)
+
+    def save(self) -> None:
+        '''
+            Stores the ladder (through a temporary file, so an interruption never leaves it broken)
+        '''
+
+        with open(self.path + '.tmp', 'w') as f:
+            dump({'entries': self.entries, 'pairs': self.pairs, 'sources': self.sources,
+                  'next_seed': self.next_seed}, f, indent=4)
+        replace(self.path + '.tmp', self.path)
+
+    def add(self, strategy:str, params:dict=None, name:str=None) -> str:
+        '''
+            Adds a strategy to the ladder with the prior rating, returns its name
+        '''
+
+        name = name or entry_key(strategy, params)
+        if name not in self.entries:
+            self.entries[name] = {'strategy': strategy, 'params': params or {}, 'mu': MU, 'sigma': SIGMA, 'games': 0}
+
+        return name
+
+    def pair(self, a:str, b:str) -> dict:
+        '''
+            Results of a pairing, created on first use
+        '''
+
+        return self.pairs.setdefault(f'{a}|{b}', {'games': 0, 'wins_a': 0, 'wins_b': 0, 'ties': 0})
+
+    def rate(self, a:str, b:str, outcome:int) -> None:
+        '''
+            Updates the ratings after a game of a against b (outcome: 1 a won, -1 b won, 0 tie)
+        '''
+
+        first, second = self.entries[a], self.entries[b]
+        # Ratings drift between games, so they never stop adapting
+        variance_a = first['sigma'] ** 2 + TAU ** 2
+        variance_b = second['sigma'] ** 2 + TAU ** 2
+
+        c = sqrt(2 * BETA ** 2 + variance_a + variance_b)
+        margin = NORMAL.inv_cdf((DRAW_PROBABILITY + 1) / 2) * sqrt(2) * BETA / c
+        if outcome == 0:
+            t = (first['mu'] - second['mu']) / c
+            v, w, sign = v_draw(t, margin), w_draw(t, margin), 1
+        else:
+            winner, loser = (first, second) if outcome > 0 else (second, first)
+            t = (winner['mu'] - loser['mu']) / c
+            v, w, sign = v_win(t, margin), w_win(t, margin), outcome
+
+        first['mu'] += sign * variance_a / c * v
+        second['mu'] -= sign * variance_b / c * v
+        first['sigma'] = sqrt(variance_a * max(1 - variance_a / c ** 2 * w, 1e-6))
+        second['sigma'] = sqrt(variance_b * max(1 - variance_b / c ** 2 * w, 1e-6))
+        first['games'] += 1
+        second['games'] += 1
+
+        results = self.pair(a, b)
+        results['games'] += 1
+        results['wins_a' if outcome > 0 else 'wins_b' if outcome < 0 else 'ties'] += 1
+
+    def quality(self, a:str, b:str) -> float:
+        '''
+            Match quality of a pairing (probability of a tie under the current ratings)
+        '''
+
+        first, second = self.entries[a], self.entries[b]
+        spread = 2 * BETA ** 2 + first['sigma'] ** 2 + second['sigma'] ** 2
+
+        return sqrt(2 * BETA ** 2 / spread) * exp(-(first['mu'] - second['mu']) ** 2 / (2 * spread))
+
+    def next_pairings(self, count:int) -> list[tuple[str, str]]:
+        '''
+            Pairings expected to teach the most: the uncertainty of both ratings weighted by match quality
+        '''
+
+        return sorted(combinations(self.entries, 2),
+                      key=lambda pair: -(self.entries[pair[0]]['sigma'] ** 2 + self.entries[pair[1]]['sigma'] ** 2) *
+                                       self.quality(*pair))[:count]
+
+    def ranking(self) -> list[tuple[str, dict]]:
+        '''
+            Entries sorted by their conservative rating (mu - 3 sigma)
+        '''
+
+        return sorted(self.entries.items(), key=lambda item: -(item[1]['mu'] - 3 * item[1]['sigma']))
+
+    def ingest(self, results_dir:str) -> int:
+        '''
+            Rates the games of the aggregate stats of a results directory not rated yet, alternating
+            their wins, losses and ties. When the stats of a pairing changed since they were rated,
+            only the extra games are rated if the log grew, every game if it was played again.
+            Returns the number of games rated
+        '''
+
+        rated = 0
+        for pairing in load_stats(results_dir):
+            a = self.add(pairing['sporting'], pairing['sporting_params'])
+            b = self.add(pairing['benfica'], pairing['benfica_params'])
+            source = f'{a}|{b}'
+            counts = {side: pairing['wins'][side] for side in ['Sporting', 'Benfica', 'ties']}
+            previous = self.sources.get(source)
+            if source in self.sources and previous is None:
+                # Imported before the counts were kept, and its games are already rated
+                self.sources[source] = counts
+                continue
+            if previous == counts:
+                continue
+
+            extra = counts
+            if previous is not None and all(counts[side] >= previous[side] for side in counts):
+                extra = {side: counts[side] - previous[side] for side in counts}
+            outcomes = interleave({1: extra['Sporting'], -1: extra['Benfica'], 0: extra['ties']})
+            for outcome in outcomes:
+                self.rate(a, b, outcome)
+            self.sources[source] = counts
+            rated += len(outcomes)
+
+        return rated
+
+
+########################################## Games ##########################################
+
+def play_games(task:tuple) -> list[int]:
+    '''
+        Plays games between two entries (runs in the worker processes), alternating their teams
+        Returns the outcome of each game for the first entry (1 win, -1 loss, 0 tie)
+    '''
+
+    strategy_a, params_a, strategy_b, params_b, first_seed, num_games = task
+
+    outcomes = []
+    for g in range(num_games):
+        seed(first_seed + g)
+        if g % 2 == 0:
+            game = Game(strategy_a, strategy_b, False, 'auto', params_a, params_b)
+        else:
+            game = Game(strategy_b, strategy_a, False, 'auto', params_b, params_a)
+        game.hand_cards()
+        winner = game.play_game()
+
+        a_team = game.teams[g % 2].name
+        outcomes.append(0 if winner == 'ties' else 1 if winner == a_team else -1)
+
+    return outcomes
+
+def play(ladder:Ladder, num_games:int, batch:int, workers:int) -> None:
+    '''
+        Plays num_games in batches between the pairings chosen by the ladder, one pairing per worker,
+        updating and storing the ratings after every batch
+    '''
+
+    workers = workers or cpu_count()
+    played = 0
+    with Pool(workers) as pool:
+        while played < num_games:
+            # The most informative pairings, one batch each
+            pairings, tasks, scheduled = [], [], played
+            for a, b in ladder.next_pairings(workers):
+                size = min(batch, num_games - scheduled)
+                if size <= 0:
+                    break
+                pairings.append((a, b))
+                tasks.append((ladder.entries[a]['strategy'], ladder.entries[a]['params'],
+                              ladder.entries[b]['strategy'], ladder.entries[b]['params'], ladder.next_seed, size))
+                ladder.next_seed += size
+                scheduled += size
+
+            for (a, b), outcomes in zip(pairings, pool.map(play_games, tasks)):
+                for outcome in outcomes:
+                    ladder.rate(a, b, outcome)
+                played += len(outcomes)
+                print(colored(f'{a} vs {b}: {outcomes.count(1)}-{outcomes.count(-1)}-{outcomes.count(0)}', 'blue'))
+
+            ladder.save()
+
+
+########################################## Main Program #############################################
+
+def print_ranking(ladder:Ladder) -> None:
+    '''
+        Prints the ladder, from the best conservative rating to the worst
+    '''
+
+    width = max(len(name) for name in ladder.entries)
+    print(colored(f'{"rank":>4}  {"entry":<{width}}  {"rating":>7}  {"mu":>6}  {"sigma":>5}  {"games":>6}', attrs=['bold', 'underline']))
+    for rank, (name, entry) in enumerate(ladder.ranking(), start=1):
+        line = f'{rank:>4}  {name:<{width}}  {entry["mu"] - 3 * entry["sigma"]:>7.2f}  {entry["mu"]:>6.2f}  {entry["sigma"]:>5.2f}  {entry["games"]:>6}'
+        print(colored(line, 'green', attrs=['bold']) if rank == 1 else line)
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Rating ladder of the strategies')
+    parser.add_argument('-l', '--ladder', type=str, default='./results/ladder.json', help='File of the ladder')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='Add a strategy (or a parameter variant of one) to the ladder')
+    add.add_argument('-s', '--strategy', type=str, required=True, help='Strategy of the entry')
+    add.add_argument('-p', '--params', type=loads, default={}, help='Parameters of the strategy, as JSON')
+    add.add_argument('--name', type=str, default=None, help='Name of the entry (default: strategy and parameters)')
+
+    games = commands.add_parser('play', help='Play the most informative pairings and update the ratings')
+    games.add_argument('-n', '--num_games', type=int, default=200, help='Number of games to play')
+    games.add_argument('-b', '--batch', type=int, default=20, help='Games played per pairing between rating updates')
+    games.add_argument('-w', '--workers', type=int, default=None, help='Number of worker processes (default: one per CPU)')
+
+    ingest = commands.add_parser('ingest', help='Rate the aggregate stats of finished simulations')
+    ingest.add_argument('-r', '--results', type=str, default='./results', help='Directory with the aggregate stats')
+
+    commands.add_parser('show', help='Print the ladder')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    ladder = Ladder(args.ladder)
+    start = perf_counter()
+
+    match args.command:
+        case 'add':
+            name = ladder.add(args.strategy, args.params, args.name)
+            ladder.save()
+            print(colored(f'Added {name}', 'magenta', attrs=['bold']))
+        case 'play':
+            play(ladder, args.num_games, args.batch, args.workers)
+            print(colored(f'\nPlayed {args.num_games} games in {perf_counter() - start:.1f} s\n', 'magenta', attrs=['bold']))
+            print_ranking(ladder)
+        case 'ingest':
+            rated = ladder.ingest(args.results)
+            ladder.save()
+            print(colored(f'Rated {rated} games\n', 'magenta', attrs=['bold']))
+            print_ranking(ladder)
+        case 'show':
+            print_ranking(ladder)
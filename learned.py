@@ -0,0 +1,332 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from functools import lru_cache
+from threading import Condition, Lock, Thread
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from tricks import CARD_VALUES
+
+
+############################################# Constants #############################################
+
+# Feature layout of a (state, move) pair, with the suits renamed so that the trump is suit 0
+# and the seats taken from the player (self, next, partner, previous)
+ACTION = 0          # card played, one hot
+HAND = 40           # cards of the player
+SEEN = 80           # cards already played
+TRICK = 120         # cards of the round so far
+BELIEFS = 160       # beliefs of the player about each seat
+POSITION = 320      # position in the round, one hot
+SCALARS = 324       # the move wins the round so far, the partner was winning, points of the round, round, bias
+N_FEATURES = 329
+
+# Original card of each canonical card, for every trump suit
+SUIT_SOURCE = np.array([[((j // 10 + trump) % 4) * 10 + j % 10 for j in range(40)] for trump in range(4)])
+
+
+########################################## Features ##########################################
+
+def winning_positions(cards:np.ndarray, played:np.ndarray, trump:np.ndarray) -> np.ndarray:
+    '''
+        Position of the winning card among the first played cards of each round (cards: (n, 4))
+    '''
+
+    rows = np.arange(len(cards))
+    winner = np.zeros(len(cards), dtype=np.int64)
+    for p in range(1, 4):
+        card, winning = cards[:, p], cards[rows, winner]
+        beats = (card // 10 == winning // 10) & (card % 10 > winning % 10) | (card // 10 == trump) & (winning // 10 != trump)
+        winner = np.where(beats & (p < played), p, winner)
+
+    return winner
+
+def features(hand:np.ndarray, trick:np.ndarray, seen:np.ndarray, beliefs:np.ndarray, trump:np.ndarray, seat:np.ndarray,
+             position:np.ndarray, num_round:np.ndarray, action:np.ndarray) -> np.ndarray:
+    '''
+        Feature matrix of n (state, move) pairs, one per row
+            - hand, seen: cards as 40 bit masks (n,)
+            - trick: cards of the round so far, -1 if not played yet (n, 4)
+            - beliefs: beliefs of the player by seat (n, 4, 4, 10)
+            - trump, seat, position, num_round, action: (n,)
+    '''
+
+    n = len(action)
+    rows = np.arange(n)
+    source = SUIT_SOURCE[trump]
+    X = np.zeros((n, N_FEATURES), dtype=np.float32)
+
+    X[:, ACTION:ACTION + 40] = action[:, None] == source
+    X[:, HAND:HAND + 40] = hand[:, None] >> source.astype(np.uint64) & np.uint64(1)
+    X[:, SEEN:SEEN + 40] = seen[:, None] >> source.astype(np.uint64) & np.uint64(1)
+    X[:, TRICK:TRICK + 40] = (trick[:, :, None] == source[:, None, :]).any(axis=1)
+
+    relative = beliefs[rows[:, None], (seat[:, None] + np.arange(4)) % 4].reshape(n, 4, 40)
+    X[:, BELIEFS:BELIEFS + 160] = np.take_along_axis(relative, source[:, None, :], axis=2).reshape(n, 160)
+    X[rows, POSITION + position] = 1
+
+    cards = np.array(trick, dtype=np.int64)
+    cards[rows, position] = action
+    winner_before = winning_positions(cards, position, trump)
+    winner = winning_positions(cards, position + 1, trump)
+    X[:, SCALARS] = winner == position
+    X[:, SCALARS + 1] = (position >= 2) & (winner_before == position - 2)
+    X[:, SCALARS + 2] = np.where(np.arange(4) <= position[:, None], CARD_VALUES[np.maximum(cards, 0)], 0).sum(axis=1) / 30
+    X[:, SCALARS + 3] = num_round / 9
+    X[:, SCALARS + 4] = 1
+
+    return X
+
+def record_features(records:np.ndarray) -> np.ndarray:
+    '''
+        Feature matrix of self-play records (selfplay.RECORD)
+    '''
+
+    return features(records['hand'], records['trick'].astype(np.int64), records['seen'], records['beliefs'],
+                    records['trump'].astype(np.int64), records['seat'].astype(np.int64),
+                    records['position'].astype(np.int64), records['round'], records['action'].astype(np.int64))
+
+
+########################################## Model ##########################################
+
+class ValueModel:
+    '''
+        ValueModel ->
+            - layers: weights and bias of each layer, hidden layers use ReLU
+        Predicts the final score of the team of the player for each row of a feature matrix
+    '''
+
+    def __init__(self, layers:list[tuple[np.ndarray, np.ndarray]]) -> None:
+        self.layers = [(np.asarray(W, dtype=np.float32), np.asarray(b, dtype=np.float32)) for W, b in layers]
+        if self.layers[0][0].shape[0] != N_FEATURES:
+            raise ValueError(f'The model expects {self.layers[0][0].shape[0]} features, not {N_FEATURES}')
+
+    def evaluate(self, X:np.ndarray) -> np.ndarray:
+        '''
+            Value of every row of the feature matrix, with one matrix multiply per layer
+        '''
+
+        for W, b in self.layers[:-1]:
+            X = np.maximum(X @ W + b, 0)
+        W, b = self.layers[-1]
+
+        return (X @ W + b).reshape(-1)
+
+    def save(self, path:str) -> None:
+        '''
+            Saves the weights as W0, b0, W1, b1, ...
+        '''
+
+        np.savez(path, **{f'{name}{k}': array for k, (W, b) in enumerate(self.layers)
+                          for name, array in (('W', W), ('b', b))})
+
+@lru_cache(maxsize=None)
+def load_model(path:str) -> ValueModel:
+    '''
+        Loads the weights of a model (once per process)
+    '''
+
+    with np.load(path) as weights:
+        return ValueModel([(weights[f'W{k}'], weights[f'b{k}']) for k in range(len(weights.files) // 2)])
+
+def fit(shards:list[np.ndarray], ridge:float, chunk:int=100000) -> ValueModel:
+    '''
+        Fits a linear model to the final team score of the self-play records (ridge regression),
+        accumulating the normal equations a chunk of records at a time
+    '''
+
+    XtX = np.zeros((N_FEATURES, N_FEATURES))
+    Xty = np.zeros(N_FEATURES)
+    for shard in shards:
+        for start in range(0, len(shard), chunk):
+            records = shard[start:start + chunk]
+            X = record_features(records).astype(np.float64)
+            XtX += X.T @ X
+            Xty += X.T @ records['team_score']
+
+    weights = np.linalg.solve(XtX + ridge * np.eye(N_FEATURES), Xty)
+
+    return ValueModel([(weights[:, None], np.zeros(1))])
+
+
+########################################## Batched Evaluation ##########################################
+
+class Batcher:
+    '''
+        Batcher ->
+            - model: model evaluating the moves
+            - active: number of games still running
+            - pending: feature matrices waiting for the next batch
+            - results: values of the evaluated matrices, until their game takes them
+            - batches: number of batches evaluated
+            - rows: number of moves evaluated
+        Games running in separate threads submit their moves and wait until every running game is
+        waiting, then all the moves are evaluated with a single forward pass
+    '''
+
+    def __init__(self, model:ValueModel, active:int) -> None:
+        self.model = model
+        self.active = active
+        self.pending = {}
+        self.results = {}
+        self.batches = 0
+        self.rows = 0
+        self.condition = Condition()
+
+    def evaluate(self, X:np.ndarray) -> np.ndarray:
+        '''
+            Values of the moves of one game, evaluated together with the moves of the other games
+        '''
+
+        with self.condition:
+            ticket = object()
+            self.pending[ticket] = X
+            if len(self.pending) >= self.active:
+                self.flush()
+            else:
+                self.condition.wait_for(lambda: ticket in self.results)
+
+            return self.results.pop(ticket)
+
+    def done(self) -> None:
+        '''
+            A game thread finished, the games still waiting may not need to wait for it
+        '''
+
+        with self.condition:
+            self.active -= 1
+            if self.pending and len(self.pending) >= self.active:
+                self.flush()
+
+    def flush(self) -> None:
+        '''
+            Evaluates every pending matrix at once (called with the condition held)
+        '''
+
+        tickets = list(self.pending)
+        values = self.model.evaluate(np.concatenate([self.pending[t] for t in tickets]))
+        start = 0
+        for ticket in tickets:
+            size = len(self.pending[ticket])
+            self.results[ticket] = values[start:start + size]
+            start += size
+
+        self.batches += 1
+        self.rows += len(values)
+        self.pending.clear()
+        self.condition.notify_all()
+
+def simulate(num_games:int, sporting:str, benfica:str, model:ValueModel, concurrency:int) -> dict[str, int]:
+    '''
+        Plays num_games over concurrency threads, with the moves of the learned players of all the running
+        games evaluated in shared batches. Games share the global random generator, so they are not
+        reproducible from a seed. Returns the wins of each team and the batcher statistics
+    '''
+
+    from Game import Game
+    from Player import LearnedPlayer
+
+    batcher = Batcher(model, concurrency)
+    wins = {'Sporting': 0, 'Benfica': 0, 'ties': 0}
+    remaining = [num_games]
+    lock = Lock()
+
+    def play() -> None:
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    break
+                remaining[0] -= 1
+            game = Game(sporting, benfica, False, 'auto')
+            for player in game.seats:
+                if isinstance(player, LearnedPlayer):
+                    player.evaluator = batcher.evaluate
+            game.hand_cards()
+            winner = game.play_game()
+            with lock:
+                wins[winner] += 1
+        batcher.done()
+
+    threads = [Thread(target=play) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return wins | {'batches': batcher.batches, 'rows': batcher.rows}
+
+
+########################################## Benchmark ##########################################
+
+def benchmark(model:ValueModel, num_games:int, opponent:str, concurrency:int) -> None:
+    '''
+        Prints the throughput of the model by batch size and of whole games, sequential and batched
+    '''
+
+    from Game import Game
+
+    rng = np.random.default_rng(0)
+    for size in [1, 10, 100, 1000, 10000]:
+        X = rng.random((size, N_FEATURES), dtype=np.float32)
+        repeats = max(1, 20000 // size)
+        start = perf_counter()
+        for _ in range(repeats):
+            model.evaluate(X)
+        elapsed = perf_counter() - start
+        print(f'batch {size:>5}: {repeats * size / elapsed:>12,.0f} moves/s')
+
+    start = perf_counter()
+    for _ in range(num_games):
+        game = Game('learned', opponent, False, 'auto')
+        # The benchmarked model, not the default weights
+        for player in game.teams[0].players:
+            player.evaluator = model.evaluate
+        game.hand_cards()
+        game.play_game()
+    sequential = perf_counter() - start
+    print(f'sequential: {num_games / sequential:>8.1f} games/s')
+
+    start = perf_counter()
+    stats = simulate(num_games, 'learned', opponent, model, concurrency)
+    batched = perf_counter() - start
+    print(f'batched x{concurrency}: {num_games / batched:>8.1f} games/s '
+          f'({stats["rows"] / max(stats["batches"], 1):.1f} moves per batch)')
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Learned value function strategy')
+    parser.add_argument('-m', '--model', type=str, default='./results/learned.npz', help='Weights of the model')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    train = commands.add_parser('fit', help='Fit a linear model to self-play records (ridge regression)')
+    train.add_argument('-d', '--data', type=str, default='./results/selfplay', help='Directory of the self-play shards')
+    train.add_argument('--ridge', type=float, default=1.0, help='Ridge penalty')
+
+    bench = commands.add_parser('bench', help='Measure the throughput of the model')
+    bench.add_argument('-n', '--num_games', type=int, default=200, help='Number of games to play')
+    bench.add_argument('-b', '--opponent', type=str, default='cooperative', help='Strategy of the opponent team')
+    bench.add_argument('-c', '--concurrency', type=int, default=32, help='Games played at once in the batched run')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    match args.command:
+        case 'fit':
+            from selfplay import open_shards
+
+            start = perf_counter()
+            shards = open_shards(args.data)
+            model = fit(shards, args.ridge)
+            model.save(args.model)
+            print(colored(f'Fitted {args.model} on {sum(len(s) for s in shards)} records in {perf_counter() - start:.1f} s', 'magenta', attrs=['bold']))
+        case 'bench':
+            benchmark(load_model(args.model), args.num_games, args.opponent, args.concurrency)
@@ -0,0 +1,323 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from os.path import splitext
+from functools import lru_cache
+from json import dump, load, loads
+from random import seed
+from multiprocessing import Pool
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from canonical import TRUMP, canonicalize, from_canonical, permute_card
+from deals import DEAL, open_corpus, random_deals
+
+
+############################################# Constants #############################################
+
+# One row per canonical hand, sorted by key: the hand of the leader of the first round with the
+# trump as suit 0 and the other suits sorted (canonical.py), the lead of the strategy and the
+# rollout evaluation of the leads (NaN if the book was built without rollouts)
+ENTRY = np.dtype([
+    ('key', '<u8'),             # canonical hand (40 bit mask)
+    ('lead', 'u1'),             # canonical card the strategy leads
+    ('value', '<f4'),           # mean points of the team of the leader after leading it
+    ('best', 'u1'),             # canonical card with the most points in the rollouts
+    ('best_value', '<f4'),      # its mean points
+])
+
+# Strategies whose lead only depends on the hand and the trump (the predictor looks at the other hands)
+STRATEGIES = {'cooperative': 'Cooperative Player', 'honest': 'Honest Predictor'}
+
+# Parameters of the player that choose how the book is used, not how the strategy plays
+BOOK_PARAMS = ('book', 'book_best')
+
+
+########################################## Keys ##########################################
+
+def hand_key(hand:int, trump:int) -> tuple[int, tuple[int, ...]]:
+    '''
+        Canonical key of the hand of the leader of the first round (40 bit mask) and the suit
+        permutation that maps the hand to it
+    '''
+
+    (hands, _, _), permutation = canonicalize((hand,), (), trump)
+
+    return hands[0], permutation
+
+def deal_hand(deal:np.void) -> tuple[int, int]:
+    '''
+        Hand of the leader of the first round (seat 0) and trump suit of a deal
+    '''
+
+    hand = 0
+    for card in deal['cards'][:10]:
+        hand |= 1 << int(card)
+
+    return hand, int(deal['cards'][39]) // 10
+
+def canonical_deal(deal:np.void) -> np.ndarray:
+    '''
+        Representative deal of the canonical hand of the leader of a deal: the suits renamed as in
+        the key, the hand dealt in the order of its cards, the weakest trump the leader does not have
+        as the trump card and the other cards in order. The tie breaks of the strategies (by suit and
+        by the order the cards were dealt) are then the same for every deal of the hand
+    '''
+
+    hand, trump = deal_hand(deal)
+    key, permutation = hand_key(hand, trump)
+    cards = sorted(permute_card(int(card), permutation) for card in deal['cards'])
+    trump_card = next(card for card in range(TRUMP * 10, TRUMP * 10 + 10) if not key >> card & 1)
+
+    representative = np.zeros((), dtype=DEAL)
+    representative['cards'][:10] = [card for card in cards if key >> card & 1]
+    representative['cards'][10:39] = [card for card in cards if not key >> card & 1 and card != trump_card]
+    representative['cards'][39] = trump_card
+
+    return representative
+
+
+########################################## Book ##########################################
+
+class OpeningBook:
+    '''
+        OpeningBook ->
+            - path: file of the book (.npy, the description is in the .json next to it)
+            - entries: memory mapped entries, sorted by key
+            - strategy: strategy the book was built for (Player.get_strategy)
+            - params: parameters of the strategy the book was built with
+        Lead of the first round of a strategy for every hand it was built for, found with
+        a binary search over the memory mapped keys
+    '''
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self.entries = np.load(path, mmap_mode='r')
+        if self.entries.dtype != ENTRY:
+            raise ValueError(f'{path} is not an opening book')
+
+        with open(description_path(path), 'r') as f:
+            description = load(f)
+        self.strategy = STRATEGIES[description['strategy']]
+        self.params = description['params']
+
+    def check(self, strategy:str, params:dict) -> None:
+        '''
+            Raises an error if the book was built for another strategy or other parameters
+        '''
+
+        params = {name: value for name, value in params.items() if name not in BOOK_PARAMS}
+        if strategy != self.strategy or params != self.params:
+            raise ValueError(f'{self.path} was built for {self.strategy} {self.params}, not {strategy} {params}')
+
+    def entry(self, hand:int, trump:int) -> tuple[np.void, tuple[int, ...]]:
+        '''
+            Entry of a hand and the suit permutation of its key, None if the hand is not in the book
+        '''
+
+        key, permutation = hand_key(hand, trump)
+        row = int(np.searchsorted(self.entries['key'], key))
+        if row == len(self.entries) or self.entries['key'][row] != key:
+            return None, permutation
+
+        return self.entries[row], permutation
+
+    def lead(self, hand:int, trump:int, best:bool=False) -> int:
+        '''
+            Card (index) to lead with a hand, the one with the most points in the rollouts if best,
+            None if the hand is not in the book
+        '''
+
+        entry, permutation = self.entry(hand, trump)
+        if entry is None:
+            return None
+
+        return from_canonical(int(entry['best' if best and not np.isnan(entry['best_value']) else 'lead']), permutation)
+
+def description_path(path:str) -> str:
+    '''
+        Path of the description of a book
+    '''
+
+    return splitext(path)[0] + '.json'
+
+@lru_cache(maxsize=None)
+def load_book(path:str) -> OpeningBook:
+    '''
+        Opens a book once per process (the pages are shared between processes)
+    '''
+
+    return OpeningBook(path)
+
+
+########################################## Builder ##########################################
+
+def strategy_lead(strategy:str, params:dict, deal:np.void, game_seed:int) -> int:
+    '''
+        Card (index) the strategy leads in the first round of a deal, from seat 0
+    '''
+
+    from Game import Game
+    from Card import card_index
+
+    deal = np.array(deal, dtype=DEAL)
+    deal['seating'] = 0
+    seed(game_seed)
+    game = Game(strategy, 'random', False, 'auto', params, None, deal=deal)
+    game.hand_cards()
+    card, _ = game.decide(game.seats[0], 0, [], '', 0)
+
+    return card_index(card)
+
+def rollout_points(strategy:str, params:dict, opponent:str, deal:np.void, lead:int, game_seed:int) -> int:
+    '''
+        Points of the team of seat 0 in a game of a deal where seat 0 leads a given card
+        and everyone else plays their strategy
+    '''
+
+    from Game import Game
+
+    seed(game_seed)
+    game = Game(strategy, opponent, False, 'auto', params, None, deal=deal)
+    decide = game.decide
+
+    def forced(player, i:int, cards_played:list, round_suit:str, num_round:int):
+        if num_round == 0 and i == 0:
+            card = player.play_card(lead)
+            return card, card.suit
+        return decide(player, i, cards_played, round_suit, num_round)
+
+    game.decide = forced
+    game.hand_cards()
+    game.play_game()
+
+    return game.teams[0].score
+
+def rollout_deals(deal:np.void, rollouts:int, rng:np.random.Generator) -> np.ndarray:
+    '''
+        Deals that keep the hand of seat 0 and the trump card of a deal and shuffle the other cards
+    '''
+
+    deals = np.zeros(rollouts, dtype=DEAL)
+    deals['cards'][:, :10] = deal['cards'][:10]
+    deals['cards'][:, 10:39] = rng.permuted(np.broadcast_to(deal['cards'][10:39], (rollouts, 29)), axis=1)
+    deals['cards'][:, 39] = deal['cards'][39]
+
+    return deals
+
+def build_entries(task:tuple) -> np.ndarray:
+    '''
+        Entries of a list of deals (runs in the worker processes), computed on the representative
+        deal of each hand. With rollouts, every card of the hand is led in the same rollout deals
+        and games (common random numbers)
+    '''
+
+    strategy, params, opponent, deals, base_seed, rollouts = task
+    entries = np.zeros(len(deals), dtype=ENTRY)
+    entries['value'] = entries['best_value'] = np.nan
+
+    for k, (number, deal) in enumerate(deals):
+        # The representative deal is already in the canonical suits
+        deal = canonical_deal(deal)
+        entries['key'][k], _ = hand_key(*deal_hand(deal))
+        lead = strategy_lead(strategy, params, deal, base_seed + number)
+        entries['lead'][k] = entries['best'][k] = lead
+
+        if rollouts:
+            samples = rollout_deals(deal, rollouts, np.random.default_rng(base_seed + number))
+            values = {card: np.mean([rollout_points(strategy, params, opponent, sample, card, base_seed + r)
+                                     for r, sample in enumerate(samples)])
+                      for card in sorted(int(card) for card in deal['cards'][:10])}
+            best = max(values, key=values.get)
+            entries['value'][k] = values[lead]
+            entries['best'][k], entries['best_value'][k] = best, values[best]
+
+    return entries
+
+def build(path:str, strategy:str, params:dict, deals:np.ndarray, base_seed:int, rollouts:int=0,
+          opponent:str='cooperative', workers:int=1, chunk:int=100) -> int:
+    '''
+        Builds the book of a strategy for the hands of the leaders of a list of deals (each canonical
+        hand once) and writes it with its description. Returns the number of entries
+    '''
+
+    from Game import Game
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f'The lead of {strategy} does not only depend on the hand and the trump')
+    if set(params) & set(BOOK_PARAMS):
+        raise ValueError('A book is built with the strategy playing without one')
+    # The book is checked against every parameter of the player, defaults included
+    params = {name: value for name, value in Game(strategy, 'random', False, 'auto', params).teams[0].players[0].params.items()
+              if name not in BOOK_PARAMS}
+
+    # The first deal of every canonical hand
+    unique, keys = [], set()
+    for number, deal in enumerate(deals):
+        key, _ = hand_key(*deal_hand(deal))
+        if key not in keys:
+            keys.add(key)
+            unique.append((number, deal))
+
+    tasks = [(strategy, params, opponent, unique[start:start + chunk], base_seed, rollouts)
+             for start in range(0, len(unique), chunk)]
+    with Pool(workers) as pool:
+        entries = np.concatenate([np.zeros(0, dtype=ENTRY)] + pool.map(build_entries, tasks))
+    entries.sort(order='key')
+    np.save(path, entries)
+
+    with open(description_path(path), 'w') as f:
+        dump({'strategy': strategy, 'params': params, 'deals': len(deals), 'seed': base_seed,
+              'rollouts': rollouts, 'opponent': opponent if rollouts else None, 'entries': len(entries)}, f, indent=4)
+
+    return len(entries)
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Opening book: the lead of the first round of a strategy for each canonical hand')
+    parser.add_argument('-o', '--output', type=str, default='./results/book_cooperative.npy', help='File of the book')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    create = commands.add_parser('build', help='Build the book from the hands of the leaders of a list of deals')
+    create.add_argument('-s', '--strategy', type=str, default='cooperative', choices=list(STRATEGIES), help='Strategy of the book')
+    create.add_argument('-p', '--params', type=loads, default={}, help='Parameters of the strategy, as JSON')
+    create.add_argument('-d', '--deals', type=str, default=None, help='Deal corpus (deals.py), random deals otherwise')
+    create.add_argument('-n', '--num_deals', type=int, default=10000, help='Number of deals')
+    create.add_argument('--seed', type=int, default=0, help='Seed of the deals, the decisions and the rollouts')
+    create.add_argument('-r', '--rollouts', type=int, default=0, help='Rollouts of every lead (0: no evaluation)')
+    create.add_argument('-b', '--opponent', type=str, default='cooperative', help='Strategy of the other team in the rollouts')
+    create.add_argument('-w', '--workers', type=int, default=1, help='Number of worker processes')
+
+    commands.add_parser('info', help='Print the description of the book and how its leads compare to the rollouts')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    match args.command:
+        case 'build':
+            if args.deals:
+                deals = open_corpus(args.deals)[:args.num_deals]
+            else:
+                deals = random_deals(np.random.default_rng(args.seed), args.num_deals)
+            start = perf_counter()
+            entries = build(args.output, args.strategy, args.params, deals, args.seed, args.rollouts,
+                            args.opponent, args.workers)
+            print(colored(f'Wrote {entries} hands to {args.output} in {perf_counter() - start:.1f} s', 'magenta', attrs=['bold']))
+        case 'info':
+            book = load_book(args.output)
+            with open(description_path(args.output), 'r') as f:
+                print(colored(f'{args.output}: {len(book.entries)} hands ({book.entries.nbytes / 1e6:.1f} MB)', 'magenta', attrs=['bold']))
+                for name, value in load(f).items():
+                    print(f'{name}: {value}')
+            evaluated = book.entries[~np.isnan(book.entries['value'])]
+            if len(evaluated):
+                print(f'Lead of the strategy is the best in the rollouts: {np.mean(evaluated["lead"] == evaluated["best"]):.1%}, '
+                      f'points lost: {np.mean(evaluated["best_value"] - evaluated["value"]):.2f}')
@@ -0,0 +1,167 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from os.path import exists, getmtime, splitext
+from json import dumps, loads
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from Card import SUITS, card_index
+from Game import Game
+from State import GameState, legal_moves, trick_winner
+from results_store import iter_game_spans
+
+
+############################################# Constants #############################################
+
+# One row per game of the log: its number and where its JSON object is in the file
+INDEX = np.dtype([
+    ('game', '<i4'),
+    ('offset', '<i8'),
+    ('length', '<i4'),
+])
+
+CARDS = {card.name: card for card in Game.create_deck()}
+
+
+########################################## Index ##########################################
+
+def index_path(log:str) -> str:
+    '''
+        Path of the index of a game log
+    '''
+
+    return splitext(log)[0] + '.idx.npy'
+
+def build_index(log:str) -> np.ndarray:
+    '''
+        Indexes the games of a log (streaming it once) and saves the index next to it
+    '''
+
+    rows = [(game.get('Game', k + 1), offset, length) for k, (offset, length, game) in enumerate(iter_game_spans(log))]
+    index = np.array(rows, dtype=INDEX)
+    np.save(index_path(log), index)
+
+    return index
+
+def load_index(log:str) -> np.ndarray:
+    '''
+        Memory maps the index of a log, building it again if the log changed since
+    '''
+
+    if not exists(index_path(log)) or getmtime(index_path(log)) < getmtime(log):
+        return build_index(log)
+
+    return np.load(index_path(log), mmap_mode='r')
+
+def read_game(log:str, index:np.ndarray, number:int) -> dict:
+    '''
+        Reads a single game of a log, seeking straight to it
+    '''
+
+    row = number - 1
+    if not 0 <= row < len(index) or index['game'][row] != number:
+        raise ValueError(f'Game {number} is not in {log} ({len(index)} games)')
+
+    with open(log, 'rb') as f:
+        f.seek(int(index['offset'][row]))
+        return loads(f.read(int(index['length'][row])))
+
+
+########################################## Replay ##########################################
+
+def deal_of(game:dict) -> tuple[list[list[str]], int]:
+    '''
+        Hands of each seat (the cards they played, in order) and trump suit of a logged game
+    '''
+
+    rounds = [game['Rounds'][str(r)] for r in range(1, 11)]
+    if 'Cards' not in rounds[0]:
+        raise ValueError(f'Game {game.get("Game")} was logged without the cards of each round')
+
+    trump = SUITS.index(game['Trump'].split('_of_')[1])
+    hands = [[] for _ in range(4)]
+    leader = 0
+    for round_info in rounds:
+        cards = round_info['Cards']
+        for position, name in enumerate(cards):
+            hands[(leader + position) % 4].append(name)
+        leader = (leader + trick_winner([card_index(CARDS[name]) for name in cards], trump)) % 4
+
+    return hands, trump
+
+def replay(game:dict) -> list[int]:
+    '''
+        Plays a logged game again trick by trick under the rules of the game, printing every card,
+        and checks the winner and points of each round against the log. Returns the score of each team
+    '''
+
+    seats = game['Order']
+    hands, trump = deal_of(game)
+
+    state = GameState()
+    state.trump = trump
+    for seat, hand in enumerate(hands):
+        for name in sorted(hand, key=lambda name: card_index(CARDS[name])):
+            state.deal(seat, card_index(CARDS[name]), CARDS[name])
+
+    teams = {player['name']: team['name'] for team in game['Teams'] for player in team['players']}
+    for seat, hand in enumerate(hands):
+        print(colored(f'{seats[seat]} -> {teams.get(seats[seat], "?")}', 'yellow', attrs=['underline']))
+        print(' '.join(hand))
+    print(colored(f'\nTrump card: {game["Trump"]}', 'blue', attrs=['bold']))
+
+    for num_round in range(1, 11):
+        round_info = game['Rounds'][str(num_round)]
+        print(colored(f'\nRound {num_round}:', 'green', attrs=['underline']))
+        for name in round_info['Cards']:
+            seat = state.to_play()
+            if card_index(CARDS[name]) not in legal_moves(state, seat).cards():
+                raise ValueError(f'Round {num_round}: {seats[seat]} could not play {name}')
+            state.play(card_index(CARDS[name]))
+            print(colored(f'{seats[seat]} played {name}', 'green', attrs=['bold']))
+
+        winner, points = state.end_round()
+        print(colored(f'{seats[winner]} wins the round ({points} points)', 'blue', attrs=['bold']))
+        if seats[winner] != round_info['Winner'] or points != round_info['Points']:
+            raise ValueError(f'Round {num_round}: the log says {round_info["Winner"]} won {round_info["Points"]} points')
+
+    # Seats 0 and 2 are the team of the first player
+    first_team = teams.get(seats[0], 'Sporting')
+    scores = state.scores if first_team == 'Sporting' else state.scores[::-1]
+    print(colored(f'\nSporting score: {scores[0]}', 'green'))
+    print(colored(f'Benfica score: {scores[1]}', 'red'))
+
+    return scores
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Random access to the games of a game log')
+    parser.add_argument('log', type=str, help='Game log written by sueca.py')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('index', help=f'Build the index of the log ({colored("<log>.idx.npy", "green")})')
+    show = commands.add_parser('show', help='Print a game as logged')
+    show.add_argument('game', type=int, help='Number of the game')
+    play = commands.add_parser('replay', help='Replay a game trick by trick')
+    play.add_argument('game', type=int, help='Number of the game')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    match args.command:
+        case 'index':
+            start = perf_counter()
+            index = build_index(args.log)
+            print(colored(f'Indexed {len(index)} games of {args.log} in {perf_counter() - start:.1f} s', 'magenta', attrs=['bold']))
+        case 'show':
+            print(dumps(read_game(args.log, load_index(args.log), args.game), indent=4, sort_keys=True))
+        case 'replay':
+            replay(read_game(args.log, load_index(args.log), args.game))
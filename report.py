@@ -0,0 +1,215 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from ast import literal_eval
+from glob import glob
+from json import dump, dumps, load
+from hashlib import sha1
+from os.path import basename, exists, join, splitext
+from argparse import ArgumentParser
+from termcolor import colored
+from matplotlib import use
+use('Agg')  # only render to files, never open a window
+from matplotlib.pyplot import subplots, close
+
+
+############################################# Constants #############################################
+
+STRATEGIES = ['random', 'greedy', 'maxpointswon', 'maxroundswon', 'cooperative', 'predictor', 'learned', 'honest']
+
+
+########################################## Aggregates ##########################################
+
+def stats_path(output:str) -> str:
+    '''
+        Path of the aggregate stats associated with a game log
+    '''
+
+    return splitext(output)[0] + '.stats.json'
+
+def save_stats(output:str, sporting_strat:str, benfica_strat:str, num_games:int, wins:dict,
+               sporting_params:dict=None, benfica_params:dict=None) -> None:
+    '''
+        Saves the aggregate stats of a simulation next to its game log
+    '''
+
+    with open(stats_path(output), 'w') as f:
+        dump({'sporting': sporting_strat, 'benfica': benfica_strat, 'sporting_params': sporting_params or {},
+              'benfica_params': benfica_params or {}, 'num_games': num_games, 'wins': wins}, f, indent=4)
+
+def pairing_key(pairing:dict) -> tuple[str, str, str, str]:
+    '''
+        Strategies and parameters of both teams of a pairing
+    '''
+
+    return (pairing['sporting'], dumps(pairing['sporting_params'], sort_keys=True),
+            pairing['benfica'], dumps(pairing['benfica_params'], sort_keys=True))
+
+def strategy_label(pairing:dict, side:str) -> str:
+    '''
+        Strategy of a team of a pairing (sporting or benfica), followed by its parameters if it has any
+    '''
+
+    params = pairing[f'{side}_params']
+
+    return pairing[side] + dumps(params, sort_keys=True, separators=(',', ':')) if params else pairing[side]
+
+def plot_name(pairing:dict) -> str:
+    '''
+        File name of the bar plot of a pairing, with a short hash of the parameters of parameter variants
+    '''
+
+    name = f'{pairing["sporting"]}_{pairing["benfica"]}'
+    if pairing['sporting_params'] or pairing['benfica_params']:
+        name += '_' + sha1(dumps(pairing_key(pairing)).encode()).hexdigest()[:8]
+
+    return name + '.png'
+
+def load_stats(results_dir:str) -> list[dict]:
+    '''
+        Loads the aggregate stats of every pairing (and parameter variant) in a directory
+        Pairings without stats fall back to the "Wins:" line printed by sueca.py
+    '''
+
+    stats = {}
+    for path in sorted(glob(join(results_dir, '*.stats.json'))):
+        with open(path, 'r') as f:
+            pairing = load(f)
+        # Stats saved before the parameters were recorded are of the default parameters
+        pairing.setdefault('sporting_params', {})
+        pairing.setdefault('benfica_params', {})
+        stats[pairing_key(pairing)] = pairing
+
+    simulated = {(pairing['sporting'], pairing['benfica']) for pairing in stats.values()}
+    for path in sorted(glob(join(results_dir, '*.txt'))):
+        sporting_strat, _, benfica_strat = splitext(basename(path))[0].partition('_')
+        if (sporting_strat, benfica_strat) in simulated or not benfica_strat:
+            continue
+
+        with open(path, 'r') as f:
+            lines = [line for line in f if 'Wins:' in line]
+        if not lines:
+            continue
+        wins = literal_eval(lines[-1][lines[-1].index('{'):lines[-1].rindex('}') + 1])
+        pairing = {'sporting': sporting_strat, 'benfica': benfica_strat, 'sporting_params': {}, 'benfica_params': {},
+                   'num_games': wins['Benfica'] + wins['Sporting'] + wins['ties'], 'wins': wins}
+        stats[pairing_key(pairing)] = pairing
+
+    return list(stats.values())
+
+def win_rate_matrix(stats:list[dict], strategies:list[str]) -> np.ndarray:
+    '''
+        Win rate of each strategy (rows) against each other strategy (columns), parameter variants
+        being strategies of their own (strategy_label). Both seatings of a pairing (Sporting or Benfica) are combined
+    '''
+
+    wins = np.zeros((len(strategies), len(strategies)))
+    games = np.zeros((len(strategies), len(strategies)))
+    for pairing in stats:
+        s = strategies.index(strategy_label(pairing, 'sporting'))
+        b = strategies.index(strategy_label(pairing, 'benfica'))
+        wins[s, b] += pairing['wins']['Sporting']
+        wins[b, s] += pairing['wins']['Benfica']
+        games[s, b] += pairing['num_games']
+        games[b, s] += pairing['num_games']
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(games > 0, wins / games, np.nan)
+
+
+########################################## Plots ##########################################
+
+def plot_pairing(ax, pairing:dict) -> None:
+    '''
+        Plots the results of the games of a pairing in a bar plot
+    '''
+
+    info = pairing['wins']
+    # Data to bar plot (entries with no wins are left out)
+    bars = [(strategy_label(pairing, 'benfica'), info['Benfica'], 'red'),
+            (strategy_label(pairing, 'sporting'), info['Sporting'], 'green'),
+            ('ties', info['ties'], 'grey')]
+    bars = [bar for bar in bars if bar[1] != 0]
+
+    ax.bar([bar[0] for bar in bars], [bar[1] for bar in bars], color=[bar[2] for bar in bars])
+    ax.set_ylabel('Wins')
+    ax.set_title('Game Results')
+    ax.tick_params(axis='x', labelrotation=15)
+
+def plot_heatmap(ax, stats:list[dict], strategies:list[str]) -> None:
+    '''
+        Plots the win rate of every strategy against every other strategy
+    '''
+
+    matrix = win_rate_matrix(stats, strategies)
+
+    image = ax.imshow(matrix, cmap='RdYlGn', vmin=0, vmax=1)
+    ax.figure.colorbar(image, ax=ax, label='Win rate')
+    ax.set_xticks(range(len(strategies)), strategies, rotation=30, ha='right')
+    ax.set_yticks(range(len(strategies)), strategies)
+    ax.set_xlabel('Opponent')
+    ax.set_ylabel('Strategy')
+    ax.set_title('Win rate matrix')
+
+    for row in range(len(strategies)):
+        for col in range(len(strategies)):
+            if not np.isnan(matrix[row, col]):
+                ax.text(col, row, f'{matrix[row, col]:.2f}', ha='center', va='center', fontsize=8)
+
+def render(stats:list[dict], output_dir:str, heatmap:bool=True) -> None:
+    '''
+        Renders the bar plot of every pairing and the win rate heatmap
+        A single figure is reused for every bar plot and freed at the end
+    '''
+
+    fig, ax = subplots()
+    try:
+        for pairing in stats:
+            ax.clear()
+            plot_pairing(ax, pairing)
+            fig.savefig(join(output_dir, plot_name(pairing)))
+    finally:
+        close(fig)
+
+    if not heatmap or not stats:
+        return
+
+    # Keep the usual order of the strategies, followed by any other that was simulated and the parameter variants
+    labels = {strategy_label(p, side) for p in stats for side in ['sporting', 'benfica']}
+    strategies = [s for s in STRATEGIES if s in labels]
+    strategies += sorted(labels - set(strategies))
+
+    fig, ax = subplots(figsize=(8, 7))
+    try:
+        plot_heatmap(ax, stats, strategies)
+        fig.tight_layout()
+        fig.savefig(join(output_dir, 'win_rate_matrix.png'))
+    finally:
+        close(fig)
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Renders the plots of all the simulated pairings')
+    parser.add_argument('-r', '--results', type=str, default='./results', help='Directory with the aggregate stats of the pairings')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Directory to save the plots (default: the results directory)')
+    parser.add_argument('--no_heatmap', action='store_true', default=False, help='Only render the bar plot of each pairing')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    if not exists(args.results):
+        print(colored(f'No results directory: {args.results}', 'red'))
+        exit(1)
+
+    stats = load_stats(args.results)
+    render(stats, args.output or args.results, not args.no_heatmap)
+
+    print(colored(f'Rendered {len(stats)} pairings', 'magenta', attrs=['bold']))
@@ -0,0 +1,368 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from os import makedirs, remove, replace
+from os.path import basename, exists, join, splitext
+from json import JSONDecoder, dump, load
+from shutil import copyfileobj
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from Card import SUITS
+
+
+############################################# Constants #############################################
+
+# Columns of the store, with their type and the shape of each row
+COLUMNS = {
+    'pairing': (np.int16, ()),          # index into the list of pairings of the store
+    'game': (np.int32, ()),             # number of the game inside its log
+    'trump': (np.int8, ()),             # suit index of the trump (-1 if unknown)
+    'first_seat': (np.int8, ()),        # player that leads the first round (-1 if unknown)
+    'round_winner': (np.int8, (10,)),   # player that won each round
+    'round_points': (np.int8, (10,)),   # points played in each round
+    'score': (np.int16, (2,)),          # final score of Sporting and Benfica
+    'initial_points': (np.int16, (2,)), # points handed to Sporting and Benfica
+}
+
+# Players 0 and 1 play for Sporting, 2 and 3 for Benfica
+PLAYERS = ["Leitao", "Fred", "Pedro", "Sebas"]
+
+DEFAULT_STORE = './results/store'
+CHUNK_SIZE = 1 << 20
+BLOCK_SIZE = 100000
+
+
+########################################## Ingest ##########################################
+
+def iter_game_spans(path:str):
+    '''
+        Yields the games of a log one at a time, without parsing the whole array at once,
+        with the offset and length of each game in the file
+    '''
+
+    decoder = JSONDecoder()
+    buffer = ''
+    position = 0
+    consumed = 0    # characters of the file dropped from the buffer (the log is ASCII, one byte each)
+    with open(path, 'r', newline='') as f:
+        while True:
+            # Skip the array delimiters between games
+            while position < len(buffer) and buffer[position] in '[], \n\t\r':
+                position += 1
+
+            try:
+                game, end = decoder.raw_decode(buffer, position)
+                yield consumed + position, end - position, game
+                position = end
+            except ValueError:
+                # The game is not fully in the buffer, read some more of the log
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    if buffer[position:].strip():
+                        raise ValueError(f'Truncated game log: {path}')
+                    return
+                consumed += position
+                buffer = buffer[position:] + chunk
+                position = 0
+
+def iter_games(path:str):
+    '''
+        Yields the games of a log one at a time, without parsing the whole array at once
+    '''
+
+    for _, _, game in iter_game_spans(path):
+        yield game
+
+def encode_game(game:dict) -> dict[str, object]:
+    '''
+        Encodes a game of the log as a row of the store
+    '''
+
+    teams = {team['name']: team for team in game['Teams']}
+    rounds = [game['Rounds'][str(r)] for r in range(1, 11)]
+
+    return {
+        'game': game.get('Game', 0),
+        'trump': SUITS.index(game['Trump'].split('_of_')[1]) if 'Trump' in game else -1,
+        'first_seat': PLAYERS.index(game['Order'][0]) if 'Order' in game else -1,
+        'round_winner': [PLAYERS.index(r['Winner']) for r in rounds],
+        'round_points': [r['Points'] for r in rounds],
+        'score': [teams['Sporting']['score'], teams['Benfica']['score']],
+        'initial_points': [teams['Sporting']['initial_points'], teams['Benfica']['initial_points']],
+    }
+
+def iter_blocks(games, block_size:int=BLOCK_SIZE):
+    '''
+        Groups the encoded games into blocks of columns
+    '''
+
+    block = {name: [] for name in COLUMNS if name != 'pairing'}
+    for game in games:
+        for name, value in encode_game(game).items():
+            block[name].append(value)
+        if len(block['game']) == block_size:
+            yield block
+            block = {name: [] for name in COLUMNS if name != 'pairing'}
+
+    if block['game']:
+        yield block
+
+def load_metadata(store:str) -> dict:
+    '''
+        Loads the metadata of the store (pairings and ingested logs)
+    '''
+
+    if not exists(join(store, 'store.json')):
+        return {'pairings': [], 'sources': {}, 'rows': 0}
+
+    with open(join(store, 'store.json'), 'r') as f:
+        return load(f)
+
+def open_store(store:str) -> tuple[dict, dict[str, np.ndarray]]:
+    '''
+        Memory maps every column of the store
+        Only the rows counted in the metadata belong to the store: a column may be longer
+        if an ingest was interrupted after writing it
+    '''
+
+    metadata = load_metadata(store)
+    columns = {}
+    for name, (dtype, shape) in COLUMNS.items():
+        if metadata['rows'] > 0:
+            columns[name] = np.load(join(store, name + '.npy'), mmap_mode='r')[:metadata['rows']]
+            if len(columns[name]) < metadata['rows']:
+                raise ValueError(f'Column {name} of {store} is missing rows')
+        else:
+            columns[name] = np.empty((0,) + shape, dtype=dtype)
+
+    return metadata, columns
+
+def write_column(path:str, column:np.ndarray, rows_path:str, num_rows:int) -> None:
+    '''
+        Writes a column as the rows already in the store followed by the raw new rows of a file,
+        copying both a block at a time
+    '''
+
+    with open(path, 'wb') as f:
+        header = {'descr': np.lib.format.dtype_to_descr(column.dtype), 'fortran_order': False,
+                  'shape': (len(column) + num_rows,) + column.shape[1:]}
+        np.lib.format.write_array_header_1_0(f, header)
+        for start in range(0, len(column), BLOCK_SIZE):
+            f.write(np.ascontiguousarray(column[start:start + BLOCK_SIZE]).tobytes())
+        with open(rows_path, 'rb') as rows:
+            copyfileobj(rows, f)
+
+def ingest(logs:list[str], store:str, pairing:str=None) -> None:
+    '''
+        Converts game logs into columns of the store
+        The pairing of each log defaults to the name of the file (sporting_benfica)
+    '''
+
+    makedirs(store, exist_ok=True)
+    metadata, columns = open_store(store)
+
+    # The new rows of each column are appended to a file of their own as they are encoded
+    rows_paths = {name: join(store, name + '.rows') for name in COLUMNS}
+    rows_files = {name: open(path, 'wb') for name, path in rows_paths.items()}
+    num_rows = 0
+    try:
+        for log in logs:
+            if log in metadata['sources']:
+                print(colored(f'Skipping {log}, already in the store', 'yellow'))
+                continue
+
+            log_pairing = pairing or splitext(basename(log))[0]
+            if log_pairing not in metadata['pairings']:
+                metadata['pairings'].append(log_pairing)
+            pairing_index = metadata['pairings'].index(log_pairing)
+
+            # Only one block of games is in memory at a time
+            num_games = 0
+            for block in iter_blocks(iter_games(log)):
+                for name, values in block.items():
+                    dtype, shape = COLUMNS[name]
+                    rows_files[name].write(np.array(values, dtype=dtype).reshape((-1,) + shape).tobytes())
+                rows_files['pairing'].write(np.full(len(block['game']), pairing_index, dtype=COLUMNS['pairing'][0]).tobytes())
+                num_games += len(block['game'])
+
+            metadata['sources'][log] = {'pairing': log_pairing, 'games': num_games}
+            num_rows += num_games
+            print(colored(f'Ingested {num_games} games of {log_pairing} from {log}', 'green'))
+
+        for f in rows_files.values():
+            f.close()
+        if not num_rows:
+            return
+
+        # Append the new rows to each column, every column written aside before any is renamed
+        for name in COLUMNS:
+            write_column(join(store, name + '.tmp.npy'), columns[name], rows_paths[name], num_rows)
+    finally:
+        for f in rows_files.values():
+            f.close()
+        for path in rows_paths.values():
+            remove(path)
+
+    # The metadata is written last: until it counts the new rows, they are not part of the store
+    # (open_store), so an interruption leaves the store as it was before the ingest
+    for name in COLUMNS:
+        replace(join(store, name + '.tmp.npy'), join(store, name + '.npy'))
+    metadata['rows'] += num_rows
+
+    with open(join(store, 'store.json.tmp'), 'w') as f:
+        dump(metadata, f, indent=4)
+    replace(join(store, 'store.json.tmp'), join(store, 'store.json'))
+
+
+########################################## Query ##########################################
+
+def sporting_rounds(columns:dict, mask:np.ndarray) -> np.ndarray:
+    '''
+        Rounds won by Sporting (players 0 and 1)
+    '''
+
+    return columns['round_winner'][mask] < 2
+
+# Metrics computed per game (shape (games,)) or per round (shape (games, 10))
+METRICS = {
+    'games': None,  # counted directly from the groups
+    'sporting_win_rate': lambda c, m: c['score'][m, 0] > c['score'][m, 1],
+    'benfica_win_rate': lambda c, m: c['score'][m, 0] < c['score'][m, 1],
+    'tie_rate': lambda c, m: c['score'][m, 0] == c['score'][m, 1],
+    'score_sporting': lambda c, m: c['score'][m, 0],
+    'score_benfica': lambda c, m: c['score'][m, 1],
+    'converted_sporting': lambda c, m: c['score'][m, 0] - c['initial_points'][m, 0],
+    'converted_benfica': lambda c, m: c['score'][m, 1] - c['initial_points'][m, 1],
+    'round_points': lambda c, m: c['round_points'][m],
+    'sporting_round_rate': sporting_rounds,
+}
+
+GROUPS = ['pairing', 'trump', 'first_seat', 'round']
+
+def group_labels(group_by:str, metadata:dict) -> list[str]:
+    '''
+        Names of the values of a group
+    '''
+
+    match group_by:
+        case 'pairing':
+            return metadata['pairings']
+        case 'trump':
+            return SUITS
+        case 'first_seat':
+            return PLAYERS
+        case 'round':
+            return [str(r) for r in range(1, 11)]
+
+def query(store:str, pairing:str=None, trump:str=None, seat:str=None, group_by:str=None,
+          metrics:list[str]=None) -> list[tuple[str, dict[str, float]]]:
+    '''
+        Filters the games of the store and aggregates the metrics by group
+    '''
+
+    metadata, columns = open_store(store)
+    metrics = metrics or ['games', 'sporting_win_rate', 'benfica_win_rate', 'tie_rate']
+
+    # Filter the games (a slice keeps the columns memory mapped when there is no filter)
+    mask = np.ones(metadata['rows'], dtype=bool)
+    filtered = False
+    if pairing is not None:
+        if pairing not in metadata['pairings']:
+            return []
+        mask &= np.asarray(columns['pairing']) == metadata['pairings'].index(pairing)
+        filtered = True
+    if trump is not None:
+        mask &= np.asarray(columns['trump']) == SUITS.index(trump)
+        filtered = True
+    if seat is not None:
+        mask &= np.asarray(columns['first_seat']) == PLAYERS.index(seat)
+        filtered = True
+    if group_by in ['trump', 'first_seat']:
+        # Logs written before the trump and seating were recorded can not be grouped
+        mask &= np.asarray(columns[group_by]) >= 0
+        filtered = True
+    num_games = np.count_nonzero(mask)
+    selection = mask if filtered else slice(None)
+
+    labels = group_labels(group_by, metadata) if group_by else ['all']
+    if group_by in [None, 'round']:
+        # Every game belongs to the single group, or to all the round groups
+        keys = None
+        counts = np.full(len(labels), num_games)
+    else:
+        keys = np.asarray(columns[group_by][selection], dtype=np.intp)
+        counts = np.bincount(keys, minlength=len(labels))
+
+    results = {}
+    for metric in metrics:
+        if metric == 'games':
+            results[metric] = counts
+            continue
+
+        values = np.asarray(METRICS[metric](columns, selection))
+        if group_by == 'round':
+            # Per round metrics are summed by round, per game metrics are the same for every round
+            totals = values.sum(axis=0, dtype=np.float64) if values.ndim > 1 else np.full(10, values.sum(dtype=np.float64))
+        else:
+            if values.ndim > 1:
+                values = values.mean(axis=1)
+            totals = np.array([values.sum(dtype=np.float64)]) if keys is None else\
+                np.bincount(keys, weights=values, minlength=len(labels))
+        results[metric] = totals / np.maximum(counts, 1)
+
+    return [(labels[k], {metric: results[metric][k] for metric in metrics})
+            for k in range(len(labels)) if counts[k] > 0]
+
+def print_table(rows:list[tuple[str, dict[str, float]]], group_by:str) -> None:
+    '''
+        Prints the result of a query as a table
+    '''
+
+    if not rows:
+        print(colored('No games match the query', 'red'))
+        return
+
+    metrics = list(rows[0][1].keys())
+    print(colored(f'{group_by or "group":>24}' + ''.join(f'{m:>22}' for m in metrics), attrs=['bold']))
+    for label, values in rows:
+        print(f'{label:>24}' + ''.join(f'{values[m]:>22.4f}' for m in metrics))
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Columnar store of Sueca game logs')
+    parser.add_argument('--store', type=str, default=DEFAULT_STORE, help='Directory of the store')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = commands.add_parser('ingest', help='Convert game logs into the store')
+    ingest_parser.add_argument('logs', nargs='+', help='Game logs produced by sueca.py')
+    ingest_parser.add_argument('-p', '--pairing', type=str, default=None, help='Pairing of the logs (default: name of each file)')
+
+    query_parser = commands.add_parser('query', help='Filter, group and aggregate the games of the store')
+    query_parser.add_argument('-p', '--pairing', type=str, default=None, help='Only games of this pairing (sporting_benfica)')
+    query_parser.add_argument('-t', '--trump', type=str, default=None, choices=SUITS, help='Only games with this trump suit')
+    query_parser.add_argument('-s', '--seat', type=str, default=None, choices=PLAYERS, help='Only games where this player leads the first round')
+    query_parser.add_argument('-g', '--group_by', type=str, default=None, choices=GROUPS, help='Aggregate by group')
+    query_parser.add_argument('-m', '--metrics', type=str, default=None, help=f'Comma separated metrics: {", ".join(METRICS)}')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    if args.command == 'ingest':
+        ingest(args.logs, args.store, args.pairing)
+    else:
+        start = perf_counter()
+        rows = query(args.store, args.pairing, args.trump, args.seat, args.group_by,
+                     args.metrics.split(',') if args.metrics else None)
+        elapsed = perf_counter() - start
+
+        print_table(rows, args.group_by)
+        print(colored(f'\nQuery answered in {elapsed * 1000:.2f} ms', 'blue'))
@@ -0,0 +1,227 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from itertools import permutations
+from State import TEAM, TURN
+
+
+############################################# Constants #############################################
+
+# Lowest and highest order of the cards of a 10 bit suit mask (-1 if empty)
+LOWEST = tuple((mask & -mask).bit_length() - 1 for mask in range(1 << 10))
+HIGHEST = tuple(mask.bit_length() - 1 for mask in range(1 << 10))
+# Mask of the orders above each order
+ABOVE = tuple(((1 << 10) - 1) >> (order + 1) << (order + 1) for order in range(10))
+
+# Suit picked among a set of suits (4 bit mask) holding a card of the same order, for every
+# ranking of the suits by when that card was dealt: the first suit of the ranking in the set
+RANKINGS = list(permutations(range(4)))
+PICK = {ranking: tuple(next((suit for suit in ranking if suits >> suit & 1), -1) for suits in range(16))
+        for ranking in RANKINGS}
+
+# What a strategy plays, resolved over the masks of the hand
+STRONGEST = 0           # strongest legal card (the last dealt one if several suits tie)
+WEAKEST = 1             # weakest legal card (the first dealt one if several suits tie)
+STRONGEST_TRUMP = 2     # strongest trump
+WEAKEST_TRUMP = 3       # weakest trump
+LOWEST_WINNING = 4      # weakest card of the round suit above the winning order
+
+# Bits of the abstract state a decision is indexed by
+LEADING = 1             # first to play in the round
+PARTNER_WINNING = 2     # the partner wins the round so far
+FOLLOWS = 4             # has cards of the round suit
+CAN_WIN = 8             # its strongest card of the round suit is above the winning order
+CUTS = 16               # has no card of the round suit, has trumps and the round has the points to cut
+CONTEXTS = 32
+
+
+########################################## Rules ##########################################
+
+def greedy(leading:bool, partner_winning:bool, follows:bool, can_win:bool, cuts:bool) -> int:
+    '''
+        GreedyPlayer: the strongest card it may play
+    '''
+
+    return STRONGEST
+
+def max_points(leading:bool, partner_winning:bool, follows:bool, can_win:bool, cuts:bool) -> int:
+    '''
+        MaximizePointsPlayer: the strongest card when leading, when the partner wins or when it can win,
+        the strongest trump to cut, the weakest card otherwise
+    '''
+
+    if leading or partner_winning:
+        return STRONGEST
+    if follows:
+        return STRONGEST if can_win else WEAKEST
+
+    return STRONGEST_TRUMP if cuts else WEAKEST
+
+def max_rounds(leading:bool, partner_winning:bool, follows:bool, can_win:bool, cuts:bool) -> int:
+    '''
+        MaximizeRoundsWonPlayer: the strongest card when leading, the weakest card when the partner wins,
+        the lowest card that wins, the weakest trump to cut, the weakest card otherwise
+    '''
+
+    if leading:
+        return STRONGEST
+    if partner_winning:
+        return WEAKEST
+    if follows:
+        return LOWEST_WINNING if can_win else WEAKEST
+
+    return WEAKEST_TRUMP if cuts else WEAKEST
+
+def compile_rule(rule) -> tuple[int, ...]:
+    '''
+        Table of the action of a rule for every abstract state
+    '''
+
+    return tuple(rule(bool(context & LEADING), bool(context & PARTNER_WINNING), bool(context & FOLLOWS),
+                      bool(context & CAN_WIN), bool(context & CUTS)) for context in range(CONTEXTS))
+
+# Compiled tables of the rule based strategies (Player.get_strategy)
+TABLES = {
+    'Greedy Player': compile_rule(greedy),
+    'Maximize Points Won': compile_rule(max_points),
+    'Maximize Rounds Won': compile_rule(max_rounds),
+}
+
+
+########################################## Object Engine ##########################################
+
+def tie_breaks(dealt:list[int]) -> tuple[tuple, tuple]:
+    '''
+        Suit picked among the suits with a card of each order, by the weakest and by the strongest
+        card rules (LegalMoves.weakest and LegalMoves.strongest): the first and the last dealt card
+    '''
+
+    weakest = tuple(PICK[tuple(sorted(range(4), key=lambda suit: (dealt[suit * 10 + order], suit)))] for order in range(10))
+    strongest = tuple(PICK[tuple(sorted(range(4), key=lambda suit: (-dealt[suit * 10 + order], suit)))] for order in range(10))
+
+    return weakest, strongest
+
+def extreme(masks:list[int], orders:tuple[int, ...], picks:tuple) -> int:
+    '''
+        Card (index) with the lowest or highest order (orders: LOWEST or HIGHEST) of the masks,
+        the tie between suits broken by picks
+    '''
+
+    order = orders[masks[0] | masks[1] | masks[2] | masks[3]]
+    suits = masks[0] >> order & 1 | (masks[1] >> order & 1) << 1 | (masks[2] >> order & 1) << 2 | (masks[3] >> order & 1) << 3
+
+    return picks[order][suits] * 10 + order
+
+def context(state, seat:int, trump_points:int) -> int:
+    '''
+        Abstract state of the decision of a seat
+    '''
+
+    if not state.played:
+        return LEADING
+
+    hand = state.hands[seat]
+    suit = state.trick[0] // 10
+    follows = hand[suit] != 0
+
+    return (TEAM[TURN[state.leader][state.winning]] == TEAM[seat]) * PARTNER_WINNING | follows * FOLLOWS |\
+        (follows and HIGHEST[hand[suit]] > state.trick[state.winning] % 10) * CAN_WIN |\
+        (not follows and hand[state.trump] != 0 and state.points >= trump_points) * CUTS
+
+def table_move(table:tuple[int, ...], state, seat:int, trump_points:int=0) -> int:
+    '''
+        Card (index) a compiled strategy plays from a seat of a game state (State.GameState)
+    '''
+
+    if state.ties is None:
+        state.ties = tie_breaks(state.dealt)
+
+    hand = state.hands[seat]
+    action = table[context(state, seat, trump_points)]
+    suit = state.trick[0] // 10 if state.played and hand[state.trick[0] // 10] else -1
+    trump = state.trump
+
+    if action == STRONGEST:
+        return suit * 10 + HIGHEST[hand[suit]] if suit >= 0 else extreme(hand, HIGHEST, state.ties[1])
+    if action == WEAKEST:
+        return suit * 10 + LOWEST[hand[suit]] if suit >= 0 else extreme(hand, LOWEST, state.ties[0])
+    if action == STRONGEST_TRUMP:
+        return trump * 10 + HIGHEST[hand[trump]]
+    if action == WEAKEST_TRUMP:
+        return trump * 10 + LOWEST[hand[trump]]
+
+    return suit * 10 + LOWEST[hand[suit] & ABOVE[state.trick[state.winning] % 10]]
+
+
+########################################## Vectorized Engines ##########################################
+
+LOWEST_ARRAY = np.array(LOWEST, dtype=np.int8)
+HIGHEST_ARRAY = np.array(HIGHEST, dtype=np.int8)
+ABOVE_ARRAY = np.array(ABOVE, dtype=np.int16)
+TABLE_ARRAYS = {strategy: np.array(table, dtype=np.int8) for strategy, table in TABLES.items()}
+# Rankings encoded in base 4 (first suit in the lowest digits) and their picks
+RANKING_INDEX = np.zeros(256, dtype=np.int8)
+RANKING_INDEX[[sum(suit << 2 * k for k, suit in enumerate(ranking)) for ranking in RANKINGS]] = np.arange(len(RANKINGS))
+PICK_ARRAY = np.array([PICK[ranking] for ranking in RANKINGS], dtype=np.int8)
+
+def batch_tie_breaks(dealt:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+        Ranking (index in RANKINGS) of the suits of each order of each game (dealt: (games, 40)),
+        for the weakest and for the strongest card rules, as tie_breaks
+    '''
+
+    dealt = np.asarray(dealt).reshape(-1, 4, 10).transpose(0, 2, 1)       # (games, order, suit)
+    digits = 4 ** np.arange(4)
+
+    weakest = np.argsort(dealt, axis=2, kind='stable')
+    strongest = np.argsort(-dealt, axis=2, kind='stable')
+
+    return RANKING_INDEX[weakest @ digits], RANKING_INDEX[strongest @ digits]
+
+def batch_extreme(masks:np.ndarray, orders:np.ndarray, rankings:np.ndarray) -> np.ndarray:
+    '''
+        extreme over a batch: masks (games, 4), rankings (games, 10) from batch_tie_breaks
+    '''
+
+    games = np.arange(len(masks))
+    order = orders[np.bitwise_or.reduce(masks, axis=1)].astype(np.int64)
+    suits = ((masks >> order[:, None] & 1) << np.arange(4)).sum(axis=1)
+
+    return PICK_ARRAY[rankings[games, order], suits] * 10 + order
+
+def batch_moves(table:np.ndarray, hands:np.ndarray, trick:np.ndarray, played:np.ndarray, winning:np.ndarray,
+                partner_winning:np.ndarray, points:np.ndarray, trump:np.ndarray, ties:tuple[np.ndarray, np.ndarray],
+                trump_points:int=0) -> np.ndarray:
+    '''
+        Card (index) a compiled strategy (TABLE_ARRAYS) plays in each game of a batch
+            - hands: suit masks of the player of each game (games, 4)
+            - trick, played, winning, points: cards of the round (games, 4), how many were played,
+              position of the winning card and points of the round
+            - partner_winning: whether the partner of the player wins the round so far
+            - trump: trump suit of each game
+            - ties: rankings of batch_tie_breaks
+        Same moves as table_move
+    '''
+
+    games = np.arange(len(hands))
+    hands = hands.astype(np.int64)
+    leading = played == 0
+    suit = np.where(leading, 0, trick[:, 0] // 10)
+    suit_mask = hands[games, suit]
+    winning_order = trick[games, winning] % 10
+    follows = ~leading & (suit_mask != 0)
+    can_win = follows & (HIGHEST_ARRAY[suit_mask] > winning_order)
+    trump_mask = hands[games, trump]
+    cuts = ~leading & ~follows & (trump_mask != 0) & (points >= trump_points)
+
+    action = table[np.where(leading, LEADING, partner_winning * PARTNER_WINNING | follows * FOLLOWS |
+                            can_win * CAN_WIN | cuts * CUTS)]
+
+    legal = np.where(follows[:, None], np.where(np.arange(4) == suit[:, None], hands, 0), hands)
+    moves = np.select(
+        [action == STRONGEST, action == WEAKEST, action == STRONGEST_TRUMP, action == WEAKEST_TRUMP],
+        [batch_extreme(legal, HIGHEST_ARRAY, ties[1]), batch_extreme(legal, LOWEST_ARRAY, ties[0]),
+         trump * 10 + HIGHEST_ARRAY[trump_mask], trump * 10 + LOWEST_ARRAY[trump_mask]],
+        suit * 10 + LOWEST_ARRAY[suit_mask & ABOVE_ARRAY[winning_order]])
+
+    return moves
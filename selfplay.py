@@ -0,0 +1,214 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from os import makedirs
+from os.path import basename, join
+from json import dump, load, loads
+from multiprocessing import Pool
+from random import seed
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from Game import Game
+from Player import BeliefPlayer
+from State import legal_moves
+from report import STRATEGIES
+
+
+############################################# Constants #############################################
+
+# One record per card played: the state the player decided on, the card it played
+# and the final score of its team (beliefs are indexed by seat)
+RECORD = np.dtype([
+    ('game', '<i8'),
+    ('round', 'i1'),
+    ('position', 'i1'),             # position of the player in the round
+    ('seat', 'i1'),
+    ('strategy', 'i1'),             # index in report.STRATEGIES
+    ('trump', 'i1'),
+    ('trick', 'i1', (4,)),          # cards (indices) of the round so far, -1 if not played yet
+    ('hand', '<u8'),                # cards of the player as a 40 bit mask (bit = card index)
+    ('seen', '<u8'),                # cards played in previous rounds and in the round so far
+    ('legal', '<u8'),               # cards the player was allowed to play
+    ('beliefs', '<f4', (4, 4, 10)), # beliefs of the player (zeros for players without beliefs)
+    ('action', 'i1'),               # card played
+    ('team_score', '<i2'),          # final score of the team of the player
+])
+
+RECORDS_PER_GAME = 40
+ALL_CARDS = (1 << 40) - 1
+MANIFEST = 'selfplay.json'
+
+
+########################################## Recorder ##########################################
+
+class Recorder:
+    '''
+        Recorder ->
+            - rows: records of the game being played, one per card played
+            - count: number of cards recorded in the game so far
+            - game_id: number of the game being played
+            - strategies: strategy index of each seat
+            - belief_rows: beliefs row (player id - 1) of each seat, to store the beliefs by seat
+        Set as the recorder of a Game, which calls record with every card played
+    '''
+
+    def __init__(self) -> None:
+        self.rows = np.zeros(RECORDS_PER_GAME, dtype=RECORD)
+        self.count = 0
+        self.game_id = 0
+        self.strategies = [0] * 4
+        self.belief_rows = [0] * 4
+
+    def start(self, game:Game, game_id:int, sporting:str, benfica:str) -> None:
+        '''
+            Starts recording a game
+        '''
+
+        self.rows[:] = 0
+        self.count = 0
+        self.game_id = game_id
+        self.strategies = [STRATEGIES.index(sporting if player.team is game.teams[0] else benfica) for player in game.seats]
+        self.belief_rows = [player.id - 1 for player in game.seats]
+        game.recorder = self
+
+    def record(self, game:Game, player, card:int, num_round:int, position:int) -> None:
+        '''
+            Records the state a player decided on and the card it played (called by Game.play_round)
+        '''
+
+        state = game.state
+        row = self.rows[self.count]
+        row['game'] = self.game_id
+        row['round'] = num_round
+        row['position'] = position
+        row['seat'] = player.seat
+        row['strategy'] = self.strategies[player.seat]
+        row['trump'] = state.trump
+        row['trick'] = state.trick
+        row['hand'] = state.hand_mask(player.seat)
+        # Cards no longer in any hand were played
+        row['seen'] = ALL_CARDS ^ (state.hand_mask(0) | state.hand_mask(1) | state.hand_mask(2) | state.hand_mask(3))
+        legal = legal_moves(state, player.seat).masks
+        row['legal'] = legal[0] | legal[1] << 10 | legal[2] << 20 | legal[3] << 30
+        if isinstance(player, BeliefPlayer):
+            row['beliefs'] = player.beliefs[self.belief_rows]
+        row['action'] = card
+
+        self.count += 1
+
+    def finish(self, game:Game) -> np.ndarray:
+        '''
+            Fills the final score of each team, returns the records of the game
+        '''
+
+        scores = np.array(game.state.scores)
+        self.rows['team_score'] = scores[self.rows['seat'] % 2]
+
+        return self.rows[:self.count]
+
+
+########################################## Producers ##########################################
+
+def produce_shard(task:tuple) -> tuple[str, int, float]:
+    '''
+        Plays a range of games and writes their records to a memory mapped .npy file, a chunk of games
+        at a time (runs in the worker processes). Returns the file, the number of records and the time taken
+    '''
+
+    path, start, stop, sporting, benfica, sporting_params, benfica_params, base_seed, chunk = task
+    start_time = perf_counter()
+
+    shard = np.lib.format.open_memmap(path, mode='w+', dtype=RECORD, shape=((stop - start) * RECORDS_PER_GAME,))
+    buffer = np.zeros(chunk * RECORDS_PER_GAME, dtype=RECORD)
+    recorder = Recorder()
+    written = filled = 0
+    for g in range(start, stop):
+        seed(base_seed + g)
+        game = Game(sporting, benfica, False, 'auto', sporting_params, benfica_params)
+        recorder.start(game, g, sporting, benfica)
+        game.hand_cards()
+        game.play_game()
+
+        rows = recorder.finish(game)
+        buffer[filled:filled + len(rows)] = rows
+        filled += len(rows)
+
+        # Copy a full chunk into the file at once
+        if filled + RECORDS_PER_GAME > len(buffer) or g == stop - 1:
+            shard[written:written + filled] = buffer[:filled]
+            written += filled
+            filled = 0
+
+    shard.flush()
+    del shard
+
+    return path, written, perf_counter() - start_time
+
+def generate(output_dir:str, num_games:int, sporting:str, benfica:str, sporting_params:dict, benfica_params:dict,
+             base_seed:int, shard_games:int, chunk:int, workers:int) -> int:
+    '''
+        Plays num_games split in shards over a process pool and writes a manifest of the shards
+        Returns the number of records written
+    '''
+
+    makedirs(output_dir, exist_ok=True)
+    tasks = [(join(output_dir, f'shard_{k:05d}.npy'), start, min(start + shard_games, num_games),
+              sporting, benfica, sporting_params, benfica_params, base_seed, chunk)
+             for k, start in enumerate(range(0, num_games, shard_games))]
+
+    shards, total = [], 0
+    with Pool(workers) as pool:
+        for path, records, seconds in pool.imap_unordered(produce_shard, tasks):
+            shards.append(path)
+            total += records
+            print(colored(f'{path}: {records} records ({records / seconds:.0f} records/s)', 'blue'))
+
+    with open(join(output_dir, MANIFEST), 'w') as f:
+        dump({'sporting': sporting, 'benfica': benfica, 'sporting_params': sporting_params,
+              'benfica_params': benfica_params, 'num_games': num_games, 'seed': base_seed,
+              'records': total, 'dtype': RECORD.descr, 'shards': sorted(basename(path) for path in shards)}, f, indent=4)
+
+    return total
+
+def open_shards(output_dir:str) -> list[np.memmap]:
+    '''
+        Memory maps the shards of a self-play directory (read only)
+        The manifest lists the shards by file name, found next to it wherever the directory is
+    '''
+
+    with open(join(output_dir, MANIFEST), 'r') as f:
+        manifest = load(f)
+
+    return [np.load(join(output_dir, basename(path)), mmap_mode='r') for path in manifest['shards']]
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Generates self-play records of the decisions of the players')
+    parser.add_argument('-o', '--output', type=str, default='./results/selfplay', help='Directory to write the shards to')
+    parser.add_argument('-s', '--sporting', type=str, default='cooperative', help='Strategy of team Sporting')
+    parser.add_argument('-b', '--benfica', type=str, default='cooperative', help='Strategy of team Benfica')
+    parser.add_argument('-sp', '--sporting_params', type=loads, default={}, help='Parameters of the strategy of team Sporting, as JSON')
+    parser.add_argument('-bp', '--benfica_params', type=loads, default={}, help='Parameters of the strategy of team Benfica, as JSON')
+    parser.add_argument('-n', '--num_games', type=int, default=10000, help='Number of games to play')
+    parser.add_argument('--shard_games', type=int, default=2500, help='Games per shard (one task of a worker)')
+    parser.add_argument('--chunk', type=int, default=250, help='Games buffered before writing to the shard')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Number of worker processes (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first game (game i is seeded with seed + i)')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    start = perf_counter()
+    total = generate(args.output, args.num_games, args.sporting, args.benfica, args.sporting_params, args.benfica_params,
+                     args.seed, args.shard_games, args.chunk, args.workers)
+    elapsed = perf_counter() - start
+    print(colored(f'Wrote {total} records in {elapsed:.1f} s ({total / elapsed * 3600 / 1e6:.1f} M records/hour)', 'magenta', attrs=['bold']))
@@ -1,10 +1,16 @@
 ############################################# Libraries #############################################
 
-from json import dumps
+from os import remove, replace
+from os.path import dirname, exists
+from json import dumps, dump, load, loads
+from random import getstate, setstate, seed
 from Game import Game
 from argparse import ArgumentParser
 from termcolor import colored
-from matplotlib.pyplot import subplots, savefig, xticks
+from report import render, save_stats
+from cache import ResultCache
+from deals import open_corpus
+from telemetry import Telemetry
 
 
 ########################################## Helper Functions ##########################################
@@ -17,106 +23,261 @@ def parse_arguments():
     parser = ArgumentParser(description='Sueca game simulator')
 
     parser.add_argument('-o', '--output', type=str, required=True, help='Output file to save the game log')
-    parser.add_argument('-s', '--sporting', type=str, required=True, help=f'Strategy for team Sporting: {colored("random", "green", attrs=["bold"])}, {colored("maxpointswon", "green", attrs=["bold"])}, {colored("maxroundswon", "green", attrs=["bold"])}, {colored("cooperative", "green", attrs=["bold"])}, {colored("greedy", "green", attrs=["bold"])}, {colored("predictor", "green", attrs=["bold"])}')
-    parser.add_argument('-b', '--benfica', type=str, required=True, help=f'Strategy for team Benfica: {colored("random", "green", attrs=["bold"])}, {colored("maxpointswon", "green", attrs=["bold"])}, {colored("maxroundswon", "green", attrs=["bold"])}, {colored("cooperative", "green", attrs=["bold"])}, {colored("greedy", "green", attrs=["bold"])}, {colored("predictor", "green", attrs=["bold"])}')
+    parser.add_argument('-s', '--sporting', type=str, required=True, help=f'Strategy for team Sporting: {colored("random", "green", attrs=["bold"])}, {colored("maxpointswon", "green", attrs=["bold"])}, {colored("maxroundswon", "green", attrs=["bold"])}, {colored("cooperative", "green", attrs=["bold"])}, {colored("greedy", "green", attrs=["bold"])}, {colored("predictor", "green", attrs=["bold"])}, {colored("honest", "green", attrs=["bold"])}, {colored("learned", "green", attrs=["bold"])}')
+    parser.add_argument('-b', '--benfica', type=str, required=True, help=f'Strategy for team Benfica: {colored("random", "green", attrs=["bold"])}, {colored("maxpointswon", "green", attrs=["bold"])}, {colored("maxroundswon", "green", attrs=["bold"])}, {colored("cooperative", "green", attrs=["bold"])}, {colored("greedy", "green", attrs=["bold"])}, {colored("predictor", "green", attrs=["bold"])}, {colored("honest", "green", attrs=["bold"])}, {colored("learned", "green", attrs=["bold"])}')
+    parser.add_argument('-sp', '--sporting_params', type=loads, default={}, help='Parameters of the strategy of team Sporting, as JSON (e.g. \'{"trump_penalty": 20}\')')
+    parser.add_argument('-bp', '--benfica_params', type=loads, default={}, help='Parameters of the strategy of team Benfica, as JSON')
     parser.add_argument('-n', '--num_games', type=int, default=1, help='Number of games to simulate')
     parser.add_argument('-v', '--verbose', action='store_true', default=False, help='Print the game information as it unfolds')
     parser.add_argument('-m', '--mode', type=str, default='auto', help=f'Mode of the game: {colored("auto", "green", attrs=["bold"])} (machine vs machine) or {colored("human", "green", attrs=["bold"])} (machine vs user)')
+    parser.add_argument('-t', '--think_time', type=float, default=None, help='Seconds each bot decision may take, searches return their best card so far (default: no limit)')
+    parser.add_argument('-c', '--checkpoint_every', type=int, default=100, help='Number of games between checkpoints of the simulation')
+    parser.add_argument('--no_plot', action='store_true', default=False, help='Do not plot the results (render them later with report.py)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the games (game i is seeded with seed + i)')
+    parser.add_argument('--cache', type=str, default=None, help='Directory of the result cache: reuse the games already played with the same seeds, strategies and engine code (needs --seed)')
+    parser.add_argument('-d', '--deals', type=str, default=None, help='Deal corpus (deals.py): game i is played on deal seed + i of the corpus (deal i without a seed)')
+    parser.add_argument('-p', '--progress', type=float, default=10, help='Seconds between progress reports on stderr in auto mode (0: no reports)')
+    parser.add_argument('--metrics', type=str, default=None, help='File to export the progress to in the Prometheus text format')
+    parser.add_argument('--sample', type=int, default=10, help='Time the decisions of one game in this many')
+    parser.add_argument('-r', '--resume', action='store_true', default=False, help='Resume the simulation from the last checkpoint of the output file')
 
     # the game mode can only be 'auto' or 'human'
     if parser.parse_args().mode not in ['auto', 'human'] or\
-       parser.parse_args().sporting not in ['random', 'maxpointswon', 'maxroundswon', 'cooperative', 'greedy', 'predictor'] or\
-       parser.parse_args().benfica not in ['random', 'maxpointswon', 'maxroundswon', 'cooperative', 'greedy', 'predictor']:
+       parser.parse_args().sporting not in ['random', 'maxpointswon', 'maxroundswon', 'cooperative', 'greedy', 'predictor', 'honest', 'learned'] or\
+       parser.parse_args().benfica not in ['random', 'maxpointswon', 'maxroundswon', 'cooperative', 'greedy', 'predictor', 'honest', 'learned']:
         # print the help message and exit
         parser.print_help()
 
     return parser.parse_args()
 
-def plot_results(info, benfica_strat, sporting_strat):
+def checkpoint_path(output:str) -> str:
     '''
-        Plots the results of the games in a bar plot
+        Path of the checkpoint file associated with an output file
+    '''
+
+    return output + '.ckpt'
+
+def save_checkpoint(output:str, checkpoint:dict) -> None:
+    '''
+        Saves a checkpoint of the simulation (games played, RNG state, aggregates and log offset)
+    '''
+
+    # Write to a temporary file first so that an interruption never leaves a broken checkpoint
+    with open(checkpoint_path(output) + '.tmp', 'w') as f:
+        dump(checkpoint, f)
+    replace(checkpoint_path(output) + '.tmp', checkpoint_path(output))
+
+def load_checkpoint(output:str, args) -> dict:
+    '''
+        Loads the last checkpoint of the simulation, making sure it belongs to the same run
+    '''
+
+    with open(checkpoint_path(output), 'r') as f:
+        checkpoint = load(f)
+
+    if checkpoint['sporting'] != args.sporting or checkpoint['benfica'] != args.benfica or\
+       checkpoint['num_games'] != args.num_games or\
+       checkpoint.get('sporting_params', {}) != args.sporting_params or\
+       checkpoint.get('benfica_params', {}) != args.benfica_params or\
+       checkpoint.get('deals') != args.deals:
+        raise ValueError(f'Checkpoint {checkpoint_path(output)} belongs to a different simulation')
+
+    # JSON turns the tuples of the RNG state into lists
+    version, internal_state, gauss_next = checkpoint['rng_state']
+    checkpoint['rng_state'] = (version, tuple(internal_state), gauss_next)
+
+    return checkpoint
+
+def new_aggregates() -> dict:
+    '''
+        Aggregates of no games
     '''
 
-    # Data to bar plot
-    strategies = [benfica_strat, sporting_strat, 'ties']
-    wins = [info['Benfica'], info['Sporting'], info['ties']]
+    return {'Benfica': 0, 'Sporting': 0, 'ties': 0,
+            'average_points_per_game_sporing': 0,
+            'average_points_per_game_benfica': 0,
+            'converted_points_sporting': 0,
+            'converted_points_benfica': 0
+            }
 
-    # Make it so that if some team has 0 wins, we remove entries from both lists
-    for i in range(len(wins)):
-        if wins[i] == 0:
-            del wins[i]
-            del strategies[i]
+def add_aggregates(aggregates:dict, other:dict) -> None:
+    '''
+        Adds the aggregates of other games (before averaging)
+    '''
+
+    for key, value in other.items():
+        aggregates[key] += value
 
-    # Plot
-    _, ax = subplots()
-    ax.bar(strategies, wins, color=['red', 'green', 'grey'])
-    ax.set_ylabel('Wins')	
-    ax.set_title('Game Results')
-    xticks(rotation=15)
+def game_aggregates(game:Game, winner:str) -> dict:
+    '''
+        Aggregates of a single game
+    '''
+
+    aggregates = new_aggregates()
+    aggregates['average_points_per_game_sporing'] += game.teams[0].score
+    aggregates['average_points_per_game_benfica'] += game.teams[1].score
+    aggregates['converted_points_sporting'] += game.teams[0].score - game.teams[0].initial_points
+    aggregates['converted_points_benfica'] += game.teams[1].score - game.teams[1].initial_points
+    aggregates[winner] += 1
+
+    return aggregates
+
+def plot_results(info, benfica_strat, sporting_strat, output_dir='./results', sporting_params=None, benfica_params=None):
+    '''
+        Plots the results of the games in a bar plot
+    '''
 
-    # Save the plot
-    savefig(f'./results/{sporting_strat}_{benfica_strat}.png')
+    render([{'sporting': sporting_strat, 'benfica': benfica_strat, 'sporting_params': sporting_params or {},
+             'benfica_params': benfica_params or {}, 'wins': info}], output_dir, heatmap=False)
 
 
 ########################################## Main Program #############################################
 
 if __name__ == "__main__":
-    try:
-        args = parse_arguments()
-        
-        verbose = args.verbose
+    args = parse_arguments()
+
+    verbose = args.verbose
+
+    if args.resume:
+        # Continue right after the last game stored in the checkpoint
+        checkpoint = load_checkpoint(args.output, args)
+        setstate(checkpoint['rng_state'])
+        wins = checkpoint['wins']
+        games_played = checkpoint['games_played']
+
+        # Drop whatever was written after the checkpoint (partial games and the closing bracket)
+        log = open(args.output, 'r+')
+        log.seek(checkpoint['log_offset'])
+        log.truncate()
+    else:
+        wins = new_aggregates()
+        games_played = 0
 
         # Open and clean the output file
-        with open(args.output, 'w') as f:
-            f.write('[\n')
-
-        wins = {'Benfica': 0, 'Sporting': 0, 'ties': 0,
-                'average_points_per_game_sporing': 0,
-                'average_points_per_game_benfica': 0,
-                'converted_points_sporting': 0,
-                'converted_points_benfica': 0
-                }
-
-        for i in range(args.num_games):
-            if verbose:
-                print(colored(f'\nGAME {i + 1}', 'green', attrs=['bold', 'underline']))
-
-            # Initialize the game
-            game = Game(args.sporting, args.benfica, verbose, args.mode)
-
-            # If the game is in human mode, print the player's partner
-            if args.mode == 'human':
-                print(f'\nYour partner is {colored(game.get_partner("Leitao").name, "light_yellow")}')
-
-            # Distribute the cards
-            game.hand_cards()
-
-            # Play the game
-            winner = game.play_game()
-            wins['average_points_per_game_sporing'] += game.teams[0].score
-            wins['average_points_per_game_benfica'] += game.teams[1].score
-            wins['converted_points_sporting'] += game.teams[0].score - game.teams[0].initial_points
-            wins['converted_points_benfica'] += game.teams[1].score - game.teams[1].initial_points
-            wins[winner] += 1
-
-            with open(args.output, 'a') as f:
-                game.game_info['Game'] = i + 1
-                f.write(dumps(game.game_info, indent = 4, sort_keys=True) + f'{"," if i < args.num_games - 1 else ""}\n')
+        log = open(args.output, 'w')
+        log.write('[\n')
+
+    # State of the simulation right after the last finished game
+    checkpoint = {'sporting': args.sporting, 'benfica': args.benfica,
+                  'sporting_params': args.sporting_params, 'benfica_params': args.benfica_params,
+                  'num_games': args.num_games, 'deals': args.deals, 'games_played': games_played,
+                  'rng_state': getstate(), 'wins': dict(wins), 'log_offset': log.tell()}
+
+    # Every game on its own deal of the corpus, the deal of the seed of the game (as the blocks of the cache)
+    corpus = open_corpus(args.deals) if args.deals else None
+    first_deal = args.seed or 0
+    if corpus is not None and len(corpus) < first_deal + args.num_games:
+        print(colored(f'The corpus {args.deals} has only {len(corpus)} deals', 'red'))
+        exit(1)
+
+    # Without the cache all the games are a single range, with it ranges are blocks of seeds
+    cache = None
+    if args.cache:
+        if args.seed is None or args.mode != 'auto' or args.think_time is not None:
+            print(colored('The cache needs reproducible games: use --seed, auto mode and no --think_time', 'red'))
+            exit(1)
+        cache = ResultCache(args.cache, args.sporting, args.benfica, args.sporting_params, args.benfica_params, args.deals)
+    ranges = cache.blocks(args.seed, games_played, args.num_games) if cache else [(games_played, args.num_games)]
+    reused = 0
+
+    # Progress reports, off when the games are printed as they unfold
+    telemetry = None
+    if args.mode == 'auto' and not verbose and (args.progress > 0 or args.metrics):
+        telemetry = Telemetry(args.output, args.num_games, games_played, args.progress if args.progress > 0 else float('inf'),
+                              args.metrics, args.sample)
+
+    try:
+        for start, stop in ranges:
+            cached = cache.load(args.seed + start, args.seed + stop) if cache else None
+            if cached is not None:
+                for i, game_info in enumerate(cached['games'], start):
+                    # JSON turns the round numbers into strings
+                    game_info['Rounds'] = {int(r): info for r, info in game_info['Rounds'].items()}
+                    game_info['Game'] = i + 1
+                    log.write((',\n' if i > 0 else '') + dumps(game_info, indent = 4, sort_keys=True))
+                add_aggregates(wins, cached['aggregates'])
+                reused += stop - start
+
+                checkpoint.update(games_played=stop, rng_state=getstate(), wins=dict(wins), log_offset=log.tell())
+                if telemetry:
+                    telemetry.update(stop, wins)
+                continue
 
+            block, block_games = new_aggregates(), []
+            for i in range(start, stop):
+                if verbose:
+                    print(colored(f'\nGAME {i + 1}', 'green', attrs=['bold', 'underline']))
 
-        wins['average_points_per_game_sporing'] /= args.num_games
-        wins['average_points_per_game_benfica'] /= args.num_games
-        wins['converted_points_sporting'] /= args.num_games
-        wins['converted_points_benfica'] /= args.num_games
-        # Close the output file
-        with open(args.output, 'a') as f:
-            f.write(']')
+                if args.seed is not None:
+                    seed(args.seed + i)
 
-        print(colored(f'\nWins: {wins}', 'magenta', attrs=['bold']))
+                # Initialize the game
+                game = Game(args.sporting, args.benfica, verbose, args.mode, args.sporting_params, args.benfica_params,
+                            args.think_time, corpus[first_deal + i] if corpus is not None else None)
 
-        if args.mode == 'auto':
-            plot_results(wins, args.benfica, args.sporting)
+                # If the game is in human mode, print the player's partner
+                if args.mode == 'human':
+                    print(f'\nYour partner is {colored(game.get_partner("Leitao").name, "light_yellow")}')
+
+                if telemetry:
+                    game.timer = telemetry.timer(i)
+
+                # Distribute the cards
+                game.hand_cards()
+
+                # Play the game
+                winner = game.play_game()
+                aggregates = game_aggregates(game, winner)
+                add_aggregates(wins, aggregates)
+                add_aggregates(block, aggregates)
+                if cache:
+                    block_games.append(dict(game.game_info))
+
+                game.game_info['Game'] = i + 1
+                log.write((',\n' if i > 0 else '') + dumps(game.game_info, indent = 4, sort_keys=True))
+
+                checkpoint.update(games_played=i + 1, rng_state=getstate(), wins=dict(wins), log_offset=log.tell())
+                if telemetry:
+                    telemetry.update(i + 1, wins)
+                if (i + 1) % args.checkpoint_every == 0:
+                    log.flush()
+                    save_checkpoint(args.output, checkpoint)
+
+            if cache:
+                cache.store(args.seed + start, args.seed + stop, block, block_games)
 
     except KeyboardInterrupt:
-        print(colored('\nGoodbye!', 'blue'))
+        # Leave a valid log with every finished game and a checkpoint to resume from
+        log.seek(checkpoint['log_offset'])
+        log.truncate()
+        log.write('\n]')
+        log.close()
+        save_checkpoint(args.output, checkpoint)
+        print(colored(f'\nInterrupted after {checkpoint["games_played"]} games, run again with --resume to continue', 'blue'))
+        print(colored('Goodbye!', 'blue'))
         exit(0)
+
+    if telemetry:
+        telemetry.close(args.num_games, wins)
+
+    wins['average_points_per_game_sporing'] /= args.num_games
+    wins['average_points_per_game_benfica'] /= args.num_games
+    wins['converted_points_sporting'] /= args.num_games
+    wins['converted_points_benfica'] /= args.num_games
+    # Close the output file
+    log.write('\n]')
+    log.close()
+
+    # The run is complete, the checkpoint is no longer needed
+    if exists(checkpoint_path(args.output)):
+        remove(checkpoint_path(args.output))
+
+    if cache:
+        print(colored(f'\nReused {reused} cached games, played {args.num_games - games_played - reused}', 'blue'))
+    print(colored(f'\nWins: {wins}', 'magenta', attrs=['bold']))
+
+    # Keep the aggregates so that plots can be rendered after the fact
+    save_stats(args.output, args.sporting, args.benfica, args.num_games, wins, args.sporting_params, args.benfica_params)
+
+    if args.mode == 'auto' and not args.no_plot:
+        plot_results(wins, args.benfica, args.sporting, dirname(args.output) or '.', args.sporting_params, args.benfica_params)
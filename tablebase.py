@@ -0,0 +1,310 @@
+############################################# Libraries #############################################
+
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from random import seed
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from Card import VALUES
+from State import TURN, trick_winner
+from canonical import TRUMP, canonicalize, from_canonical, to_canonical
+
+
+############################################# Constants #############################################
+
+# File layout: header followed by an open addressing hash table of fixed size records
+HEADER = Struct('<8sIIQ')     # magic, max cards per hand, log2 of the number of slots, number of entries
+RECORD = Struct('<QQBB')      # cards left and trump, owners of the cards, leader team points, best lead
+MAGIC = b'SUECAEG3'
+# Owners take 2 bits per card left, 64 bits hold the 4 hands of 8 cards
+MAX_CARDS = 8
+
+SUIT_MASKS = [((1 << 10) - 1) << (10 * s) for s in range(4)]
+# Zero valued cards (orders 0 - 4) only matter by their relative order
+ZERO_VALUE_ORDERS = 5
+
+
+########################################## Positions ##########################################
+
+def position_from_game(game) -> tuple[tuple[int, ...], int]:
+    '''
+        Endgame position at the start of a round: the hands ordered from the leader and the trump suit
+    '''
+
+    hands = tuple(game.state.hand_mask(seat) for seat in TURN[game.state.leader])
+
+    return hands, game.state.trump
+
+def bits(mask:int):
+    '''
+        Yields the card indices of a bitmask, from the lowest to the highest
+    '''
+
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def mask_points(mask:int) -> int:
+    '''
+        Total value of the cards of a bitmask
+    '''
+
+    return sum(VALUES[card % 10] for card in bits(mask))
+
+def normalize(hands:tuple[int, ...]) -> tuple[tuple[int, ...], dict[int, int]]:
+    '''
+        Renumbers the zero valued cards of each suit to the lowest orders, keeping their relative order
+        Returns the normalized hands and the map from normalized cards back to the original cards
+    '''
+
+    remaining = hands[0] | hands[1] | hands[2] | hands[3]
+    renumber = {}
+    for suit in range(4):
+        low_cards = [card for card in bits(remaining & SUIT_MASKS[suit]) if card % 10 < ZERO_VALUE_ORDERS]
+        for new_order, card in enumerate(low_cards):
+            renumber[card] = suit * 10 + new_order
+
+    if all(card == new for card, new in renumber.items()):
+        return hands, {}
+
+    normalized = []
+    for hand in hands:
+        new_hand = 0
+        for card in bits(hand):
+            new_hand |= 1 << renumber.get(card, card)
+        normalized.append(new_hand)
+
+    return tuple(normalized), {new: card for card, new in renumber.items() if new != card}
+
+def encode(hands:tuple[int, ...], trump:int) -> tuple[int, int]:
+    '''
+        Encodes a position as two integers: the cards left plus the trump, and the owner of each card left
+    '''
+
+    remaining = hands[0] | hands[1] | hands[2] | hands[3]
+    owners = 0
+    for position, card in enumerate(bits(remaining)):
+        for seat in range(1, 4):
+            if hands[seat] >> card & 1:
+                owners |= seat << (2 * position)
+
+    return remaining | trump << 40, owners
+
+def slot_of(key:tuple[int, int], slot_bits:int) -> int:
+    '''
+        Slot of a key in the hash table
+    '''
+
+    h = (key[0] * 0x9E3779B97F4A7C15 ^ key[1] * 0xC2B2AE3D27D4EB4F) & 0xFFFFFFFFFFFFFFFF
+
+    return h >> (64 - slot_bits)
+
+
+########################################## Solver ##########################################
+
+class EndgameSolver:
+    '''
+        EndgameSolver ->
+            - memo: exact value and best lead of every solved position (start of a round)
+            - tablebase: optional precomputed tablebase to look positions up
+    '''
+
+    def __init__(self, tablebase:'Tablebase'=None) -> None:
+        self.memo = {}
+        self.tablebase = tablebase
+
+    def solve(self, hands:tuple[int, ...], trump:int) -> tuple[int, int]:
+        '''
+            Points the leader team (positions 0 and 2) wins in the remaining rounds
+            with perfect play by everyone, and the card the leader should play
+        '''
+
+        key = (hands, trump)
+        if key in self.memo:
+            return self.memo[key]
+        if hands[0] == 0:
+            return 0, -1
+
+        if self.tablebase is not None:
+            found = self.tablebase.lookup(hands, trump)
+            if found is not None:
+                self.memo[key] = found
+                return found
+
+        points_left = mask_points(hands[0] | hands[1] | hands[2] | hands[3])
+        best_value, best_card = -1, -1
+        # Strongest cards first, they settle the round sooner
+        for card in sorted(bits(hands[0]), key=lambda c: -(c % 10)):
+            played = list(hands)
+            played[0] ^= 1 << card
+            value = self.play(1, tuple(played), trump, [card], points_left, best_value, points_left + 1)
+            if value > best_value:
+                best_value, best_card = value, card
+
+        self.memo[key] = (best_value, best_card)
+
+        return best_value, best_card
+
+    def play(self, position:int, hands:tuple[int, ...], trump:int, trick:list[int], points_left:int, alpha:int, beta:int) -> int:
+        '''
+            Alpha-beta search inside a round, value of the leader team
+        '''
+
+        if position == 4:
+            winner = trick_winner(trick, trump)
+            points = sum(VALUES[card % 10] for card in trick)
+            # Solve the rest of the game from the point of view of the winner of the round
+            rest, _ = self.solve(hands[winner:] + hands[:winner], trump)
+            return points + rest if winner % 2 == 0 else points_left - points - rest
+
+        # Follow the suit of the round if possible
+        legal = hands[position] & SUIT_MASKS[trick[0] // 10] or hands[position]
+        maximize = position % 2 == 0
+        value = -1 if maximize else points_left + 1
+        for card in bits(legal):
+            played = list(hands)
+            played[position] ^= 1 << card
+            child = self.play(position + 1, tuple(played), trump, trick + [card], points_left, alpha, beta)
+            if maximize:
+                value = max(value, child)
+                alpha = max(alpha, value)
+            else:
+                value = min(value, child)
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        return value
+
+
+########################################## Tablebase ##########################################
+
+class Tablebase:
+    '''
+        Tablebase ->
+            - path: file with the precomputed endgames
+            - max_cards: maximum number of cards per hand of the stored positions
+            - entries: number of stored positions
+        The file is memory mapped, so looking a position up only touches the slots it probes
+    '''
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self.file = open(path, 'rb')
+        self.buffer = mmap(self.file.fileno(), 0, access=ACCESS_READ)
+
+        magic, self.max_cards, self.slot_bits, self.entries = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an endgame tablebase')
+        self.slots = 1 << self.slot_bits
+
+    def lookup(self, hands:tuple[int, ...], trump:int) -> tuple[int, int]:
+        '''
+            Value and best lead of a position (hands ordered from the leader), None if it is not stored
+        '''
+
+        if hands[0].bit_count() > self.max_cards:
+            return None
+
+        normalized, originals = normalize(hands)
+        (canonical_hands, _, _), permutation = canonicalize(normalized, (), trump)
+        key = encode(canonical_hands, TRUMP)
+        slot = slot_of(key, self.slot_bits)
+        while True:
+            remaining, owners, value, best = RECORD.unpack_from(self.buffer, HEADER.size + slot * RECORD.size)
+            if remaining == 0:
+                return None
+            if (remaining, owners) == key:
+                best = from_canonical(best, permutation)
+                return value, originals.get(best, best)
+            slot = (slot + 1) & (self.slots - 1)
+
+    def close(self) -> None:
+        '''
+            Unmaps the tablebase
+        '''
+
+        self.buffer.close()
+        self.file.close()
+
+def write_tablebase(path:str, positions:dict, max_cards:int) -> int:
+    '''
+        Writes the solved positions with at most max_cards per hand to a tablebase file
+    '''
+
+    entries = {}
+    for (hands, trump), (value, best) in positions.items():
+        if hands[0].bit_count() > max_cards or hands[0] == 0:
+            continue
+        normalized, originals = normalize(hands)
+        renumber = {card: new for new, card in originals.items()}
+        (canonical_hands, _, _), permutation = canonicalize(normalized, (), trump)
+        entries[encode(canonical_hands, TRUMP)] = (value, to_canonical(renumber.get(best, best), permutation))
+
+    # Keep the table at most half full so that probes stay short
+    slot_bits = max(4, (2 * len(entries) - 1).bit_length())
+    slots = 1 << slot_bits
+    table = bytearray(HEADER.size + slots * RECORD.size)
+    HEADER.pack_into(table, 0, MAGIC, max_cards, slot_bits, len(entries))
+    for key, (value, best) in entries.items():
+        slot = slot_of(key, slot_bits)
+        while RECORD.unpack_from(table, HEADER.size + slot * RECORD.size)[0] != 0:
+            slot = (slot + 1) & (slots - 1)
+        RECORD.pack_into(table, HEADER.size + slot * RECORD.size, key[0], key[1], value, best)
+
+    with open(path, 'wb') as f:
+        f.write(table)
+
+    return len(entries)
+
+def build(path:str, max_cards:int, num_games:int, team_1_strategy:str, team_2_strategy:str) -> int:
+    '''
+        Solves the endgames reached by simulated games once at most max_cards are left per hand,
+        together with every position met while solving them, and stores them in a tablebase
+    '''
+
+    from Game import Game
+
+    solver = EndgameSolver()
+    for _ in range(num_games):
+        game = Game(team_1_strategy, team_2_strategy, False, 'auto')
+        game.hand_cards()
+        for num_round in range(10 - max_cards):
+            game.play_round(num_round)
+        solver.solve(*position_from_game(game))
+
+    return write_tablebase(path, solver.memo, max_cards)
+
+
+########################################## Main Program #############################################
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Endgame tablebase of the last rounds of Sueca')
+    parser.add_argument('-o', '--output', type=str, default='./results/endgames.tb', help='Tablebase file')
+    parser.add_argument('-k', '--max_cards', type=int, default=3, help=f'Maximum number of cards per hand of the endgames (at most {MAX_CARDS})')
+    parser.add_argument('-n', '--num_games', type=int, default=1000, help='Number of simulated games to collect endgames from')
+    parser.add_argument('-s', '--sporting', type=str, default='maxroundswon', help='Strategy of team Sporting in the simulated games')
+    parser.add_argument('-b', '--benfica', type=str, default='maxpointswon', help='Strategy of team Benfica in the simulated games')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the simulated games')
+
+    args = parser.parse_args()
+    if not 1 <= args.max_cards <= MAX_CARDS:
+        parser.error(f'--max_cards must be between 1 and {MAX_CARDS}')
+
+    return args
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    if args.seed is not None:
+        seed(args.seed)
+
+    start = perf_counter()
+    entries = build(args.output, args.max_cards, args.num_games, args.sporting, args.benfica)
+    print(colored(f'Stored {entries} endgames with up to {args.max_cards} cards per hand in {args.output} ({perf_counter() - start:.1f} s)', 'magenta', attrs=['bold']))
@@ -0,0 +1,158 @@
+############################################# Libraries #############################################
+
+from os import getpid, replace, sysconf
+from sys import stderr
+from time import perf_counter
+from termcolor import colored
+
+
+############################################# Constants #############################################
+
+TEAMS = ['Sporting', 'Benfica', 'ties']
+PAGE_SIZE = sysconf('SC_PAGE_SIZE')
+
+
+########################################## Helpers ##########################################
+
+def resident_memory() -> int:
+    '''
+        Resident memory of this process in bytes (peak resident memory where /proc is not available)
+    '''
+
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        from resource import getrusage, RUSAGE_SELF
+        return getrusage(RUSAGE_SELF).ru_maxrss * 1024
+
+def duration(seconds:float) -> str:
+    '''
+        Short human readable duration (1h02m, 2m36s, 12s)
+    '''
+
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f'{seconds // 3600}h{seconds % 3600 // 60:02d}m'
+    if seconds >= 60:
+        return f'{seconds // 60}m{seconds % 60:02d}s'
+
+    return f'{seconds}s'
+
+def label(value:str) -> str:
+    '''
+        Escapes a label value of the Prometheus text format
+    '''
+
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+########################################## Telemetry ##########################################
+
+class Telemetry:
+    '''
+        Telemetry ->
+            - run: name of the run (label of every metric)
+            - total: number of games of the run
+            - interval: seconds between reports
+            - textfile: file rewritten in the Prometheus text format with every report (None: stderr only)
+            - sample: the decisions of one game in sample are timed
+            - decisions: seconds and number of the timed decisions, by strategy
+            - first: games already done when the run started (resumed or cached)
+        Reports the progress of a run to stderr every interval seconds. Between reports the cost
+        is a clock read per game and a callback per decision of the sampled games
+    '''
+
+    def __init__(self, run:str, total:int, first:int, interval:float, textfile:str=None, sample:int=10) -> None:
+        self.run = run
+        self.total = total
+        self.interval = interval
+        self.textfile = textfile
+        self.sample = max(sample, 1)
+        self.decisions = {}
+        self.first = first
+        self.start = self.last = perf_counter()
+        self.reports = 0
+
+    def timer(self, game_number:int):
+        '''
+            Timer to set on a game (Game.timer), None if the game is not sampled
+        '''
+
+        return self.time_decision if game_number % self.sample == 0 else None
+
+    def time_decision(self, strategy:str, seconds:float) -> None:
+        '''
+            Adds a timed decision of a strategy
+        '''
+
+        timed = self.decisions.setdefault(strategy, [0.0, 0])
+        timed[0] += seconds
+        timed[1] += 1
+
+    def update(self, done:int, wins:dict) -> None:
+        '''
+            Called after every game with the games done and the running wins, reports once per interval
+        '''
+
+        now = perf_counter()
+        if now - self.last >= self.interval:
+            self.report(done, wins, now)
+
+    def close(self, done:int, wins:dict) -> None:
+        '''
+            Final report, if the run lasted long enough to report or exports metrics
+        '''
+
+        if self.reports or self.textfile:
+            self.report(done, wins, perf_counter())
+
+    def report(self, done:int, wins:dict, now:float) -> None:
+        '''
+            Prints a progress line to stderr and rewrites the metrics file
+        '''
+
+        self.last = now
+        self.reports += 1
+        elapsed = now - self.start
+        rate = (done - self.first) / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - done) / rate if rate > 0 else 0.0
+        rates = {team: wins.get(team, 0) / max(done, 1) for team in TEAMS}
+        memory = resident_memory()
+
+        line = f'[{done}/{self.total}] {rate:.1f} games/s, ETA {duration(eta)}, ' +\
+               ' '.join(f'{team} {rates[team]:.1%}' for team in TEAMS) + ', ' +\
+               ''.join(f'{strategy} {seconds / count * 1000:.3f} ms, ' for strategy, (seconds, count) in self.decisions.items()) +\
+               f'RSS {memory / 2 ** 20:.0f} MB'
+        print(colored(line, 'cyan'), file=stderr, flush=True)
+
+        if self.textfile:
+            self.export(done, rate, eta, wins, memory)
+
+    def export(self, done:int, rate:float, eta:float, wins:dict, memory:int) -> None:
+        '''
+            Writes the metrics in the Prometheus text format (replacing the file at once, for the scraper)
+        '''
+
+        run = f'run="{label(self.run)}"'
+        worker = f'{run},worker="{getpid()}"'
+        metrics = [
+            ('sueca_games_total', 'counter', 'Games finished', [(run, done)]),
+            ('sueca_games_planned', 'gauge', 'Games of the run', [(run, self.total)]),
+            ('sueca_games_per_second', 'gauge', 'Games finished per second since the start of the run', [(run, rate)]),
+            ('sueca_eta_seconds', 'gauge', 'Estimated seconds until the end of the run', [(run, eta)]),
+            ('sueca_wins_total', 'counter', 'Games won by each team',
+             [(f'{run},team="{team}"', wins.get(team, 0)) for team in TEAMS]),
+            ('sueca_decision_seconds_sum', 'counter', 'Seconds taken by the timed decisions of each strategy',
+             [(f'{run},strategy="{label(strategy)}"', seconds) for strategy, (seconds, _) in self.decisions.items()]),
+            ('sueca_decision_seconds_count', 'counter', 'Timed decisions of each strategy',
+             [(f'{run},strategy="{label(strategy)}"', count) for strategy, (_, count) in self.decisions.items()]),
+            ('sueca_resident_memory_bytes', 'gauge', 'Resident memory of the worker', [(worker, memory)]),
+        ]
+
+        with open(self.textfile + '.tmp', 'w') as f:
+            for name, kind, description, samples in metrics:
+                f.write(f'# HELP {name} {description}\n# TYPE {name} {kind}\n')
+                for labels, value in samples:
+                    f.write(f'{name}{{{labels}}} {value}\n')
+        replace(self.textfile + '.tmp', self.textfile)
@@ -0,0 +1,87 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from Card import VALUES
+
+
+############################################# Constants #############################################
+
+# Value of each card index (suit * 10 + order)
+CARD_VALUES = np.tile(np.array(VALUES), 4)
+
+
+########################################## Trick Enumeration ##########################################
+
+def enumerate_tricks(played:list[int], candidates:list[np.ndarray], trump:int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+        Winner and points of every way of completing a round
+            - played: cards (indices) already played in the round
+            - candidates: cards each of the remaining players may play, in order of play
+        Returns the position of the winning card and the points of the round, with one axis
+        per remaining player (the same order as itertools.product over the candidates)
+    '''
+
+    num_axes = len(candidates)
+    shape = tuple(len(cards) for cards in candidates)
+
+    # Card of each position of the round, broadcast over the combinations
+    positions = [np.full((1,) * num_axes, card) for card in played]
+    for axis, cards in enumerate(candidates):
+        positions.append(np.asarray(cards).reshape(tuple(-1 if a == axis else 1 for a in range(num_axes))))
+
+    winning_card = np.broadcast_to(positions[0], shape)
+    winner = np.zeros(shape, dtype=np.int8)
+    points = np.broadcast_to(CARD_VALUES[positions[0]], shape)
+    for position in range(1, len(positions)):
+        card = positions[position]
+        suit, winning_suit = card // 10, winning_card // 10
+        # Same suit and higher order, or trump over a non trump card (as Game.calculate_round_points)
+        beats = (suit == winning_suit) & (card % 10 > winning_card % 10) |\
+            (suit == trump) & (winning_suit != trump)
+        winning_card = np.where(beats, card, winning_card)
+        winner = np.where(beats, position, winner)
+        points = points + CARD_VALUES[card]
+
+    return winner, points
+
+def expected_utilities(played:list[int], own_cards:np.ndarray, other_cards:list[np.ndarray],
+                       other_probabilities:list[np.ndarray], trump:int) -> np.ndarray:
+    '''
+        Expected utility of each card the player may play: points of the round, positive if won by
+        its team and negative otherwise, weighted by the probability of the other players' cards
+            - played: cards (indices) already played in the round
+            - own_cards: cards the player may play
+            - other_cards: cards each of the players after it may play
+            - other_probabilities: probability of each of those cards
+    '''
+
+    position = len(played)
+    winner, points = enumerate_tricks(played, [own_cards] + other_cards, trump)
+
+    # Probability of each combination of the other players' cards (multiplied in order of play)
+    probability = np.ones((1,) * len(other_cards))
+    for axis, probabilities in enumerate(other_probabilities):
+        probability = probability * np.asarray(probabilities, dtype=np.float64).reshape(
+            tuple(-1 if a == axis else 1 for a in range(len(other_cards))))
+
+    terms = points * probability[np.newaxis]
+    # The team of the player wins when the winning card was played by it or its partner
+    terms = np.where((winner - position) % 2 == 0, terms, -terms).reshape(len(own_cards), -1)
+
+    # Accumulate in order, as a sequential sum over the combinations would
+    return np.cumsum(terms, axis=1)[:, -1]
+
+def complete_tricks(cards:np.ndarray, trump:int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+        Winner and points of complete rounds, one per row of cards (n, 4) in order of play
+    '''
+
+    rows = np.arange(len(cards))
+    winner = np.zeros(len(cards), dtype=np.int8)
+    for position in range(1, cards.shape[1]):
+        card, winning_card = cards[:, position], cards[rows, winner]
+        beats = (card // 10 == winning_card // 10) & (card % 10 > winning_card % 10) |\
+            (card // 10 == trump) & (winning_card // 10 != trump)
+        winner = np.where(beats, position, winner)
+
+    return winner, CARD_VALUES[cards].sum(axis=1)
@@ -0,0 +1,218 @@
+############################################# Libraries #############################################
+
+import numpy as np
+from ast import literal_eval
+from csv import writer
+from itertools import product
+from math import ceil, log
+from multiprocessing import Pool
+from random import seed
+from time import perf_counter
+from argparse import ArgumentParser
+from termcolor import colored
+from Game import Game
+from deals import open_corpus
+from Player import CooperativePlayer, MaximizePointsPlayer, MaximizeRoundsWonPlayer, PredictorPlayer, HonestPredictorPlayer
+
+
+############################################# Constants #############################################
+
+PLAYERS = {'maxpointswon': MaximizePointsPlayer, 'maxroundswon': MaximizeRoundsWonPlayer,
+           'cooperative': CooperativePlayer, 'predictor': PredictorPlayer, 'honest': HonestPredictorPlayer}
+
+# Values tried for each parameter unless a grid is given in the command line
+SPACES = {
+    'maxpointswon': {'trump_points': [0, 2, 4, 10, 11, 15]},
+    'maxroundswon': {'trump_points': [0, 2, 4, 10, 11, 15]},
+    'cooperative': {'partner_cut': [True, False], 'lead_points': [0, 5, 10, 15, 20]},
+    'predictor': {'trump_penalty': [0, 5, 10, 20, 50, 1000], 'penalty_rounds': [0, 1, 2, 3, 4]},
+    'honest': {'trump_penalty': [0, 10, 1000], 'penalty_rounds': [0, 2], 'mass': [0.8, 0.95, 1.0], 'samples': [100, 1000]},
+}
+
+OPPONENTS = ['random', 'greedy', 'maxpointswon', 'maxroundswon', 'cooperative']
+
+# Games of different opponents never share a seed
+SEED_STRIDE = 1_000_000
+
+
+########################################## Evaluation ##########################################
+
+def play_block(task:tuple) -> tuple[int, np.ndarray]:
+    '''
+        Plays a block of games of a candidate against an opponent (runs in the worker processes)
+        Returns the candidate and its results: wins, ties, sum and sum of squares of the point margin
+    '''
+
+    candidate, strategy, params, opponent, opponent_index, start, stop, base_seed, deals = task
+
+    corpus = open_corpus(deals) if deals else None
+    results = np.zeros(4)
+    for g in range(start, stop):
+        # Game g against an opponent is the same deal for every candidate
+        seed(base_seed + opponent_index * SEED_STRIDE + g)
+        deal = corpus[g % len(corpus)] if corpus is not None else None
+
+        # The candidate plays as Sporting in even games and as Benfica in odd games
+        as_sporting = g % 2 == 0
+        if as_sporting:
+            game = Game(strategy, opponent, False, 'auto', params, None, deal=deal)
+        else:
+            game = Game(opponent, strategy, False, 'auto', None, params, deal=deal)
+        game.hand_cards()
+        winner = game.play_game()
+
+        ours, theirs = game.teams if as_sporting else game.teams[::-1]
+        margin = ours.score - theirs.score
+        results += (winner == ours.name, winner == 'ties', margin, margin * margin)
+
+    return candidate, results
+
+def candidate_grid(space:dict[str, list]) -> list[dict]:
+    '''
+        Every combination of the values of the parameters
+    '''
+
+    names = list(space)
+
+    return [dict(zip(names, values)) for values in product(*(space[name] for name in names))]
+
+def scores(results:np.ndarray, games:np.ndarray) -> np.ndarray:
+    '''
+        Mean point margin of each candidate (the statistic candidates are ranked by)
+    '''
+
+    return results[:, 2] / np.maximum(games, 1)
+
+def successive_halving(strategy:str, candidates:list[dict], opponents:list[str], num_games:int, eta:int,
+                       rounds:int, workers:int, block:int, base_seed:int, deals:str=None) -> tuple[np.ndarray, np.ndarray]:
+    '''
+        Races the candidates against the opponents: every round the candidates still alive play
+        eta times more games against each opponent and only the best 1/eta go on to the next round
+        With a deal corpus, game g against every opponent is played on deal g of the corpus
+        Returns the results of every candidate and the number of games it played
+    '''
+
+    results = np.zeros((len(candidates), 4))
+    played = np.zeros(len(candidates), dtype=int)     # games against each opponent
+    alive = list(range(len(candidates)))
+
+    with Pool(workers) as pool:
+        for r in range(rounds):
+            target = num_games * eta ** r
+            start_time = perf_counter()
+
+            # Only the games not played yet by each candidate, in blocks spread over the workers
+            tasks = [(c, strategy, candidates[c], opponent, k, start, min(start + block, target), base_seed, deals)
+                     for c in alive for k, opponent in enumerate(opponents)
+                     for start in range(played[c], target, block)]
+            for c, block_results in pool.imap_unordered(play_block, tasks):
+                results[c] += block_results
+            played[alive] = target
+
+            games = played * len(opponents)
+            score = scores(results, games)
+            alive = sorted(alive, key=lambda c: -score[c])
+            print(colored(f'Round {r + 1}: {len(alive)} candidates x {target} games per opponent '
+                          f'({perf_counter() - start_time:.1f} s), best {candidates[alive[0]]} '
+                          f'with margin {score[alive[0]]:+.2f}', 'blue'))
+
+            if len(alive) == 1:
+                break
+            alive = alive[:max(1, ceil(len(alive) / eta))]
+
+    return results, played * len(opponents)
+
+
+########################################## Ranked Table ##########################################
+
+def ranked_table(candidates:list[dict], results:np.ndarray, games:np.ndarray) -> list[list]:
+    '''
+        Rows of the ranked table: the candidates that lasted more rounds first, then by mean point margin
+    '''
+
+    score = scores(results, games)
+    order = sorted(range(len(candidates)), key=lambda c: (-games[c], -score[c]))
+
+    rows = []
+    for rank, c in enumerate(order, start=1):
+        n = max(games[c], 1)
+        win_rate = (results[c, 0] + results[c, 1] / 2) / n
+        variance = max(results[c, 3] / n - score[c] ** 2, 0)
+        rows.append([rank] + list(candidates[c].values()) +
+                    [int(games[c]), round(win_rate, 4), round(score[c], 2), round(np.sqrt(variance / n), 2)])
+
+    return rows
+
+def print_table(header:list[str], rows:list[list], top:int) -> None:
+    '''
+        Prints the best rows of the ranked table
+    '''
+
+    widths = [max(len(str(x)) for x in column) for column in zip(header, *rows)]
+    print(colored('  '.join(str(x).rjust(w) for x, w in zip(header, widths)), attrs=['bold', 'underline']))
+    for i, row in enumerate(rows[:top]):
+        line = '  '.join(str(x).rjust(w) for x, w in zip(row, widths))
+        print(colored(line, 'green', attrs=['bold']) if i == 0 else line)
+
+
+########################################## Main Program #############################################
+
+def parse_grid(strategy:str, grid:list[str]) -> dict[str, list]:
+    '''
+        Parameter space of a strategy, with the values given as name=v1,v2,... replacing the defaults
+    '''
+
+    space = dict(SPACES[strategy])
+    for item in grid or []:
+        name, _, values = item.partition('=')
+        if name not in PLAYERS[strategy].PARAMS:
+            raise ValueError(f'Invalid parameter for {strategy}: {name} (parameters: {", ".join(PLAYERS[strategy].PARAMS)})')
+        space[name] = [literal_eval(value) for value in values.split(',')]
+
+    return space
+
+def parse_arguments():
+    '''
+        Parses the command line arguments
+    '''
+
+    parser = ArgumentParser(description='Tunes the parameters of a strategy against a pool of opponents')
+    parser.add_argument('-s', '--strategy', type=str, required=True, choices=list(PLAYERS), help='Strategy to tune')
+    parser.add_argument('-p', '--opponents', type=str, default=','.join(OPPONENTS), help='Comma separated strategies of the opponent pool')
+    parser.add_argument('-g', '--grid', type=str, action='append', help='Values of a parameter, as name=v1,v2,... (repeatable)')
+    parser.add_argument('-n', '--num_games', type=int, default=10, help='Games against each opponent in the first round')
+    parser.add_argument('-e', '--eta', type=int, default=3, help='Only the best 1/eta candidates go on to the next round, which plays eta times more games')
+    parser.add_argument('-r', '--rounds', type=int, default=None, help='Maximum number of rounds (default: until a single candidate is left)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Number of worker processes (default: one per CPU)')
+    parser.add_argument('--block', type=int, default=10, help='Games per task sent to a worker')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the games (every candidate plays the same deals)')
+    parser.add_argument('-d', '--deals', type=str, default=None, help='Deal corpus (deals.py) shared by the workers instead of seeded deals')
+    parser.add_argument('-t', '--top', type=int, default=10, help='Number of rows of the table to print')
+    parser.add_argument('-o', '--output', type=str, default=None, help='CSV file to save the whole ranked table')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    space = parse_grid(args.strategy, args.grid)
+    candidates = candidate_grid(space)
+    opponents = args.opponents.split(',')
+    rounds = args.rounds or (ceil(log(len(candidates), args.eta)) + 1 if len(candidates) > 1 else 1)
+
+    print(colored(f'Tuning {args.strategy}: {len(candidates)} candidates against {", ".join(opponents)}', 'magenta', attrs=['bold']))
+    start = perf_counter()
+    results, games = successive_halving(args.strategy, candidates, opponents, args.num_games, args.eta,
+                                        rounds, args.workers, args.block, args.seed, args.deals)
+
+    header = ['rank'] + list(space) + ['games', 'win_rate', 'margin', 'stderr']
+    rows = ranked_table(candidates, results, games)
+    print()
+    print_table(header, rows, args.top)
+    print(colored(f'\n{int(games.sum())} games in {perf_counter() - start:.1f} s', 'magenta', attrs=['bold']))
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            table = writer(f)
+            table.writerow(header)
+            table.writerows(rows)